@@ -2,3 +2,5 @@ from .data_routes import DataRoutes as DataRoutes
 from .sale_routes import SalesRoutes as SalesRoutes
 from .client_routes import ClientRoutes as ClientRoutes
 from .sandal_routes import SandalRoutes as SandalRoutes
+from .report_routes import ReportRoutes as ReportRoutes
+from .change_routes import ChangeRoutes as ChangeRoutes
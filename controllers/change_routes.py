@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from services import ChangeService
+from services.export import MEDIA_TYPES
+
+
+class ChangeRoutes:
+    """
+    Classe responsável por definir as rotas do feed de alterações, usado por réplicas.
+
+    Attributes:
+        router (APIRouter): Objeto para gerenciar as rotas do FastAPI.
+        service (ChangeService): Serviço responsável por montar as alterações.
+    """
+
+    def __init__(self, service: ChangeService):
+        """
+        Args:
+            service (ChangeService): Instância do serviço do feed de alterações.
+        """
+        self.router = APIRouter()
+        self.service = service
+        self._add_routes()
+
+    def _add_routes(self):
+        """
+        Registra as rotas do feed de alterações.
+        """
+        self.router.add_api_route("/changes", self.changes, methods=["GET"])
+        self.router.add_api_route("/changes/archive", self.changes_archive, methods=["GET"])
+
+    async def changes(self, since: int = Query(0, ge=0)):
+        """
+        Envia, em NDJSON, os registros alterados depois da versão `since`.
+
+        A versão até a qual as alterações foram enviadas vai no cabeçalho `X-Change-Version`,
+        para ser usada como `since` na próxima chamada.
+
+        Args:
+            since (int): Última versão já aplicada pela réplica (0 para receber tudo).
+
+        Returns:
+            StreamingResponse: As alterações, enviadas à medida que são lidas.
+        """
+        versao, linhas = await self.service.changes(since)
+        return StreamingResponse(
+            linhas, media_type=MEDIA_TYPES["ndjson"], headers={"X-Change-Version": str(versao)}
+        )
+
+    async def changes_archive(self, since: int = Query(0, ge=0)):
+        """
+        Baixa os registros alterados depois da versão `since` em um arquivo zip, um CSV por tabela.
+
+        Args:
+            since (int): Última versão já aplicada pela réplica (0 para receber tudo).
+
+        Returns:
+            FileResponse: O arquivo zip, com a versão no cabeçalho `X-Change-Version`.
+        """
+        return await self.service.archive(since)
@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from models import Client
+from services.export import MEDIA_TYPES
+from utils.http_cache import CACHE_CONTROL, etag_matches, not_modified, version_etag
 
 
 class ClientRoutes:
@@ -24,7 +29,9 @@ class ClientRoutes:
     def _add_routes(self):
         """Registra as rotas da API no roteador."""
         self.router.add_api_route("/clients", self.create_client, methods=["POST"])
+        self.router.add_api_route("/clients/bulk", self.create_clients_bulk, methods=["POST"])
         self.router.add_api_route("/clients", self.list_client, methods=["GET"])
+        self.router.add_api_route("/clients/export", self.export_clients, methods=["GET"])
         self.router.add_api_route(
             "/clients/{client_id}", self.search_client_id, methods=["GET"]
         )
@@ -35,7 +42,7 @@ class ClientRoutes:
             "/clients/{client_id}", self.delete_client, methods=["DELETE"]
         )
 
-    def create_client(self, client: Client):
+    async def create_client(self, client: Client):
         """
         Cria um novo cliente.
 
@@ -45,18 +52,80 @@ class ClientRoutes:
         Returns:
             object: Resultado da operação de criação.
         """
-        return self.service.create(client)
+        return await self.service.create(client)
+
+    async def create_clients_bulk(self, clients: List[Client], upsert: bool = False):
+        """
+        Cria vários clientes de uma vez.
+
+        Args:
+            clients (List[Client]): Clientes a serem gravados.
+            upsert (bool): Se `True`, atualiza os clientes cujo ID já existe em vez de criá-los.
+
+        Returns:
+            List[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha.
+        """
+        if upsert:
+            return await self.service.upsert_many(clients)
+        return await self.service.create_many(clients)
+
+    async def list_client(
+        self,
+        response: Response,
+        limit: int | None = Query(None, gt=0),
+        cursor: int | None = None,
+        nome: str | None = None,
+        if_none_match: str | None = Header(None),
+    ):
+        """
+        Lista os clientes, com paginação por cursor.
 
-    def list_client(self):
+        Quando a página está cheia, o ID do último cliente é enviado no cabeçalho
+        `X-Next-Cursor`, para ser usado como `cursor` na próxima página.
+
+        A resposta traz um `ETag` derivado da versão do repositório de clientes. Se o
+        cabeçalho `If-None-Match` trouxer o ETag atual, a resposta é 304, sem listar os clientes.
+
+        Args:
+            response (Response): Resposta HTTP, usada para enviar o próximo cursor e o ETag.
+            limit (int | None): Quantidade máxima de clientes por página.
+            cursor (int | None): ID do último cliente da página anterior.
+            nome (str | None): Trecho do nome do cliente.
+            if_none_match (str | None): ETags que o cliente já tem, no cabeçalho `If-None-Match`.
+
+        Returns:
+            List[object]: Lista de clientes encontrados.
         """
-        Lista todos os clientes.
+        # A versão é lida antes da listagem: uma escrita no meio apenas invalida o ETag enviado.
+        etag = version_etag(await self.service.version(), limit, cursor, nome)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        clients = await self.service.list(limit=limit, cursor=cursor, nome=nome)
+        if limit is not None and len(clients) == limit:
+            response.headers["X-Next-Cursor"] = str(clients[-1].id)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return clients
+
+    def export_clients(
+        self, formato: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+    ):
+        """
+        Exporta todos os clientes em NDJSON ou CSV sem montar a lista completa em memória.
+
+        Args:
+            formato (str): `ndjson` (padrão) ou `csv`, informado no parâmetro `format`.
 
         Returns:
-            List[object]: Lista de clientes cadastrados.
+            StreamingResponse: Conteúdo exportado, enviado à medida que é gerado.
         """
-        return self.service.list()
+        return StreamingResponse(
+            self.service.export(formato),
+            media_type=MEDIA_TYPES[formato],
+            headers={"Content-Disposition": f'attachment; filename="clients.{formato}"'},
+        )
 
-    def search_client_id(self, client_id: int):
+    async def search_client_id(self, client_id: int):
         """
         Busca um cliente pelo ID.
 
@@ -66,9 +135,9 @@ class ClientRoutes:
         Returns:
             object: Cliente encontrado ou `None` se não encontrado.
         """
-        return self.service.search_client(client_id)
+        return await self.service.search_client(client_id)
 
-    def update_client(self, client: Client, client_id: int):
+    async def update_client(self, client: Client, client_id: int):
         """
         Atualiza as informações de um cliente existente.
 
@@ -79,9 +148,9 @@ class ClientRoutes:
         Returns:
             object: Resultado da operação de atualização.
         """
-        return self.service.update(client_id, client)
+        return await self.service.update(client_id, client)
 
-    def delete_client(self, client_id: int):
+    async def delete_client(self, client_id: int):
         """
         Exclui um cliente pelo ID.
 
@@ -91,4 +160,4 @@ class ClientRoutes:
         Returns:
             object: Resultado da operação de exclusão.
         """
-        return self.service.delete(client_id)
+        return await self.service.delete(client_id)
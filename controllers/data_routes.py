@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Query
 
 from services import DataService
 
@@ -27,26 +27,71 @@ class DataRoutes:
         Registra as rotas da API relacionadas ao processamento de dados.
         """
         self.router.add_api_route("/zip/create/", self.create_zip, methods=["POST"])
+        self.router.add_api_route("/zip/download/", self.download_zip, methods=["GET", "HEAD"])
+        self.router.add_api_route("/zip/jobs/{job_id}", self.zip_job, methods=["GET"])
         self.router.add_api_route("/zip/hash/", self.create_hash, methods=["POST"])
+        self.router.add_api_route("/zip/manifest", self.zip_manifest, methods=["GET"])
 
-    def create_zip(self):
+    def create_zip(self, compresslevel: int | None = Query(None, ge=0, le=9)):
         """
         Gera um arquivo zip.
 
-        Este endpoint delega a lógica de criação do zip ao serviço associado.
+        Este endpoint delega a lógica de criação do zip ao serviço associado. Se os CSVs
+        mudaram, a reconstrução roda em segundo plano e o último arquivo válido é devolvido,
+        com o ID do job no cabeçalho `X-Zip-Job`.
+
+        Args:
+            compresslevel (int | None): Nível de compressão (0 = sem compressão, 1 a 9 = deflate).
 
         Returns:
             object: Resultado da operação de criação do arquivo zip.
         """
-        return self.service.create_zip()
+        return self.service.create_zip(compresslevel)
+
+    def download_zip(self, if_none_match: str | None = Header(None)):
+        """
+        Baixa o zip atual, sem reconstruí-lo.
+
+        O hash SHA-256 do zip é enviado como `ETag`: com `If-None-Match`, um zip inalterado
+        custa só uma resposta 304, e pedidos com `Range` retomam downloads interrompidos.
+
+        Args:
+            if_none_match (str | None): ETags que o cliente já tem, no cabeçalho `If-None-Match`.
+
+        Returns:
+            object: O arquivo zip, ou uma resposta 304.
+        """
+        return self.service.download(if_none_match)
+
+    def zip_job(self, job_id: str):
+        """
+        Consulta o estado de um job de reconstrução do zip.
+
+        Args:
+            job_id (str): O ID do job, recebido no cabeçalho `X-Zip-Job`.
+
+        Returns:
+            dict: O estado do job.
+        """
+        return self.service.job(job_id)
 
     def create_hash(self):
         """
         Calcula o hash de dados.
 
-        Este endpoint delega a lógica de cálculo de hash ao serviço associado.
+        Este endpoint delega a lógica de cálculo de hash ao serviço associado. O hash do zip
+        gerado pelo serviço vem do manifesto, calculado durante a compactação.
 
         Returns:
             object: Resultado do cálculo de hash.
         """
         return self.service.create_hash()
+
+    def zip_manifest(self):
+        """
+        Retorna o manifesto do zip, com o hash, o tamanho e a quantidade de registros de cada CSV.
+
+        Returns:
+            dict: O manifesto.
+        """
+        return self.service.manifest()
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Query
+
+from services import ReportService
+
+
+class ReportRoutes:
+    """
+    Classe responsável por definir as rotas dos relatórios de vendas.
+
+    Attributes:
+        router (APIRouter): Objeto para gerenciar as rotas do FastAPI.
+        service (ReportService): Serviço responsável por calcular os relatórios.
+    """
+
+    def __init__(self, service: ReportService):
+        """
+        Args:
+            service (ReportService): Instância do serviço responsável pelos relatórios.
+        """
+        self.router = APIRouter()
+        self.service = service
+        self._add_routes()
+
+    def _add_routes(self):
+        """
+        Registra as rotas da API relacionadas aos relatórios.
+        """
+        self.router.add_api_route("/reports/top-sandals", self.top_sandals, methods=["GET"])
+        self.router.add_api_route("/reports/revenue-by-color", self.revenue_by_color, methods=["GET"])
+        self.router.add_api_route("/reports/revenue-by-size", self.revenue_by_size, methods=["GET"])
+        self.router.add_api_route("/reports/average-ticket", self.average_ticket, methods=["GET"])
+
+    async def top_sandals(
+        self,
+        limit: int = Query(10, gt=0),
+        order: str = Query("unidades", pattern="^(unidades|receita)$"),
+    ):
+        """
+        Lista as sandálias mais vendidas.
+
+        Args:
+            limit (int): Quantidade de sandálias retornadas.
+            order (str): Ordena por `unidades` (padrão) ou por `receita`.
+
+        Returns:
+            List[dict]: Unidades vendidas e receita de cada sandália.
+        """
+        return await self.service.top_sandals(limit, order)
+
+    async def revenue_by_color(self):
+        """
+        Receita e unidades vendidas por cor de sandália.
+
+        Returns:
+            List[dict]: Unidades vendidas e receita de cada cor.
+        """
+        return await self.service.revenue_by("cor")
+
+    async def revenue_by_size(self):
+        """
+        Receita e unidades vendidas por tamanho de sandália.
+
+        Returns:
+            List[dict]: Unidades vendidas e receita de cada tamanho.
+        """
+        return await self.service.revenue_by("tamanho")
+
+    async def average_ticket(self, limit: int | None = Query(None, gt=0)):
+        """
+        Ticket médio de cada cliente.
+
+        Args:
+            limit (int | None): Quantidade de clientes retornados.
+
+        Returns:
+            List[dict]: Quantidade de vendas, receita e ticket médio de cada cliente.
+        """
+        return await self.service.average_ticket(limit)
@@ -1,7 +1,11 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, Query, Response
+from fastapi.responses import StreamingResponse
 
 from models import Sale
 from services import SaleService
+from services.export import MEDIA_TYPES
 
 
 class SalesRoutes:
@@ -28,7 +32,17 @@ class SalesRoutes:
         Registra as rotas da API relacionadas às vendas.
         """
         self.router.add_api_route("/sales", self.create_sale, methods=["POST"])
+        self.router.add_api_route("/sales/bulk", self.create_sales_bulk, methods=["POST"])
         self.router.add_api_route("/sales", self.list_sale, methods=["GET"])
+        self.router.add_api_route("/sales/export", self.export_sales, methods=["GET"])
+        self.router.add_api_route("/sales/aggregates", self.sales_totals, methods=["GET"])
+        self.router.add_api_route(
+            "/sales/aggregates/sandals", self.units_by_sandal, methods=["GET"]
+        )
+        self.router.add_api_route(
+            "/sales/aggregates/clients", self.totals_by_client, methods=["GET"]
+        )
+        self.router.add_api_route("/sales/cache", self.cache_stats, methods=["GET"])
         self.router.add_api_route(
             "/sales/{sale_id}", self.search_sale_id, methods=["GET"]
         )
@@ -37,8 +51,14 @@ class SalesRoutes:
             "/sales/{sale_id}", self.delete_sale, methods=["DELETE"]
         )
         self.router.add_api_route("/sales/total/", self.count_sales, methods=["GET"])
+        self.router.add_api_route(
+            "/clients/{client_id}/sales", self.list_sales_by_client, methods=["GET"]
+        )
+        self.router.add_api_route(
+            "/sandals/{sandal_id}/sales", self.list_sales_by_sandal, methods=["GET"]
+        )
 
-    def create_sale(self, sale: Sale):
+    async def create_sale(self, sale: Sale):
         """
         Cria uma nova venda.
 
@@ -48,30 +68,99 @@ class SalesRoutes:
         Returns:
             object: Resultado da operação de criação.
         """
-        return self.service.create(sale)
+        return await self.service.create(sale)
 
-    def list_sale(self):
+    async def create_sales_bulk(self, sales: List[Sale], upsert: bool = False):
         """
-        Lista todas as vendas.
+        Cria várias vendas de uma vez, movimentando o estoque como `POST /sales`.
+
+        Args:
+            sales (List[Sale]): Vendas a serem gravadas.
+            upsert (bool): Se `True`, atualiza as vendas cujo ID já existe em vez de criá-las.
 
         Returns:
-            List[object]: Lista de vendas cadastradas.
+            List[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha;
+                uma venda sem estoque recebe `conflict` e não é gravada.
         """
-        return self.service.list()
+        if upsert:
+            return await self.service.upsert_many(sales)
+        return await self.service.create_many(sales)
 
-    def search_sale_id(self, sale_id: int):
+    async def list_sale(
+        self,
+        response: Response,
+        limit: int | None = Query(None, gt=0),
+        cursor: int | None = None,
+        client: int | None = None,
+        valor_min: float | None = None,
+        valor_max: float | None = None,
+        live: bool = False,
+    ):
+        """
+        Lista as vendas, com paginação por cursor e filtros.
+
+        Quando a página está cheia, o ID da última venda é enviado no cabeçalho
+        `X-Next-Cursor`, para ser usado como `cursor` na próxima página.
+
+        Args:
+            response (Response): Resposta HTTP, usada para enviar o próximo cursor.
+            limit (int | None): Quantidade máxima de vendas por página.
+            cursor (int | None): ID da última venda da página anterior.
+            client (int | None): Filtra pelo ID do cliente.
+            valor_min (float | None): Valor total mínimo.
+            valor_max (float | None): Valor total máximo.
+            live (bool): Se `True`, mostra os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            List[object]: Lista de vendas encontradas.
+        """
+        sales = await self.service.list(
+            limit=limit,
+            cursor=cursor,
+            client=client,
+            valor_min=valor_min,
+            valor_max=valor_max,
+            live=live,
+        )
+        if limit is not None and len(sales) == limit:
+            response.headers["X-Next-Cursor"] = str(sales[-1].id)
+        return sales
+
+    def export_sales(
+        self, formato: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+    ):
+        """
+        Exporta todas as vendas em NDJSON ou CSV sem montar a lista completa em memória.
+
+        Args:
+            formato (str): `ndjson` (padrão) ou `csv`, informado no parâmetro `format`.
+
+        Returns:
+            StreamingResponse: Conteúdo exportado, enviado à medida que é gerado.
+        """
+        return StreamingResponse(
+            self.service.export(formato),
+            media_type=MEDIA_TYPES[formato],
+            headers={"Content-Disposition": f'attachment; filename="sales.{formato}"'},
+        )
+
+    async def search_sale_id(self, sale_id: int, live: bool = False):
         """
         Busca uma venda pelo ID.
 
+        Vendas gravadas com snapshot são devolvidas como eram no momento da venda, sem consultar
+        clientes e sandálias; `live=true` monta a venda com os dados atuais.
+
         Args:
             sale_id (int): ID da venda a ser buscada.
+            live (bool): Se `True`, mostra os dados atuais de cliente e produtos em vez do snapshot.
 
         Returns:
             object: Venda encontrada ou `None` se não encontrada.
         """
-        return self.service.search_sale(sale_id)
+        return await self.service.search_sale(sale_id, live)
 
-    def update_sale(self, sale: Sale, sale_id: int):
+    async def update_sale(self, sale: Sale, sale_id: int):
         """
         Atualiza as informações de uma venda existente.
 
@@ -82,9 +171,9 @@ class SalesRoutes:
         Returns:
             object: Resultado da operação de atualização.
         """
-        return self.service.update(sale_id, sale)
+        return await self.service.update(sale_id, sale)
 
-    def delete_sale(self, sale_id: int):
+    async def delete_sale(self, sale_id: int):
         """
         Exclui uma venda pelo ID.
 
@@ -94,13 +183,113 @@ class SalesRoutes:
         Returns:
             object: Resultado da operação de exclusão.
         """
-        return self.service.delete(sale_id)
+        return await self.service.delete(sale_id)
 
-    def count_sales(self):
+    async def count_sales(self):
         """
         Conta o número total de vendas registradas.
 
         Returns:
             int: Total de vendas registradas.
         """
-        return self.service.count()
+        return await self.service.count()
+
+    async def sales_totals(self):
+        """
+        Quantidade de vendas e receita total, sem percorrer as vendas.
+
+        Returns:
+            dict: `vendas` e `receita`.
+        """
+        return await self.service.totals()
+
+    async def units_by_sandal(self, sandal_id: int | None = None):
+        """
+        Unidades vendidas por sandália, sem percorrer as vendas.
+
+        Args:
+            sandal_id (int | None): Retorna apenas esta sandália.
+
+        Returns:
+            List[dict]: `sandal_id` e `unidades` de cada sandália com vendas.
+        """
+        return await self.service.units_by_sandal(sandal_id)
+
+    async def totals_by_client(self, client_id: int | None = None):
+        """
+        Quantidade de vendas e receita por cliente, sem percorrer as vendas.
+
+        Args:
+            client_id (int | None): Retorna apenas este cliente.
+
+        Returns:
+            List[dict]: `client`, `vendas` e `receita` de cada cliente com vendas.
+        """
+        return await self.service.totals_by_client(client_id)
+
+    async def cache_stats(self):
+        """
+        Mostra o estado do cache de vendas buscadas pelo ID: tamanho, acertos, faltas e descartes.
+
+        Returns:
+            dict: Estado e contadores do cache.
+        """
+        return await self.service.cache_stats()
+
+    async def list_sales_by_client(
+        self,
+        client_id: int,
+        response: Response,
+        limit: int | None = Query(None, gt=0),
+        cursor: int | None = None,
+        live: bool = False,
+    ):
+        """
+        Lista as vendas de um cliente, com paginação por cursor.
+
+        Quando a página está cheia, o ID da última venda é enviado no cabeçalho
+        `X-Next-Cursor`, para ser usado como `cursor` na próxima página.
+
+        Args:
+            client_id (int): ID do cliente.
+            response (Response): Resposta HTTP, usada para enviar o próximo cursor.
+            limit (int | None): Quantidade máxima de vendas por página.
+            cursor (int | None): ID da última venda da página anterior.
+            live (bool): Se `True`, mostra os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            List[object]: Vendas do cliente.
+        """
+        sales = await self.service.list_by_client(client_id, limit, cursor, live)
+        if limit is not None and len(sales) == limit:
+            response.headers["X-Next-Cursor"] = str(sales[-1].id)
+        return sales
+
+    async def list_sales_by_sandal(
+        self,
+        sandal_id: int,
+        response: Response,
+        limit: int | None = Query(None, gt=0),
+        cursor: int | None = None,
+        live: bool = False,
+    ):
+        """
+        Lista as vendas que contêm uma sandália, com paginação por cursor.
+
+        Quando a página está cheia, o ID da última venda é enviado no cabeçalho
+        `X-Next-Cursor`, para ser usado como `cursor` na próxima página.
+
+        Args:
+            sandal_id (int): ID da sandália.
+            response (Response): Resposta HTTP, usada para enviar o próximo cursor.
+            limit (int | None): Quantidade máxima de vendas por página.
+            cursor (int | None): ID da última venda da página anterior.
+            live (bool): Se `True`, mostra os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            List[object]: Vendas que contêm a sandália.
+        """
+        sales = await self.service.list_by_sandal(sandal_id, limit, cursor, live)
+        if limit is not None and len(sales) == limit:
+            response.headers["X-Next-Cursor"] = str(sales[-1].id)
+        return sales
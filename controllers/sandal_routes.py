@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from models import Sandal
 from services import SandalService
+from services.export import MEDIA_TYPES
+from utils.http_cache import CACHE_CONTROL, etag_matches, not_modified, version_etag
 
 
 class SandalRoutes:
@@ -28,7 +33,9 @@ class SandalRoutes:
         Registra as rotas da API relacionadas a sandálias.
         """
         self.router.add_api_route("/sandals", self.create_sandal, methods=["POST"])
+        self.router.add_api_route("/sandals/bulk", self.create_sandals_bulk, methods=["POST"])
         self.router.add_api_route("/sandals", self.list_sandal, methods=["GET"])
+        self.router.add_api_route("/sandals/export", self.export_sandals, methods=["GET"])
         self.router.add_api_route(
             "/sandals/{sandal_id}", self.search_sandal_id, methods=["GET"]
         )
@@ -39,7 +46,7 @@ class SandalRoutes:
             "/sandals/{sandal_id}", self.delete_sandal, methods=["DELETE"]
         )
 
-    def create_sandal(self, sandal: Sandal):
+    async def create_sandal(self, sandal: Sandal):
         """
         Cria uma nova sandália.
 
@@ -49,18 +56,82 @@ class SandalRoutes:
         Returns:
             object: Resultado da operação de criação.
         """
-        return self.service.create(sandal)
+        return await self.service.create(sandal)
+
+    async def create_sandals_bulk(self, sandals: List[Sandal], upsert: bool = False):
+        """
+        Cria várias sandálias de uma vez.
+
+        Args:
+            sandals (List[Sandal]): Sandálias a serem gravadas.
+            upsert (bool): Se `True`, atualiza as sandálias cujo ID já existe em vez de criá-las.
+
+        Returns:
+            List[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha.
+        """
+        if upsert:
+            return await self.service.upsert_many(sandals)
+        return await self.service.create_many(sandals)
+
+    async def list_sandal(
+        self,
+        response: Response,
+        limit: int | None = Query(None, gt=0),
+        cursor: int | None = None,
+        cor: str | None = None,
+        tamanho: int | None = None,
+        if_none_match: str | None = Header(None),
+    ):
+        """
+        Lista as sandálias, com paginação por cursor e filtros.
 
-    def list_sandal(self):
+        Quando a página está cheia, o ID da última sandália é enviado no cabeçalho
+        `X-Next-Cursor`, para ser usado como `cursor` na próxima página.
+
+        A resposta traz um `ETag` derivado da versão do repositório de sandálias. Se o
+        cabeçalho `If-None-Match` trouxer o ETag atual, a resposta é 304, sem listar as sandálias.
+
+        Args:
+            response (Response): Resposta HTTP, usada para enviar o próximo cursor e o ETag.
+            limit (int | None): Quantidade máxima de sandálias por página.
+            cursor (int | None): ID da última sandália da página anterior.
+            cor (str | None): Filtra pela cor.
+            tamanho (int | None): Filtra pelo tamanho.
+            if_none_match (str | None): ETags que o cliente já tem, no cabeçalho `If-None-Match`.
+
+        Returns:
+            List[object]: Lista de sandálias encontradas.
         """
-        Lista todas as sandálias.
+        # A versão é lida antes da listagem: uma escrita no meio apenas invalida o ETag enviado.
+        etag = version_etag(await self.service.version(), limit, cursor, cor, tamanho)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        sandals = await self.service.list(limit=limit, cursor=cursor, cor=cor, tamanho=tamanho)
+        if limit is not None and len(sandals) == limit:
+            response.headers["X-Next-Cursor"] = str(sandals[-1].id)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return sandals
+
+    def export_sandals(
+        self, formato: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+    ):
+        """
+        Exporta todas as sandálias em NDJSON ou CSV sem montar a lista completa em memória.
+
+        Args:
+            formato (str): `ndjson` (padrão) ou `csv`, informado no parâmetro `format`.
 
         Returns:
-            List[object]: Lista de sandálias cadastradas.
+            StreamingResponse: Conteúdo exportado, enviado à medida que é gerado.
         """
-        return self.service.list()
+        return StreamingResponse(
+            self.service.export(formato),
+            media_type=MEDIA_TYPES[formato],
+            headers={"Content-Disposition": f'attachment; filename="sandals.{formato}"'},
+        )
 
-    def search_sandal_id(self, sandal_id: int):
+    async def search_sandal_id(self, sandal_id: int):
         """
         Busca uma sandália pelo ID.
 
@@ -70,9 +141,9 @@ class SandalRoutes:
         Returns:
             object: Sandália encontrada ou `None` se não encontrada.
         """
-        return self.service.search_sandal(sandal_id)
+        return await self.service.search_sandal(sandal_id)
 
-    def update_sandal(self, sandal: Sandal, sandal_id: int):
+    async def update_sandal(self, sandal: Sandal, sandal_id: int):
         """
         Atualiza as informações de uma sandália existente.
 
@@ -83,9 +154,9 @@ class SandalRoutes:
         Returns:
             object: Resultado da operação de atualização.
         """
-        return self.service.update(sandal_id, sandal)
+        return await self.service.update(sandal_id, sandal)
 
-    def delete_sandal(self, sandal_id: int):
+    async def delete_sandal(self, sandal_id: int):
         """
         Exclui uma sandália pelo ID.
 
@@ -95,4 +166,4 @@ class SandalRoutes:
         Returns:
             object: Resultado da operação de exclusão.
         """
-        return self.service.delete(sandal_id)
+        return await self.service.delete(sandal_id)
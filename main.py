@@ -1,32 +1,82 @@
 from fastapi import FastAPI
 
+from controllers import ChangeRoutes
 from controllers import ClientRoutes
 from controllers import DataRoutes
+from controllers import ReportRoutes
 from controllers import SandalRoutes
 from controllers import SalesRoutes
-from repositories import ClientRepository, SandalRepository, SaleRepository
-from services import ClientService, SandalService, SaleService, DataService
-from utils.paths import CLIENT_CSV, SANDAL_CSV, SALE_CSV, CSV_FILES_PATH, ZIP_FILES_PATH
+from repositories import AsyncRepository
+from repositories import ChangeFeed, ClientRepository, SandalRepository, SaleRepository, SaleCache
+from repositories import (
+    SqliteDatabase,
+    SqliteChangeFeed,
+    SqliteClientRepository,
+    SqliteSandalRepository,
+    SqliteSaleRepository,
+)
+from services import ClientService, SandalService, SaleService, DataService, ReportService, ChangeService
+from utils.paths import CLIENT_CSV, SANDAL_CSV, SALE_CSV, CSV_FILES_PATH, ZIP_FILES_PATH, SQLITE_DB, CHANGE_FEED
+from utils.settings import STORAGE_BACKEND, CLIENT_MAX_WORKERS, SANDAL_MAX_WORKERS, SALE_MAX_WORKERS, SALE_SNAPSHOTS
+from utils.settings import ZIP_COMPRESSLEVEL, SALE_CACHE_SIZE, SALE_CACHE_TTL, CHANGE_FEED_RETENTION
 
 
 app = FastAPI()
 
 # Repositories
-client_repository = ClientRepository(CLIENT_CSV)
-sandal_repository = SandalRepository(SANDAL_CSV)
-sale_repository = SaleRepository(SALE_CSV, sandal_repository, client_repository)
+if STORAGE_BACKEND == "sqlite":
+    database = SqliteDatabase(SQLITE_DB)
+    change_feed = SqliteChangeFeed(database, CHANGE_FEED_RETENTION)
+    sale_cache = SaleCache(change_feed, SALE_CACHE_SIZE, SALE_CACHE_TTL) if SALE_CACHE_SIZE > 0 else None
+    client_repository = SqliteClientRepository(database)
+    sandal_repository = SqliteSandalRepository(database)
+    sale_repository = SqliteSaleRepository(
+        database, sandal_repository, client_repository, snapshots=SALE_SNAPSHOTS, cache=sale_cache
+    )
+elif STORAGE_BACKEND == "csv":
+    change_feed = ChangeFeed(CHANGE_FEED, CHANGE_FEED_RETENTION)
+    sale_cache = SaleCache(change_feed, SALE_CACHE_SIZE, SALE_CACHE_TTL) if SALE_CACHE_SIZE > 0 else None
+    client_repository = ClientRepository(CLIENT_CSV, change_feed=change_feed)
+    sandal_repository = SandalRepository(SANDAL_CSV, change_feed=change_feed)
+    sale_repository = SaleRepository(
+        SALE_CSV,
+        sandal_repository,
+        client_repository,
+        snapshots=SALE_SNAPSHOTS,
+        change_feed=change_feed,
+        cache=sale_cache,
+    )
+    # Sale aggregates are checkpointed on compaction and on shutdown, not on every write
+    app.router.add_event_handler("shutdown", sale_repository.close)
+else:
+    raise ValueError(f"STORAGE_BACKEND inválido: {STORAGE_BACKEND}")
+
+# Each repository runs its blocking I/O on its own bounded thread pool
+async_client_repository = AsyncRepository(client_repository, CLIENT_MAX_WORKERS, "client-repository")
+async_sandal_repository = AsyncRepository(sandal_repository, SANDAL_MAX_WORKERS, "sandal-repository")
+async_sale_repository = AsyncRepository(sale_repository, SALE_MAX_WORKERS, "sale-repository")
 
 # Services
-data_service = DataService(CSV_FILES_PATH, ZIP_FILES_PATH)
+data_service = DataService(CSV_FILES_PATH, ZIP_FILES_PATH, compresslevel=ZIP_COMPRESSLEVEL)
+report_service = ReportService(
+    async_sale_repository, async_sandal_repository, async_client_repository, change_feed
+)
+change_service = ChangeService(
+    change_feed, async_sale_repository, async_sandal_repository, async_client_repository, ZIP_COMPRESSLEVEL
+)
 
 # Controllers
-client_controller = ClientRoutes(ClientService(client_repository))
-sandal_controller = SandalRoutes(SandalService(sandal_repository))
-sale_controller = SalesRoutes(SaleService(sale_repository))
+client_controller = ClientRoutes(ClientService(async_client_repository))
+sandal_controller = SandalRoutes(SandalService(async_sandal_repository))
+sale_controller = SalesRoutes(SaleService(async_sale_repository))
 data_controller = DataRoutes(data_service)
+report_controller = ReportRoutes(report_service)
+change_controller = ChangeRoutes(change_service)
 
 
 app.include_router(client_controller.router)
 app.include_router(sandal_controller.router)
 app.include_router(sale_controller.router)
 app.include_router(data_controller.router)
+app.include_router(report_controller.router)
+app.include_router(change_controller.router)
@@ -1,3 +1,16 @@
+from .base import ClientRepositoryBase as ClientRepositoryBase
+from .base import SandalRepositoryBase as SandalRepositoryBase
+from .base import SaleRepositoryBase as SaleRepositoryBase
+from .base import InsufficientStockError as InsufficientStockError
 from .client_repository import ClientRepository as ClientRepository
 from .sale_repository import SaleRepository as SaleRepository
 from .sandal_repository import SandalRepository as SandalRepository
+from .sqlite_database import SqliteDatabase as SqliteDatabase
+from .sqlite_client_repository import SqliteClientRepository as SqliteClientRepository
+from .sqlite_sale_repository import SqliteSaleRepository as SqliteSaleRepository
+from .sqlite_sandal_repository import SqliteSandalRepository as SqliteSandalRepository
+from .async_repository import AsyncRepository as AsyncRepository
+from .change_feed import ChangeFeed as ChangeFeed
+from .change_feed import ChangeFeedTruncatedError as ChangeFeedTruncatedError
+from .sqlite_change_feed import SqliteChangeFeed as SqliteChangeFeed
+from .sale_cache import SaleCache as SaleCache
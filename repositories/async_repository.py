@@ -0,0 +1,98 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List
+
+from repositories.base import RepositoryBase
+
+
+class AsyncRepository:
+    """
+    Adaptador assíncrono para um repositório síncrono.
+
+    Cada método do repositório vira uma corrotina executada em um pool de threads exclusivo
+    do repositório, com tamanho limitado. Assim o acesso a arquivos não bloqueia o event loop,
+    não disputa o threadpool padrão do FastAPI e a concorrência de cada repositório pode ser
+    ajustada separadamente.
+
+    Attributes:
+        repository (RepositoryBase): O repositório síncrono adaptado.
+        max_workers (int): Quantidade máxima de operações simultâneas no repositório.
+    """
+
+    def __init__(self, repository: RepositoryBase, max_workers: int, name: str | None = None):
+        """
+        Args:
+            repository (RepositoryBase): O repositório síncrono adaptado.
+            max_workers (int): Quantidade máxima de operações simultâneas no repositório.
+            name (str | None): Prefixo do nome das threads, usado em logs e depuração.
+
+        Raises:
+            ValueError: Se `max_workers` for menor que 1.
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers deve ser maior que zero: {max_workers}")
+        self.repository = repository
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name or type(repository).__name__,
+        )
+
+    def __getattr__(self, name: str):
+        atributo = getattr(self.repository, name)
+        if not callable(atributo):
+            return atributo
+
+        @functools.wraps(atributo)
+        async def executar(*args, **kwargs):
+            return await self.run(atributo, *args, **kwargs)
+
+        return executar
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Executa uma função no pool de threads do repositório.
+
+        Args:
+            func (Callable): A função a ser executada.
+            *args: Argumentos posicionais repassados para `func`.
+            **kwargs: Argumentos nomeados repassados para `func`.
+
+        Returns:
+            object: O resultado de `func`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def iter_pages(self, chunk_size: int = 1000, **filtros) -> AsyncIterator[List]:
+        """
+        Percorre todos os registros em páginas de `chunk_size`, como `RepositoryBase.iter_pages`.
+
+        Cada página é lida no pool do repositório, então uma exportação longa ocupa uma
+        thread apenas enquanto lê a página, e não durante o envio ao cliente.
+
+        Args:
+            chunk_size (int): Quantidade de registros por página.
+            **filtros: Filtros repassados para `list`.
+
+        Yields:
+            List: Os registros de cada página, em ordem de ID.
+        """
+        cursor = None
+        while True:
+            pagina = await self.run(self.repository.list, limit=chunk_size, cursor=cursor, **filtros)
+            if pagina:
+                yield pagina
+            if len(pagina) < chunk_size:
+                return
+            cursor = pagina[-1].id
+
+    def shutdown(self, wait: bool = True):
+        """
+        Encerra o pool de threads do repositório.
+
+        Args:
+            wait (bool): Se `True`, aguarda as operações em andamento terminarem.
+        """
+        self._executor.shutdown(wait=wait)
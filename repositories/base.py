@@ -0,0 +1,629 @@
+import json
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from models import Client, Sale, Sandal
+from repositories.sale_cache import SaleCache
+
+
+def bulk_result(index: int, status: str, record_id: int | None = None, detail: str | None = None) -> dict:
+    """
+    Monta o resultado de um item de uma operação em lote.
+
+    Args:
+        index (int): Posição do item no lote recebido.
+        status (str): `created`, `updated`, `error` ou `conflict` (estoque insuficiente, como
+            o 409 de `POST /sales`).
+        record_id (int | None): ID do registro gravado.
+        detail (str | None): Motivo da falha, quando `status` é `error` ou `conflict`.
+
+    Returns:
+        dict: Resultado do item.
+    """
+    return {"index": index, "status": status, "id": record_id, "detail": detail}
+
+
+class InsufficientStockError(ValueError):
+    """
+    Erro lançado quando uma baixa de estoque deixaria alguma sandália com quantidade negativa.
+    """
+
+
+class RepositoryBase(ABC):
+    """
+    Comportamento comum a todos os repositórios, construído sobre a listagem paginada.
+    """
+
+    # Nome da tabela no feed de alterações
+    table: str = ""
+    # Feed de alterações onde os repositórios CSV registram as suas escritas (ver `ChangeFeed`)
+    change_feed = None
+
+    @property
+    @abstractmethod
+    def version(self) -> int:
+        """
+        Versão dos dados do repositório: muda a cada escrita, e permite saber se um valor
+        calculado a partir dos dados (um relatório, por exemplo) ainda é válido.
+
+        Vem do estado persistido, então é a mesma em todos os processos que usam os mesmos dados.
+        """
+
+    def _record_changes(self, op: str, ids: Iterable[int]):
+        """
+        Registra no feed de alterações, se houver um, os registros incluídos, alterados ou excluídos.
+
+        Chamado com a trava de escrita do repositório adquirida, depois da gravação, para que
+        quem lê o feed sempre encontre a alteração já persistida.
+
+        Args:
+            op (str): `U` (inclusão ou atualização) ou `D` (exclusão).
+            ids (Iterable[int]): IDs dos registros.
+        """
+        if self.change_feed is not None:
+            self.change_feed.record(self.table, op, ids)
+
+    @abstractmethod
+    def list(self, limit: int | None = None, cursor: int | None = None, **filtros) -> List: ...
+
+    def iter_pages(self, chunk_size: int = 1000, **filtros) -> Iterator[List]:
+        """
+        Percorre todos os registros em páginas de `chunk_size`, sem carregar a base inteira.
+
+        Cada página é obtida com `list(limit=chunk_size, cursor=<último ID>)`, então o custo
+        de memória fica limitado ao tamanho da página.
+
+        Args:
+            chunk_size (int): Quantidade de registros por página.
+            **filtros: Filtros repassados para `list`.
+
+        Yields:
+            List: Os registros de cada página, em ordem de ID.
+        """
+        cursor = None
+        while True:
+            pagina = self.list(limit=chunk_size, cursor=cursor, **filtros)
+            if pagina:
+                yield pagina
+            if len(pagina) < chunk_size:
+                return
+            cursor = pagina[-1].id
+
+
+class ClientRepositoryBase(RepositoryBase):
+    """
+    Interface comum aos repositórios de clientes, independente do backend de armazenamento.
+    """
+
+    table = "client"
+
+    @abstractmethod
+    def create(self, client: Client) -> Client: ...
+
+    @abstractmethod
+    def search_por_id(self, client_id: int) -> Client | None: ...
+
+    @abstractmethod
+    def search_por_ids(self, client_ids: Iterable[int]) -> Dict[int, Client]: ...
+
+    @abstractmethod
+    def update(self, client: Client) -> Client: ...
+
+    @abstractmethod
+    def delete(self, client_id: int) -> bool: ...
+
+    @abstractmethod
+    def list(
+        self, limit: int | None = None, cursor: int | None = None, nome: str | None = None
+    ) -> List[Client]: ...
+
+    @abstractmethod
+    def create_many(self, clients: List[Client]) -> List[dict]: ...
+
+    @abstractmethod
+    def upsert_many(self, clients: List[Client]) -> List[dict]: ...
+
+    def _validate_many(self, clients: List[Client]) -> List[str | None]:
+        """
+        Valida um lote de clientes antes da gravação.
+
+        Args:
+            clients (List[Client]): Clientes do lote.
+
+        Returns:
+            List[str | None]: Motivo da rejeição de cada item, ou `None` se válido.
+        """
+        return [None if client.nome.strip() else "Nome não informado" for client in clients]
+
+
+class SandalRepositoryBase(RepositoryBase):
+    """
+    Interface comum aos repositórios de sandálias, independente do backend de armazenamento.
+    """
+
+    table = "sandal"
+
+    @abstractmethod
+    def create(self, sandal: Sandal) -> Sandal: ...
+
+    @abstractmethod
+    def search_por_id(self, sandal_id: int) -> Sandal | None: ...
+
+    @abstractmethod
+    def search_por_ids(self, sandal_ids: Iterable[int]) -> Dict[int, Sandal]: ...
+
+    @abstractmethod
+    def update(self, sandal: Sandal) -> Sandal: ...
+
+    @abstractmethod
+    def delete(self, sandal_id: int) -> bool: ...
+
+    @abstractmethod
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        cor: str | None = None,
+        tamanho: int | None = None,
+    ) -> List[Sandal]: ...
+
+    @abstractmethod
+    def create_many(self, sandals: List[Sandal]) -> List[dict]: ...
+
+    @abstractmethod
+    def upsert_many(self, sandals: List[Sandal]) -> List[dict]: ...
+
+    def _validate_many(self, sandals: List[Sandal]) -> List[str | None]:
+        """
+        Valida um lote de sandálias antes da gravação.
+
+        Args:
+            sandals (List[Sandal]): Sandálias do lote.
+
+        Returns:
+            List[str | None]: Motivo da rejeição de cada item, ou `None` se válido.
+        """
+        erros: List[str | None] = []
+        for sandal in sandals:
+            if sandal.quantidade < 0:
+                erros.append("Quantidade negativa")
+            elif sandal.valor < 0:
+                erros.append("Valor negativo")
+            else:
+                erros.append(None)
+        return erros
+
+
+class SaleRepositoryBase(RepositoryBase):
+    """
+    Interface comum aos repositórios de vendas, independente do backend de armazenamento.
+
+    Os backends persistem apenas linhas no formato `{"id", "client", "valor_total", "produtos", "snapshot"}`;
+    a conversão dessas linhas em objetos `Sale` é compartilhada e fica nesta classe.
+
+    Com `snapshots` ativo, cada venda gravada leva em `snapshot` uma cópia compacta (JSON com
+    listas posicionais) do cliente e de cada produto no momento da venda:
+    `{"c": [nome, celular, endereco], "p": [[id, codigo, nome, valor, cor, tamanho], ...]}`.
+    A leitura dessas vendas não consulta clientes nem sandálias e mostra o preço pago; com
+    `live=True` a venda é montada com os dados atuais, como nas vendas sem snapshot.
+
+    Com um `cache` (`SaleCache`), `search_por_id` guarda as vendas montadas e só volta ao
+    armazenamento quando a venda, o cliente ou algum produto dela é alterado.
+
+    Toda escrita de venda movimenta o estoque, tudo ou nada por venda: criar dá baixa nas
+    unidades vendidas, atualizar aplica a diferença entre os produtos antigos e os novos e
+    excluir devolve as unidades. Assim o estoque de cada sandália somado às unidades nas vendas
+    existentes não muda com as vendas. Nas operações em lote, uma venda sem estoque recebe o
+    resultado `conflict` e as demais seguem.
+
+    Attributes:
+        client_repository (ClientRepositoryBase): Repositório de clientes para buscar dados dos clientes.
+        sandal_repository (SandalRepositoryBase): Repositório de sandálias para buscar dados das sandálias.
+        snapshots (bool): Se as vendas gravadas levam o snapshot de cliente e produtos.
+        cache (SaleCache | None): Cache das vendas buscadas pelo ID.
+    """
+
+    table = "sale"
+
+    def __init__(
+        self,
+        sandal_repository: SandalRepositoryBase,
+        client_repository: ClientRepositoryBase,
+        snapshots: bool = False,
+        cache: SaleCache | None = None,
+    ):
+        """
+        Args:
+            sandal_repository (SandalRepositoryBase): Repositório de sandálias para realizar operações de pesquisa.
+            client_repository (ClientRepositoryBase): Repositório de clientes para realizar operações de pesquisa.
+            snapshots (bool): Se as vendas gravadas levam o snapshot de cliente e produtos.
+            cache (SaleCache | None): Cache das vendas buscadas pelo ID.
+        """
+        self.client_repository = client_repository
+        self.sandal_repository = sandal_repository
+        self.snapshots = snapshots
+        self.cache = cache
+
+    @abstractmethod
+    def create(self, sale: Sale) -> Sale: ...
+
+    @abstractmethod
+    def search_por_id(self, sale_id: int, live: bool = False) -> Sale | None: ...
+
+    @abstractmethod
+    def update(self, sale: Sale) -> Sale: ...
+
+    @abstractmethod
+    def delete(self, sale_id: int) -> bool: ...
+
+    @abstractmethod
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        client: int | None = None,
+        valor_min: float | None = None,
+        valor_max: float | None = None,
+        live: bool = False,
+    ) -> List[Sale]: ...
+
+    @abstractmethod
+    def iter_rows(self) -> Iterator[dict]:
+        """
+        Percorre as linhas persistidas de todas as vendas, sem montar objetos `Sale`.
+
+        Pensado para leituras em massa, como relatórios: cada linha tem as chaves `id`,
+        `client`, `valor_total` e `produtos` (no formato aceito por `_parse_produtos`).
+        """
+
+    @abstractmethod
+    def search_rows(self, sale_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Busca as linhas persistidas de várias vendas pelo ID, sem montar objetos `Sale`.
+
+        As linhas têm ao menos as chaves de `iter_rows`.
+
+        Args:
+            sale_ids (Iterable[int]): IDs das vendas.
+
+        Returns:
+            Dict[int, dict]: Mapa de ID para linha, contendo apenas os IDs encontrados.
+        """
+
+    @abstractmethod
+    def sale_refs(self, sale_ids: Iterable[int] | None = None) -> List[Tuple[int, int, float, Tuple[int, ...]]]:
+        """
+        Campos já convertidos das vendas, para cargas em massa como a dos relatórios.
+
+        Args:
+            sale_ids (Iterable[int] | None): IDs das vendas; por padrão, todas.
+
+        Returns:
+            List[Tuple[int, int, float, Tuple[int, ...]]]: `(id, client, valor_total, produtos)`
+                de cada venda existente, com o ID de cada unidade vendida em `produtos`, sem
+                ordem definida.
+        """
+
+    @abstractmethod
+    def list_by_client(
+        self, client_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
+        """
+        Lista as vendas de um cliente em ordem de ID, com paginação por cursor.
+        """
+
+    @abstractmethod
+    def list_by_sandal(
+        self, sandal_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
+        """
+        Lista as vendas que contêm uma sandália em ordem de ID, com paginação por cursor.
+        """
+
+    @abstractmethod
+    def count(self) -> int: ...
+
+    @abstractmethod
+    def totals(self) -> dict:
+        """
+        Quantidade de vendas e receita total, mantidas a cada escrita em vez de recalculadas.
+
+        Returns:
+            dict: `{"vendas": int, "receita": float}`.
+        """
+
+    @abstractmethod
+    def units_by_sandal(self, sandal_id: int | None = None) -> Dict[int, int]:
+        """
+        Unidades vendidas por sandália, mantidas a cada escrita.
+
+        Args:
+            sandal_id (int | None): Retorna apenas esta sandália.
+
+        Returns:
+            Dict[int, int]: Unidades vendidas por ID de sandália (apenas as que têm vendas).
+        """
+
+    @abstractmethod
+    def totals_by_client(self, client_id: int | None = None) -> Dict[int, dict]:
+        """
+        Quantidade de vendas e receita por cliente, mantidas a cada escrita.
+
+        Args:
+            client_id (int | None): Retorna apenas este cliente.
+
+        Returns:
+            Dict[int, dict]: `{"vendas": int, "receita": float}` por ID de cliente (apenas os que têm vendas).
+        """
+
+    @abstractmethod
+    def create_many(self, sales: List[Sale]) -> List[dict]: ...
+
+    @abstractmethod
+    def upsert_many(self, sales: List[Sale]) -> List[dict]: ...
+
+    @abstractmethod
+    def create_sale(self, sale: Sale) -> Sale:
+        """
+        Cria uma venda dando baixa no estoque de cada produto, tudo ou nada.
+
+        Cada ocorrência de um produto em `sale.produtos` é uma unidade vendida.
+
+        Raises:
+            ValueError: Se o cliente ou algum produto não existir, ou se a venda for inválida.
+            InsufficientStockError: Se algum produto não tiver estoque suficiente.
+        """
+
+    @staticmethod
+    def _stock_deltas(antes: Dict[int, int], depois: Dict[int, int]) -> Dict[int, int]:
+        """
+        Variação do estoque quando as unidades de uma venda passam de `antes` para `depois`.
+
+        Args:
+            antes (Dict[int, int]): Unidades por ID de sandália antes da gravação (vazio para
+                uma venda nova).
+            depois (Dict[int, int]): Unidades por ID de sandália depois da gravação (vazio
+                para uma exclusão).
+
+        Returns:
+            Dict[int, int]: Variação por ID de sandália (negativa para baixa), sem zeros.
+        """
+        deltas = {sandal_id: antes.get(sandal_id, 0) - depois.get(sandal_id, 0) for sandal_id in {*antes, *depois}}
+        return {sandal_id: delta for sandal_id, delta in deltas.items() if delta}
+
+    @staticmethod
+    def _quantidades(sale: Sale) -> Dict[int, int]:
+        """
+        Conta as unidades vendidas de cada produto da venda.
+
+        Args:
+            sale (Sale): A venda.
+
+        Returns:
+            Dict[int, int]: Quantidade vendida por ID de sandália.
+        """
+        return dict(Counter(produto.id for produto in sale.produtos))
+
+    @staticmethod
+    def _stock_error(index: int, erro: ValueError) -> dict:
+        """
+        Resultado de um item de lote recusado na movimentação do estoque: `conflict` se faltou
+        estoque, `error` se alguma sandália não existe.
+        """
+        status = "conflict" if isinstance(erro, InsufficientStockError) else "error"
+        return bulk_result(index, status, detail=str(erro))
+
+    def _validate_many(self, sales: List[Sale], upsert: bool = False) -> List[str | None]:
+        """
+        Valida um lote de vendas antes da gravação, conferindo clientes e produtos em lote.
+
+        Args:
+            sales (List[Sale]): Vendas do lote.
+            upsert (bool): Se as vendas serão gravadas pelo ID informado. Nesse caso, um ID
+                repetido no lote é rejeitado, já que o estoque de cada gravação depende da
+                anterior.
+
+        Returns:
+            List[str | None]: Motivo da rejeição de cada item, ou `None` se válido.
+        """
+        clients = self.client_repository.search_por_ids(
+            sale.client.id for sale in sales if sale.client.id is not None
+        )
+        sandals = self.sandal_repository.search_por_ids(
+            produto.id for sale in sales for produto in sale.produtos
+        )
+
+        erros: List[str | None] = []
+        vistos = set()
+        for sale in sales:
+            if upsert and sale.id > 0 and sale.id in vistos:
+                erros.append(f"Venda {sale.id} repetida no lote")
+            elif sale.client.id not in clients:
+                erros.append(f"Cliente {sale.client.id} não encontrado")
+            elif not sale.produtos:
+                erros.append("Venda sem produtos")
+            elif any(produto.id not in sandals for produto in sale.produtos):
+                erros.append("Produto não encontrado")
+            elif sale.valor_total < 0:
+                erros.append("Valor total negativo")
+            else:
+                erros.append(None)
+                vistos.add(sale.id)
+        return erros
+
+    def _hydrate(self, rows: List[dict], live: bool = False) -> List[Sale]:
+        """
+        Constrói objetos `Sale` a partir das linhas persistidas resolvendo clientes e sandálias em lote.
+
+        Linhas com snapshot são montadas direto dele, sem consultar outros repositórios, a menos
+        que `live` seja informado. Para as demais, todos os IDs de clientes e produtos são coletados
+        antes, e cada repositório é consultado uma única vez, evitando uma busca por venda.
+
+        Args:
+            rows (List[dict]): Linhas lidas do armazenamento de vendas.
+            live (bool): Se `True`, ignora os snapshots e usa os dados atuais de clientes e sandálias.
+
+        Returns:
+            List[Sale]: Lista de vendas com cliente e produtos preenchidos.
+        """
+        if not live and any(row.get("snapshot") for row in rows):
+            sem_snapshot = self._hydrate([row for row in rows if not row.get("snapshot")], live=True)
+            proximas = iter(sem_snapshot)
+            return [
+                self._from_snapshot(row) if row.get("snapshot") else next(proximas) for row in rows
+            ]
+
+        produtos_por_venda = [self._parse_produtos(row["produtos"]) for row in rows]
+        produto_ids = {produto for produtos in produtos_por_venda for produto in produtos}
+        client_ids = {int(row["client"]) for row in rows}
+
+        sandals = self.sandal_repository.search_por_ids(produto_ids)
+        clients = self.client_repository.search_por_ids(client_ids)
+
+        sales: List[Sale] = []
+        for row, produtos in zip(rows, produtos_por_venda):
+            sales.append(
+                Sale(
+                    id=row["id"],
+                    client=clients.get(int(row["client"])),
+                    valor_total=row["valor_total"],
+                    produtos=[sandals[produto] for produto in produtos if produto in sandals],
+                )
+            )
+        return sales
+
+    def _search_cached(self, sale_id: int, live: bool, ler: Callable[[], List[dict]]) -> Sale | None:
+        """
+        Monta a venda com a linha lida por `ler`, passando pelo `cache` quando há um.
+
+        Args:
+            sale_id (int): O ID da venda.
+            live (bool): Se `True`, ignora o snapshot e usa os dados atuais de cliente e sandálias.
+            ler (Callable[[], List[dict]]): Lê a linha da venda (lista vazia se ela não existir).
+
+        Returns:
+            Sale | None: A venda, ou `None` se não for encontrada.
+        """
+        if self.cache is None:
+            rows = ler()
+            return self._hydrate(rows, live)[0] if rows else None
+
+        def carregar():
+            rows = ler()
+            if not rows:
+                return None
+            dependencias = [
+                ("sale", sale_id),
+                ("client", int(rows[0]["client"])),
+                *(("sandal", produto) for produto in self._parse_produtos(str(rows[0]["produtos"]))),
+            ]
+            return self._hydrate(rows, live)[0], dependencias
+
+        return self.cache.get_or_load(sale_id, live, carregar)
+
+    def _to_row(self, sale: Sale, snapshot: str | None = None) -> dict:
+        """
+        Converte uma venda para a linha persistida pelos backends.
+
+        Args:
+            sale (Sale): A venda a ser convertida.
+            snapshot (str | None): Snapshot já calculado (ver `_snapshots`); se omitido e os
+                snapshots estiverem ativos, é calculado para esta venda.
+
+        Returns:
+            dict: Linha com o ID do cliente, os IDs dos produtos no formato `"1,2"` e o snapshot.
+        """
+        if snapshot is None:
+            snapshot = self._snapshots([sale])[0]
+        return {
+            "id": sale.id,
+            "client": sale.client.id,
+            "valor_total": sale.valor_total,
+            "produtos": ",".join(map(str, self._produto_dict(sale.produtos))),
+            "snapshot": snapshot or None,
+        }
+
+    def _snapshots(self, sales: List[Sale]) -> List[str]:
+        """
+        Calcula o snapshot de várias vendas, buscando clientes e sandálias uma única vez.
+
+        Args:
+            sales (List[Sale]): Vendas a serem gravadas.
+
+        Returns:
+            List[str]: O snapshot de cada venda, ou `""` se os snapshots estiverem desativados.
+        """
+        if not self.snapshots:
+            return [""] * len(sales)
+        clients = self.client_repository.search_por_ids(sale.client.id for sale in sales)
+        sandals = self.sandal_repository.search_por_ids(
+            produto.id for sale in sales for produto in sale.produtos
+        )
+
+        snapshots: List[str] = []
+        for sale in sales:
+            client = clients.get(sale.client.id, sale.client)
+            produtos = [sandals.get(produto.id, produto) for produto in sale.produtos]
+            dados = {
+                "c": [client.nome, client.celular, client.endereco],
+                "p": [[p.id, p.codigo, p.nome, p.valor, p.cor, p.tamanho] for p in produtos],
+            }
+            snapshots.append(json.dumps(dados, ensure_ascii=False, separators=(",", ":")))
+        return snapshots
+
+    @staticmethod
+    def _from_snapshot(row: dict) -> Sale:
+        """
+        Monta a venda a partir do snapshot gravado, sem consultar outros repositórios.
+
+        Cada produto do snapshot representa uma unidade vendida, então sua `quantidade` é 1.
+
+        Args:
+            row (dict): Linha de venda com a coluna `snapshot` preenchida.
+
+        Returns:
+            Sale: A venda com o cliente e os produtos como eram no momento da venda.
+        """
+        dados = json.loads(row["snapshot"])
+        nome, celular, endereco = dados["c"]
+        return Sale(
+            id=row["id"],
+            client=Client(id=int(row["client"]), nome=nome, celular=celular, endereco=endereco),
+            valor_total=row["valor_total"],
+            produtos=[
+                Sandal(id=id, codigo=codigo, nome=nome_produto, quantidade=1, valor=valor, cor=cor, tamanho=tamanho)
+                for id, codigo, nome_produto, valor, cor, tamanho in dados["p"]
+            ],
+        )
+
+    @staticmethod
+    def _parse_produtos(produtos: str) -> List[int]:
+        """
+        Converte o campo `produtos` em uma lista de IDs de sandálias.
+
+        Aceita tanto o formato `"1,2"` quanto a representação de lista `"[1, 2]"`.
+
+        Args:
+            produtos (str): Valor da coluna `produtos`.
+
+        Returns:
+            List[int]: Lista de IDs das sandálias.
+        """
+        valores = produtos.strip().strip("[]")
+        return [int(valor) for valor in valores.split(",") if valor.strip()]
+
+    def _produto_dict(self, produtos: List[Sandal]) -> List[int] | None:
+        """
+        Converte uma lista de objetos `Sandal` para uma lista de IDs de sandálias.
+
+        Args:
+            produtos (List[Sandal]): Lista de objetos `Sandal`.
+
+        Returns:
+            List[int] | None: Lista de IDs das sandálias.
+        """
+        produto_dic: List[int] = []
+        for produto in produtos:
+            produto_dic.append(produto.id)
+        return produto_dic
@@ -0,0 +1,250 @@
+import os
+import tempfile
+from typing import Iterable, Iterator, Tuple
+
+from repositories.locking import RepositoryLock
+
+
+HEADER = b"versao,tabela,op,id\n"
+
+# Abaixo deste trecho do arquivo, a busca binária dá lugar à leitura sequencial
+BLOCO_BUSCA = 1 << 14
+# Trecho lido do final do arquivo para encontrar a última versão
+BLOCO_CAUDA = 1 << 12
+
+Change = Tuple[int, str, str, int]
+
+
+class ChangeFeedTruncatedError(LookupError):
+    """
+    A versão pedida é anterior às alterações mantidas no feed: o leitor precisa de uma carga
+    completa dos dados (por exemplo, `since=0` no feed de alterações).
+    """
+
+
+class ChangeFeed:
+    """
+    Feed de alterações dos repositórios CSV: cada inclusão, atualização ou exclusão recebe uma
+    versão monotonicamente crescente, compartilhada por todas as tabelas.
+
+    O feed é um arquivo append-only com uma linha `versao,tabela,op,id` por registro alterado
+    (`op` é `U` para inclusão ou atualização e `D` para exclusão). Só a chave do registro é
+    gravada: quem lê o feed busca o estado atual do registro no repositório.
+
+    As versões são alocadas e as linhas anexadas sob uma `RepositoryLock` (`<arquivo>.lock`),
+    também entre processos, então a ordem do arquivo é a ordem das versões. Como as linhas estão
+    ordenadas, `since` encontra o ponto de partida com uma busca binária no arquivo e lê apenas
+    as alterações posteriores.
+
+    O feed mantém apenas as alterações mais recentes: quando passa de `2 * retention`
+    alterações, as mais antigas são descartadas e ficam as últimas `retention`, regravadas em um
+    arquivo temporário que substitui o feed. Um leitor que ainda está antes desse ponto recebe
+    `ChangeFeedTruncatedError` de `since` e precisa recarregar tudo.
+
+    Attributes:
+        file_path (str): Caminho do arquivo do feed.
+        retention (int): Quantidade mínima de alterações mantidas no feed.
+    """
+
+    UPSERT = "U"
+    DELETE = "D"
+
+    def __init__(self, file_path: str, retention: int = 100_000):
+        """
+        Args:
+            file_path (str): Caminho do arquivo do feed (criado se não existir).
+            retention (int): Quantidade mínima de alterações mantidas no feed.
+        """
+        self.file_path = file_path
+        self.retention = max(retention, 1)
+        self._lock = RepositoryLock(f"{file_path}.lock")
+        self._cauda: Tuple[tuple, int] = ((), 0)  # (`_file_key`, última versão) já lidos
+        self._base = 0  # Última base lida; só cresce, e outro processo pode tê-la avançado
+        try:
+            with open(file_path, mode="xb") as file:
+                file.write(HEADER)
+        except FileExistsError:
+            pass
+
+    @property
+    def version(self) -> int:
+        """
+        Versão da última alteração registrada, inclusive por outros processos (0 se nenhuma).
+
+        Todas as alterações até esta versão já estão completas no arquivo.
+        """
+        return self._last_version()[0]
+
+    @property
+    def base_version(self) -> int:
+        """
+        Versão até a qual as alterações foram descartadas: `since` aceita apenas versões a
+        partir dela (0 se nenhuma foi descartada).
+        """
+        with open(self.file_path, mode="rb") as file:
+            self._base = self._read_base(file)
+        return self._base
+
+    def record(self, tabela: str, op: str, ids: Iterable[int]) -> int:
+        """
+        Registra alterações de registros de uma tabela, cada uma com uma nova versão.
+
+        Args:
+            tabela (str): Nome da tabela (`client`, `sandal` ou `sale`).
+            op (str): `U` (inclusão ou atualização) ou `D` (exclusão).
+            ids (Iterable[int]): IDs dos registros alterados.
+
+        Returns:
+            int: A versão da última alteração registrada.
+        """
+        ids = list(ids)
+        with self._lock.write():
+            versao, fim = self._last_version()
+            if not ids:
+                return versao
+            linhas = "".join(f"{versao + posicao},{tabela},{op},{record_id}\n" for posicao, record_id in enumerate(ids, 1))
+            with open(self.file_path, mode="r+b") as file:
+                # Descarta a linha incompleta de uma escrita interrompida, se houver.
+                file.truncate(fim)
+                file.seek(fim)
+                file.write(linhas.encode("ascii"))
+                file.flush()
+                versao += len(ids)
+                self._cauda = (self._file_key(file), versao)
+                if versao - self._base > 2 * self.retention:
+                    # A base pode ter sido avançada por outro processo.
+                    self._base = self._read_base(file)
+            if versao - self._base > 2 * self.retention:
+                self._truncate(versao - self.retention)
+        return versao
+
+    def since(self, versao: int, ate: int | None = None) -> Iterator[Change]:
+        """
+        Percorre as alterações com versão maior que `versao`, em ordem de versão.
+
+        Args:
+            versao (int): Última versão já conhecida pelo leitor.
+            ate (int | None): Maior versão percorrida; por padrão, até o final do feed.
+
+        Yields:
+            Change: `(versao, tabela, op, id)` de cada alteração.
+
+        Raises:
+            ChangeFeedTruncatedError: Se alterações posteriores a `versao` já foram descartadas.
+        """
+        with open(self.file_path, mode="rb") as file:
+            base = self._read_base(file)
+            if versao < base:
+                raise ChangeFeedTruncatedError(
+                    f"Alterações até a versão {base} já foram descartadas do feed (pedida: {versao})"
+                )
+            file.seek(self._offset_after(file, versao))
+            for linha in file:
+                if not linha.endswith(b"\n"):
+                    return  # Linha ainda sendo escrita
+                numero, tabela, op, record_id = linha.decode("ascii").rstrip("\n").split(",")
+                numero = int(numero)
+                if numero <= versao:
+                    continue
+                if ate is not None and numero > ate:
+                    return
+                yield numero, tabela, op, int(record_id)
+
+    def _truncate(self, ate: int):
+        """
+        Descarta as alterações até a versão `ate`, mantendo as posteriores. Deve ser chamado
+        com a trava de escrita adquirida.
+
+        As alterações mantidas são copiadas para um arquivo temporário que substitui o feed:
+        leitores que já abriram o arquivo antigo continuam lendo uma cópia completa dele.
+        """
+        diretorio = os.path.dirname(os.path.abspath(self.file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="wb") as destino, open(self.file_path, mode="rb") as origem:
+                destino.write(HEADER)
+                origem.seek(self._offset_after(origem, ate))
+                for linha in origem:
+                    if not linha.endswith(b"\n"):
+                        break  # Escrita interrompida, descartada também por `record`
+                    if int(linha.split(b",", 1)[0]) > ate:
+                        destino.write(linha)
+                destino.flush()
+                os.fsync(destino.fileno())
+                chave = self._file_key(destino)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._base = ate
+        self._cauda = (chave, self._cauda[1])
+
+    @staticmethod
+    def _read_base(file) -> int:
+        """
+        Lê a base do feed (a versão anterior à primeira alteração mantida) de um arquivo aberto.
+        """
+        file.seek(len(HEADER))
+        primeira = file.readline()
+        if not primeira.endswith(b"\n"):
+            return 0  # Feed vazio: nada foi descartado
+        return int(primeira.split(b",", 1)[0]) - 1
+
+    @staticmethod
+    def _file_key(file) -> Tuple[int, int, int, int]:
+        """
+        Identifica o conteúdo de um arquivo aberto do feed: o arquivo, que muda quando o feed é
+        truncado, o tamanho e a data de modificação.
+        """
+        stat = os.fstat(file.fileno())
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _offset_after(file, versao: int) -> int:
+        """
+        Busca binária pelo início de uma linha anterior a todas as alterações depois de `versao`.
+
+        Todas as linhas antes do offset retornado têm versão menor ou igual a `versao`.
+        """
+        file.seek(0, os.SEEK_END)
+        inicio, fim = len(HEADER), file.tell()
+        while fim - inicio > BLOCO_BUSCA:
+            meio = (inicio + fim) // 2
+            file.seek(meio)
+            file.readline()  # Descarta o resto da linha onde o meio caiu
+            linha = file.readline()
+            if linha.endswith(b"\n") and int(linha.split(b",", 1)[0]) <= versao:
+                inicio = file.tell()
+            else:
+                fim = meio
+        return inicio
+
+    def _last_version(self) -> Tuple[int, int]:
+        """
+        Retorna a última versão gravada e o offset logo após a última linha completa.
+        """
+        with open(self.file_path, mode="rb") as file:
+            chave = self._file_key(file)
+            tamanho = chave[2]
+            if chave == self._cauda[0]:
+                return self._cauda[1], tamanho
+            bloco = BLOCO_CAUDA
+            while True:
+                inicio = max(len(HEADER), tamanho - bloco)
+                file.seek(inicio)
+                cauda = file.read(tamanho - inicio)
+                ultima_quebra = cauda.rfind(b"\n")
+                anterior = cauda.rfind(b"\n", 0, max(ultima_quebra, 0))
+                # A última linha completa só é confiável se começa dentro do trecho lido.
+                if ultima_quebra < 0 and inicio == len(HEADER):
+                    versao, fim = 0, len(HEADER)
+                    break
+                if anterior >= 0 or (ultima_quebra >= 0 and inicio == len(HEADER)):
+                    fim = inicio + ultima_quebra + 1
+                    versao = int(cauda[anterior + 1:ultima_quebra].split(b",", 1)[0])
+                    break
+                bloco *= 2
+        if fim == tamanho:
+            self._cauda = (chave, versao)
+        return versao, fim
@@ -0,0 +1,248 @@
+import csv
+import io
+import os
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+
+class ChangeLog:
+    """
+    Log append-only de alterações de um arquivo CSV.
+
+    Cada alteração é gravada como uma linha pequena no final do log, sincronizada em disco
+    com `fsync` antes de retornar: `U` (upsert) com o registro completo ou `D` (tombstone)
+    apenas com o ID. O dono do log pode usar outras operações em `append`. O arquivo base só
+    é regravado na compactação, feita pelo repositório dono do log.
+
+    Cada escrita é um único `write` com `O_APPEND`, então escritas de processos diferentes
+    nunca se misturam. `offset` marca até onde o log já foi aplicado pelo dono: `append` e
+    `tail` aplicam, em ordem, também as linhas gravadas por outros processos desde então.
+
+    Attributes:
+        file_path (str): Caminho do arquivo de log.
+        fieldnames (List[str]): Cabeçalhos do log (`op` seguido das colunas do registro).
+        offset (int): Posição até onde o log foi lido ou escrito por este objeto.
+    """
+
+    UPSERT = "U"
+    DELETE = "D"
+
+    def __init__(self, file_path: str, fieldnames: List[str]):
+        """
+        Args:
+            file_path (str): Caminho do arquivo de log.
+            fieldnames (List[str]): Colunas do registro armazenado no arquivo base.
+        """
+        self.file_path = file_path
+        self.fieldnames = ["op", *fieldnames]
+        self.offset = 0
+        self._entries = 0
+        self._mutex = threading.Lock()
+        self._initialize_log()
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def _initialize_log(self):
+        """
+        Cria o arquivo de log com cabeçalhos, ou conta as entradas de um log existente.
+        """
+        try:
+            with open(self.file_path, mode="x", newline="", encoding="utf-8") as file:
+                csv.DictWriter(file, fieldnames=self.fieldnames).writeheader()
+        except FileExistsError:
+            pass
+        self.recount()
+
+    def recount(self):
+        """
+        Recalcula a quantidade de entradas, para quando o log foi alterado por outro processo.
+        """
+        self._entries = sum(1 for _ in self.replay())
+
+    def size(self) -> int:
+        """
+        Tamanho atual do arquivo de log, que passa de `offset` quando outro processo o alterou.
+        """
+        return os.path.getsize(self.file_path)
+
+    def append_upsert(self, row: dict):
+        """
+        Registra a inclusão ou atualização de um registro.
+
+        Args:
+            row (dict): Registro completo.
+        """
+        self.append([{**row, "op": self.UPSERT}])
+
+    def append_delete(self, record_id: int):
+        """
+        Registra a exclusão (tombstone) de um registro.
+
+        Args:
+            record_id (int): ID do registro excluído.
+        """
+        self.append([{"op": self.DELETE, "id": record_id}])
+
+    def append_upserts(self, rows: Iterable[dict]):
+        """
+        Registra vários upserts com uma única escrita e um `fsync`.
+
+        Args:
+            rows (Iterable[dict]): Registros completos.
+        """
+        self.append([{**row, "op": self.UPSERT} for row in rows])
+
+    def append(self, entries: List[dict], apply: Callable[[str, dict], None] | None = None):
+        """
+        Anexa várias entradas com uma única escrita e um `fsync`.
+
+        Com `apply`, as linhas que outros processos anexaram desde `offset` e, em seguida, as
+        próprias `entries` são passadas a `apply`, em ordem e antes do `fsync`.
+
+        Args:
+            entries (List[dict]): Entradas com a coluna `op` e as colunas do registro.
+            apply (Callable[[str, dict], None] | None): Aplica uma entrada (operação e registro)
+                ao estado em memória do dono do log.
+        """
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=self.fieldnames, extrasaction="ignore").writerows(entries)
+        dados = buffer.getvalue().encode("utf-8")
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            with self._mutex:
+                escritos = 0
+                while escritos < len(dados):
+                    escritos += os.write(fd, dados[escritos:])
+                fim = os.lseek(fd, 0, os.SEEK_CUR)
+                if apply is not None:
+                    inicio = fim - len(dados)
+                    if inicio > self.offset:
+                        alheias, _ = self._read_entries(self.offset, inicio)
+                        for op, row in alheias:
+                            apply(op, row)
+                        self._entries += len(alheias)
+                    for entry in entries:
+                        apply(entry["op"], entry)
+                self.offset = fim
+                self._entries += len(entries)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def tail(self, apply: Callable[[str, dict], None], ops: Iterable[str] | None = None) -> bool:
+        """
+        Aplica as entradas anexadas por outros processos desde `offset`.
+
+        Args:
+            apply (Callable[[str, dict], None]): Aplica uma entrada ao estado em memória.
+            ops (Iterable[str] | None): Operações aceitas. Se houver alguma outra, nada é
+                aplicado e o método retorna `False`.
+
+        Returns:
+            bool: `True` se as entradas foram aplicadas (ou não havia nenhuma).
+        """
+        with self._mutex:
+            entries, fim = self._read_entries(self.offset)
+            if ops is not None and any(op not in ops for op, _ in entries):
+                return False
+            for op, row in entries:
+                apply(op, row)
+            self.offset = fim
+            self._entries += len(entries)
+        return True
+
+    def replay(self) -> Iterator[Tuple[str, dict]]:
+        """
+        Percorre as alterações na ordem em que foram gravadas, até a última linha completa.
+
+        Yields:
+            Tuple[str, dict]: A operação (`U` ou `D`) e o registro sem a coluna `op`.
+        """
+        entries, self.offset = self._read_entries(0)
+        yield from entries
+
+    def discard_torn_tail(self):
+        """
+        Descarta uma linha incompleta no final do log, deixada por uma escrita interrompida.
+
+        Deve ser chamado após `replay`, com a trava de escrita do dono do log adquirida, para
+        que nenhum outro processo esteja anexando ao log.
+        """
+        with self._mutex:
+            if self.size() > self.offset:
+                os.truncate(self.file_path, self.offset)
+
+    def entries_since(self, inicio: int) -> List[dict]:
+        """
+        Lê as entradas gravadas a partir de um offset, no formato aceito por `clear`.
+
+        Usado pela compactação para manter no log as alterações feitas depois do instante
+        em que o conteúdo compactado foi lido.
+
+        Args:
+            inicio (int): Offset (um valor anterior de `offset`).
+
+        Returns:
+            List[dict]: As entradas, com a coluna `op`.
+        """
+        with self._mutex:
+            entries, _ = self._read_entries(inicio)
+        return [{**row, "op": op} for op, row in entries]
+
+    def clear(self, entries: Iterable[dict] = ()):
+        """
+        Esvazia o log após a compactação do arquivo base.
+
+        O novo log é escrito em um arquivo temporário e renomeado sobre o atual.
+
+        Args:
+            entries (Iterable[dict]): Entradas que continuam no log (com a coluna `op`), por
+                exemplo as que o arquivo base não representa.
+        """
+        entries = list(entries)
+        diretorio = os.path.dirname(os.path.abspath(self.file_path))
+        with self._mutex:
+            fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+            try:
+                with os.fdopen(fd, mode="w", newline="", encoding="utf-8") as file:
+                    writer = csv.DictWriter(file, fieldnames=self.fieldnames, extrasaction="ignore")
+                    writer.writeheader()
+                    writer.writerows(entries)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    self.offset = file.tell()
+                os.replace(tmp_path, self.file_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._entries = len(entries)
+
+    def _read_entries(self, inicio: int, fim: int | None = None) -> Tuple[List[Tuple[str, dict]], int]:
+        """
+        Lê as entradas entre dois offsets, parando na última linha completa.
+
+        Args:
+            inicio (int): Offset inicial; `0` inclui o cabeçalho, que é ignorado.
+            fim (int | None): Offset final; por padrão, o final do arquivo.
+
+        Returns:
+            Tuple[List[Tuple[str, dict]], int]: As entradas (operação e registro sem a coluna
+                `op`) e o offset logo após a última linha lida.
+        """
+        with open(self.file_path, mode="rb") as file:
+            file.seek(inicio)
+            dados = file.read() if fim is None else file.read(fim - inicio)
+        completos = dados[: dados.rfind(b"\n") + 1]
+        reader = csv.DictReader(
+            io.StringIO(completos.decode("utf-8"), newline=""), fieldnames=self.fieldnames
+        )
+        if inicio == 0:
+            next(reader, None)  # Cabeçalho, possivelmente de uma versão com menos colunas
+        entries = []
+        for row in reader:
+            op = row.pop("op")
+            entries.append((op, row))
+        return entries, inicio + len(completos)
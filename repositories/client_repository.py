@@ -1,58 +1,109 @@
+import bisect
 import csv
-from typing import List
-import pandas as pd
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List
 
 from models import Client
+from repositories.base import ClientRepositoryBase, bulk_result
+from repositories.change_feed import ChangeFeed
+from repositories.change_log import ChangeLog
+from repositories.csv_files import (
+    append_csv_rows,
+    discard_temp,
+    file_id,
+    file_signature,
+    replace_csv,
+    signature_version,
+    write_csv_temp,
+)
+from repositories.id_allocator import IdAllocator
+from repositories.locking import RepositoryLock
 
 
-class ClientRepository:
+FIELDNAMES = ["id", "nome", "celular", "endereco"]
+
+
+class ClientRepository(ClientRepositoryBase):
     """
     Repositório de clientes que interage com um arquivo CSV para armazenar,
     recuperar, atualizar e excluir informações de clientes.
 
+    Os clientes ficam em um dicionário ordenado por ID. Atualizações e exclusões não
+    regravam o CSV: são anexadas a um log de alterações (`<arquivo>.log`), que é
+    aplicado sobre o CSV na inicialização e compactado em segundo plano ao atingir
+    `compact_threshold` entradas.
+
+    Leituras e escritas são coordenadas por uma `RepositoryLock` (`<arquivo>.lock`), também
+    entre processos. Se o CSV ou o log forem alterados por outro processo, os clientes são
+    recarregados antes da próxima operação.
+
     Attributes:
         file_path (str): Caminho para o arquivo CSV onde os dados dos clientes são armazenados.
-        proximo_id (int): O próximo ID disponível para a criação de um cliente.
-        data_base (List[dict]): A lista de clientes carregados do arquivo CSV.
+        id_allocator (IdAllocator): Alocador dos IDs de novos clientes.
+        data_base (Dict[int, dict]): Os clientes carregados, indexados pelo ID.
+        change_log (ChangeLog): Log de atualizações e exclusões ainda não compactadas.
+        compact_threshold (int): Número de entradas do log que dispara a compactação.
+        change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
     """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, compact_threshold: int = 1000, change_feed: ChangeFeed | None = None):
         """
         Args:
             file_path (str): Caminho para o arquivo CSV onde os dados dos clientes serão lidos e escritos.
+            compact_threshold (int): Número de entradas do log que dispara a compactação.
+            change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
         """
         self.file_path = file_path
-        self.proximo_id = 0
-        self.data_base = self._initialize_csv()
+        self.change_feed = change_feed
+        self._max_id = 0
+        self.compact_threshold = compact_threshold
+        self.change_log = ChangeLog(f"{file_path}.log", FIELDNAMES)
+        self._sorted_ids: List[int] | None = None
+        self._compaction: threading.Thread | None = None
+        self._compaction_lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._lock = RepositoryLock(f"{file_path}.lock")
+        with self._lock.write():
+            self.data_base = self._initialize_csv()
+            self._apply_change_log()
+            self._update_signature()
+        self.id_allocator = IdAllocator(f"{file_path}.hwm", self._max_id)
 
-    def _initialize_csv(self):
+    def _initialize_csv(self) -> Dict[int, dict]:
         """
         Inicializa a base de dados a partir do arquivo CSV, ou cria um novo arquivo se não existir.
 
+        O arquivo é lido em streaming com `csv.DictReader`, uma linha por vez.
+
         Retorna:
-            List[dict]: Lista de clientes carregada do arquivo CSV.
+            Dict[int, dict]: Clientes carregados do arquivo CSV, indexados pelo ID.
         """
         try:
-            df = pd.read_csv(self.file_path)
-            self.proximo_id = int(df["id"].max() + 1)
-            client_list = []
-            for index, row in df.iterrows():
-                client_list.append(
-                    {
-                        "id": row["id"],
-                        "nome": row["nome"],
-                        "celular": row["celular"],
-                        "endereco": row["endereco"],
-                    }
-                )
-            return client_list
-        except FileExistsError:
-            with open(self.file_path, mode="x", newline="") as file:
-                writer = csv.DictWriter(
-                    file, fieldnames=["id", "nome", "celular", "endereco"]
-                )
+            clients = {}
+            with open(self.file_path, mode="r", newline="", encoding="utf-8") as file:
+                for row in csv.DictReader(file):
+                    client_id = int(row["id"])
+                    clients[client_id] = {**row, "id": client_id}
+                    self._max_id = max(self._max_id, client_id)
+            return clients
+        except FileNotFoundError:
+            with open(self.file_path, mode="x", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
                 writer.writeheader()
-            return []
+            return {}
+
+    def _apply_change_log(self):
+        """
+        Aplica sobre a base carregada as alterações pendentes no log.
+        """
+        for op, row in self.change_log.replay():
+            client_id = int(row["id"])
+            self._max_id = max(self._max_id, client_id)
+            if op == ChangeLog.DELETE:
+                self.data_base.pop(client_id, None)
+            else:
+                self.data_base[client_id] = {**row, "id": client_id}
 
     def create(self, client: Client) -> Client:
         """
@@ -64,16 +115,91 @@ class ClientRepository:
         Returns:
             Client: O cliente criado com um ID atribuído.
         """
-        client.id = self.proximo_id
-        self.proximo_id += 1
-        self.data_base.append(client.model_dump())
-        with open(self.file_path, mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(
-                file, fieldnames=["id", "nome", "celular", "endereco"]
-            )
-            writer.writerow(client.model_dump())
+        with self._lock.write():
+            self._reload_if_changed()
+            client.id = self.id_allocator.next_id()
+            self.data_base[client.id] = client.model_dump()
+            self._add_sorted_ids([client.id])
+            with open(self.file_path, mode="a", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+                writer.writerow(client.model_dump())
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [client.id])
         return client
 
+    def create_many(self, clients: List[Client]) -> List[dict]:
+        """
+        Cria vários clientes com uma única reserva de IDs e uma única escrita no CSV.
+
+        Args:
+            clients (List[Client]): Clientes a serem criados.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(clients)
+        validos = [client for client, erro in zip(clients, erros) if erro is None]
+        with self._lock.write():
+            self._reload_if_changed()
+            for client, client_id in zip(validos, self.id_allocator.reserve(len(validos))):
+                client.id = client_id
+
+            rows = [client.model_dump() for client in validos]
+            append_csv_rows(self.file_path, FIELDNAMES, rows)
+            for row in rows:
+                self.data_base[row["id"]] = row
+            self._add_sorted_ids(row["id"] for row in rows)
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [row["id"] for row in rows])
+
+        return [
+            bulk_result(index, "error", detail=erro) if erro else bulk_result(index, "created", client.id)
+            for index, (client, erro) in enumerate(zip(clients, erros))
+        ]
+
+    def upsert_many(self, clients: List[Client]) -> List[dict]:
+        """
+        Grava vários clientes: os que têm ID vão para o log em uma única escrita,
+        os sem ID são criados no CSV.
+
+        Args:
+            clients (List[Client]): Clientes a serem gravados.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(clients)
+        resultados: List[dict] = []
+        novos: List[dict] = []
+        alterados: List[dict] = []
+        with self._lock.write():
+            self._reload_if_changed()
+            for index, (client, erro) in enumerate(zip(clients, erros)):
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                    continue
+                if client.id is None:
+                    client.id = self.id_allocator.next_id()
+                    novos.append(client.model_dump())
+                    status = "created"
+                else:
+                    status = "updated" if client.id in self.data_base else "created"
+                    self.id_allocator.advance_to(client.id)
+                    alterados.append(client.model_dump())
+                if client.id not in self.data_base:
+                    self._add_sorted_ids([client.id])
+                self.data_base[client.id] = client.model_dump()
+                resultados.append(bulk_result(index, status, client.id))
+
+            if novos:
+                append_csv_rows(self.file_path, FIELDNAMES, novos)
+            if alterados:
+                self.change_log.append_upserts(alterados)
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [r["id"] for r in resultados if r["status"] != "error"])
+        self._compact_if_needed()
+        return resultados
+
     def search_por_id(self, client_id: int) -> Client | None:
         """
         Busca um cliente pelo ID.
@@ -84,14 +210,32 @@ class ClientRepository:
         Returns:
             Client | None: O cliente encontrado, ou `None` se não encontrado.
         """
-        try:
-            return Client.from_dict(self._find(client_id))
-        except IndexError:
-            return None
+        self._refresh()
+        with self._lock.read():
+            client = self._find(client_id)
+        return Client.from_dict(client) if client is not None else None
+
+    def search_por_ids(self, client_ids: Iterable[int]) -> Dict[int, Client]:
+        """
+        Busca vários clientes pelo ID diretamente no dicionário em memória.
+
+        Args:
+            client_ids (Iterable[int]): IDs dos clientes a serem buscados.
+
+        Returns:
+            Dict[int, Client]: Mapa de ID para cliente, contendo apenas os IDs encontrados.
+        """
+        self._refresh()
+        with self._lock.read():
+            return {
+                client_id: Client.from_dict(self.data_base[client_id])
+                for client_id in set(client_ids)
+                if client_id in self.data_base
+            }
 
     def update(self, client: Client) -> Client:
         """
-        Atualiza as informações de um cliente no arquivo CSV.
+        Atualiza as informações de um cliente, registrando a alteração no log.
 
         Args:
             client (Client): Objeto `Client` contendo os dados atualizados do cliente.
@@ -102,26 +246,21 @@ class ClientRepository:
         Raises:
             ValueError: Se o cliente não for encontrado.
         """
-        updated = False
-        client_achado = self._find(client.id)
-        if client_achado:
-            updated = True
-            self.data_base.remove(client_achado)
-            self.data_base.append(client.model_dump())
-            with open(self.file_path, mode="w", newline="") as file:
-                writer = csv.DictWriter(
-                    file, fieldnames=["id", "nome", "celular", "endereco"]
-                )
-                writer.writeheader()
-                writer.writerows(self.data_base)
+        with self._lock.write():
+            self._reload_if_changed()
+            if self._find(client.id) is None:
+                raise ValueError("User not found")
 
-        if not updated:
-            raise ValueError("User not found")
+            self.data_base[client.id] = client.model_dump()
+            self.change_log.append_upsert(client.model_dump())
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [client.id])
+        self._compact_if_needed()
         return client
 
     def delete(self, client_id: int) -> bool:
         """
-        Exclui um cliente pelo ID do arquivo CSV.
+        Exclui um cliente pelo ID, registrando um tombstone no log.
 
         Args:
             client_id (int): O ID do cliente a ser excluído.
@@ -129,31 +268,176 @@ class ClientRepository:
         Returns:
             bool: `True` se o cliente foi excluído com sucesso, `False` caso contrário.
         """
-        client_achado = self._find(client_id)
-        deleted = False
-        if client_achado:
-            deleted = True
-            self.data_base.remove(client_achado)
-            with open(self.file_path, mode="w", newline="") as file:
-                writer = csv.DictWriter(
-                    file, fieldnames=["id", "nome", "celular", "endereco"]
-                )
-                writer.writeheader()
-                writer.writerows(self.data_base)
+        with self._lock.write():
+            self._reload_if_changed()
+            if self.data_base.pop(client_id, None) is None:
+                return False
+            self._remove_sorted_id(client_id)
 
-        return deleted
+            self.change_log.append_delete(client_id)
+            self._update_signature()
+            self._record_changes(ChangeFeed.DELETE, [client_id])
+        self._compact_if_needed()
+        return True
 
-    def list(self) -> List[Client]:
+    def list(
+        self, limit: int | None = None, cursor: int | None = None, nome: str | None = None
+    ) -> List[Client]:
         """
-        Lista todos os clientes armazenados no arquivo CSV.
+        Lista os clientes em ordem de ID, com paginação por cursor e filtro opcional por nome.
+
+        A busca começa no primeiro ID após o cursor (busca binária sobre os IDs ordenados)
+        e termina assim que `limit` clientes compatíveis são encontrados.
+
+        Args:
+            limit (int | None): Quantidade máxima de clientes retornados.
+            cursor (int | None): Retorna apenas clientes com ID maior que este.
+            nome (str | None): Trecho do nome, sem diferenciar maiúsculas.
 
         Returns:
-            List[Client]: Lista de objetos `Client` com todos os clientes encontrados.
+            List[Client]: Lista de objetos `Client` encontrados.
         """
-        try:
-            return [Client.from_dict(data=row) for row in self.data_base]
-        except FileNotFoundError:
-            return []
+        self._refresh()
+        clients: List[Client] = []
+        with self._lock.read():
+            for client_id in self._ids_after(cursor):
+                row = self.data_base[client_id]
+                if nome is not None and nome.casefold() not in str(row["nome"]).casefold():
+                    continue
+                clients.append(Client.from_dict(data=row))
+                if limit is not None and len(clients) >= limit:
+                    break
+        return clients
+
+    def _ids_after(self, cursor: int | None) -> Iterator[int]:
+        """
+        Percorre, em ordem, os IDs maiores que o cursor, sem copiar a lista de IDs.
+
+        Args:
+            cursor (int | None): Último ID já visto, ou `None` para começar do início.
+
+        Yields:
+            int: IDs ordenados a partir do cursor.
+        """
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.data_base)
+        ids = self._sorted_ids
+        inicio = 0 if cursor is None else bisect.bisect_right(ids, cursor)
+        for posicao in range(inicio, len(ids)):
+            yield ids[posicao]
+
+    def _add_sorted_ids(self, client_ids: Iterable[int]):
+        """
+        Insere novos IDs na lista ordenada, se ela já foi montada. IDs alocados são sempre os
+        maiores, então vão para o final; só um ID informado pelo chamador precisa de busca binária.
+        Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._sorted_ids is None:
+            return
+        for client_id in client_ids:
+            if not self._sorted_ids or client_id > self._sorted_ids[-1]:
+                self._sorted_ids.append(client_id)
+            else:
+                bisect.insort(self._sorted_ids, client_id)
+
+    def _remove_sorted_id(self, client_id: int):
+        """
+        Remove um ID da lista ordenada, se ela já foi montada. Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._sorted_ids is None:
+            return
+        posicao = bisect.bisect_left(self._sorted_ids, client_id)
+        if posicao < len(self._sorted_ids) and self._sorted_ids[posicao] == client_id:
+            del self._sorted_ids[posicao]
+
+    def compact(self):
+        """
+        Regrava o arquivo CSV com o estado atual e esvazia o log de alterações.
+
+        A trava de escrita só é mantida para copiar a lista de clientes e, depois, para a
+        troca: os clientes copiados são escritos em um arquivo temporário sem a trava, e na
+        troca os clientes anexados ao CSV nesse meio-tempo são copiados para o final do
+        temporário, que é renomeado sobre o original, e o log passa a conter só as entradas
+        gravadas depois da cópia. Se outro processo compactou os arquivos nesse meio-tempo,
+        o temporário é descartado.
+        """
+        with self._compacting:
+            with self._lock.write():
+                self._reload_if_changed()
+                if len(self.change_log) == 0:
+                    return
+                rows = list(self.data_base.values())
+                log_inicio = self.change_log.offset
+                ids = (file_id(self.file_path), file_id(self.change_log.file_path))
+                fim = os.path.getsize(self.file_path)
+
+            tmp_path = write_csv_temp(self.file_path, FIELDNAMES, rows)
+
+            with self._lock.write():
+                self._reload_if_changed()
+                if (file_id(self.file_path), file_id(self.change_log.file_path)) != ids:
+                    discard_temp(tmp_path)
+                    return
+                recentes = self.change_log.entries_since(log_inicio)
+                replace_csv(tmp_path, self.file_path, fim)
+                self.change_log.clear(recentes)
+                self._update_signature()
+
+    def _compact_if_needed(self):
+        """
+        Inicia a compactação em segundo plano quando o log atinge `compact_threshold` entradas.
+
+        Chamado depois de liberar a trava de escrita, para que a regravação do CSV não
+        atrase a escrita que a disparou.
+        """
+        if len(self.change_log) < self.compact_threshold:
+            return
+        with self._compaction_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados, derivada da assinatura do CSV e do log: muda também quando outro
+        processo altera os arquivos.
+        """
+        self._refresh()
+        return signature_version(self._signature)
+
+    def _update_signature(self):
+        """
+        Registra a assinatura atual dos arquivos após uma escrita ou recarga, mudando `version`.
+        """
+        self._signature = self._file_signature()
+
+    def _refresh(self):
+        """
+        Recarrega os clientes caso o CSV ou o log tenham sido alterados fora deste processo.
+
+        Usado antes das leituras; adquire a trava de escrita apenas se houver o que recarregar.
+        """
+        if self._file_signature() != self._signature:
+            with self._lock.write():
+                self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        """
+        Recarrega os clientes se o CSV ou o log mudaram. Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._file_signature() == self._signature:
+            return
+        self.data_base = self._initialize_csv()
+        self.change_log.recount()
+        self._apply_change_log()
+        self._sorted_ids = None
+        self._update_signature()
+        self.id_allocator.advance_to(self._max_id)
+
+    def _file_signature(self):
+        return file_signature(self.file_path, self.change_log.file_path)
 
     def _find(self, id: int):
         """
@@ -165,7 +449,4 @@ class ClientRepository:
         Returns:
             dict | None: O cliente encontrado ou `None` se não encontrado.
         """
-        for client in self.data_base:
-            if client["id"] == id:
-                return client
-        return None
+        return self.data_base.get(id)
@@ -0,0 +1,168 @@
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Iterable, List, Tuple
+
+
+def write_csv_atomic(file_path: str, fieldnames: List[str], rows: Iterable[dict]):
+    """
+    Regrava um arquivo CSV de forma atômica.
+
+    As linhas são escritas em um arquivo temporário no mesmo diretório, sincronizadas
+    em disco com `fsync` e só então o temporário substitui o original com `os.replace`.
+    Uma falha no meio da escrita nunca deixa o arquivo original truncado.
+
+    Args:
+        file_path (str): Caminho do arquivo CSV a ser substituído.
+        fieldnames (List[str]): Cabeçalhos do arquivo CSV.
+        rows (Iterable[dict]): Linhas a serem gravadas.
+    """
+    tmp_path = write_csv_temp(file_path, fieldnames, rows)
+    try:
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        discard_temp(tmp_path)
+        raise
+
+
+def write_csv_temp(file_path: str, fieldnames: List[str], rows: Iterable[dict]) -> str:
+    """
+    Escreve as linhas em um arquivo temporário no mesmo diretório de `file_path`,
+    sincronizado em disco com `fsync`.
+
+    O temporário depois substitui o original com `replace_csv` ou é removido com
+    `discard_temp`. Usado pelas compactações, que escrevem o temporário sem a trava do
+    repositório e só a adquirem para a troca.
+
+    Args:
+        file_path (str): Caminho do arquivo CSV que o temporário vai substituir.
+        fieldnames (List[str]): Cabeçalhos do arquivo CSV.
+        rows (Iterable[dict]): Linhas a serem gravadas.
+
+    Returns:
+        str: Caminho do arquivo temporário.
+    """
+    diretorio = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        discard_temp(tmp_path)
+        raise
+    return tmp_path
+
+
+def replace_csv(tmp_path: str, file_path: str, inicio: int) -> int:
+    """
+    Substitui um arquivo CSV pelo temporário de `write_csv_temp`, copiando antes para o
+    final do temporário as linhas anexadas ao original a partir do offset `inicio`.
+
+    Deve ser chamado com a trava de escrita do repositório adquirida, para que nenhuma
+    linha seja anexada ao original durante a cópia.
+
+    Args:
+        tmp_path (str): Caminho do arquivo temporário.
+        file_path (str): Caminho do arquivo CSV a ser substituído.
+        inicio (int): Tamanho do original quando as linhas do temporário foram lidas.
+
+    Returns:
+        int: Offset, no novo arquivo, onde começam as linhas copiadas do original.
+    """
+    try:
+        with open(file_path, mode="rb") as origem, open(tmp_path, mode="ab") as destino:
+            base = destino.tell()
+            origem.seek(inicio)
+            shutil.copyfileobj(origem, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        discard_temp(tmp_path)
+        raise
+    return base
+
+
+def discard_temp(tmp_path: str):
+    """
+    Remove um arquivo temporário que não vai substituir o original.
+
+    Args:
+        tmp_path (str): Caminho do arquivo temporário.
+    """
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def file_id(file_path: str) -> Tuple[int, int]:
+    """
+    Identidade (dispositivo, inode) de um arquivo, que muda quando ele é substituído com
+    `os.replace`, por exemplo pela compactação de outro processo.
+
+    Args:
+        file_path (str): Caminho do arquivo.
+
+    Returns:
+        Tuple[int, int]: O dispositivo e o inode do arquivo.
+    """
+    stat = os.stat(file_path)
+    return stat.st_dev, stat.st_ino
+
+
+def append_csv_rows(file_path: str, fieldnames: List[str], rows: Iterable[dict]):
+    """
+    Anexa várias linhas a um arquivo CSV com uma única escrita bufferizada e um `fsync`.
+
+    Args:
+        file_path (str): Caminho do arquivo CSV.
+        fieldnames (List[str]): Cabeçalhos do arquivo CSV.
+        rows (Iterable[dict]): Linhas a serem anexadas.
+    """
+    with open(file_path, mode="a", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writerows(rows)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def file_signature(*file_paths: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    Retorna a assinatura (mtime, tamanho) de um ou mais arquivos.
+
+    Usada pelos repositórios para perceber que outro processo alterou os arquivos.
+
+    Args:
+        *file_paths (str): Caminhos dos arquivos.
+
+    Returns:
+        Tuple[Tuple[int, int], ...]: Data de modificação em nanossegundos e tamanho em bytes de cada arquivo.
+    """
+    assinatura = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        assinatura.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(assinatura)
+
+
+def signature_version(*estado) -> int:
+    """
+    Versão dos dados derivada do estado dos arquivos, como a assinatura de `file_signature`.
+
+    Como vem apenas do que está em disco, é a mesma em todos os processos que veem os mesmos
+    arquivos (os workers de um servidor, por exemplo) e sobrevive a reinícios, ao contrário de
+    um contador em memória.
+
+    Args:
+        *estado: Assinaturas dos arquivos e outros valores persistidos (offsets de log).
+
+    Returns:
+        int: Um inteiro não negativo de 63 bits que muda com qualquer parte do estado.
+    """
+    resumo = hashlib.blake2b(repr(estado).encode(), digest_size=8).digest()
+    return int.from_bytes(resumo, "big") >> 1
@@ -0,0 +1,395 @@
+"""
+Varredura de arquivos CSV mapeados em memória, decodificando apenas as colunas usadas.
+
+`csv.DictReader` cria um dicionário por linha e uma string por campo, mesmo quando a leitura
+só precisa do ID. `CsvScan` mapeia o arquivo com `mmap` e, com numpy, localiza os limites dos
+registros e dos campos com buscas vetorizadas (quebras de linha, vírgulas e aspas), em lotes.
+Só as colunas pedidas são extraídas: inteiros e decimais são convertidos de uma vez para o lote
+inteiro, sem objetos intermediários por linha, e as demais colunas são copiadas como `bytes`.
+
+Sem numpy, os mesmos resultados são obtidos registro a registro com `mmap.find`.
+
+O formato lido é o gravado por `csv.DictWriter`: campos com vírgula, aspas ou quebra de linha
+entre aspas, aspas internas duplicadas e registros terminados em `\\r\\n`.
+"""
+import csv
+import mmap
+import os
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Sem numpy: registros e campos são localizados com `mmap.find`
+    np = None
+
+
+NOVA_LINHA = 0x0A
+RETORNO = 0x0D
+ASPAS = 0x22
+VIRGULA = 0x2C
+
+# Tamanho (em bytes) do primeiro e do maior bloco analisado por vez. Os blocos começam pequenos
+# para que uma leitura interrompida cedo (uma página) não pague pela varredura do arquivo inteiro.
+BLOCO_INICIAL = 1 << 16
+BLOCO = 1 << 22
+# Registros por lote na leitura sem numpy
+LOTE = 1 << 14
+# Maior campo numérico convertido de forma vetorizada
+LARGURA_NUMERO = 32
+
+Batch = Tuple[List[int], List[int], Dict[str, list]]
+
+
+class CsvScan:
+    """
+    Leitura de um arquivo CSV mapeado em memória, em lotes de registros.
+
+    O mapeamento reflete o arquivo no momento da abertura: linhas anexadas depois não são
+    vistas, e uma substituição atômica (`os.replace`) não afeta a varredura em andamento.
+
+    Attributes:
+        file_path (str): Caminho do arquivo CSV.
+        fieldnames (List[str]): Colunas do arquivo, na ordem gravada.
+    """
+
+    def __init__(self, file_path: str, fieldnames: List[str]):
+        """
+        Args:
+            file_path (str): Caminho do arquivo CSV.
+            fieldnames (List[str]): Colunas do arquivo, na ordem gravada.
+        """
+        self.file_path = file_path
+        self.fieldnames = fieldnames
+        with open(file_path, mode="rb") as file:
+            self._size = os.fstat(file.fileno()).st_size
+            # Um arquivo vazio não pode ser mapeado; não há registros a percorrer.
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+
+    def __enter__(self) -> "CsvScan":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Libera o mapeamento do arquivo.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def batches(self, columns: Dict[str, type], start: int | None = None) -> Iterator[Batch]:
+        """
+        Percorre os registros em lotes, extraindo apenas as colunas pedidas.
+
+        Args:
+            columns (Dict[str, type]): Colunas a extrair e o tipo de cada uma: `int`, `float`
+                ou `bytes` (o valor sem aspas, sem decodificar).
+            start (int | None): Offset do primeiro registro; por padrão, logo após o cabeçalho.
+
+        Yields:
+            Tuple[List[int], List[int], Dict[str, list]]: Início e fim (exclusivo, sem o
+            terminador) de cada registro do lote e os valores de cada coluna, na mesma ordem.
+
+        Raises:
+            ValueError: Se algum valor de uma coluna `int` ou `float` não for um número.
+        """
+        indices = {name: self.fieldnames.index(name) for name in columns}
+        ultimo = max(indices.values(), default=-1)
+        start = self._start(start)
+        if start is None:
+            return
+        if np is None:
+            yield from self._batches_find(columns, indices, ultimo, start)
+            return
+
+        for inicios, fins in self._record_blocks(start):
+            # Os arrays apontam para o mapeamento: viram listas antes de devolver o controle.
+            buffer = np.frombuffer(self._mmap, dtype=np.uint8)
+            comecos, finais, validos = self._locate(buffer, inicios, fins, ultimo)
+            valores = {}
+            for name, tipo in columns.items():
+                indice = indices[name]
+                if tipo is int:
+                    convertidos, ok = _parse_integers(buffer, comecos[indice], finais[indice])
+                elif tipo is float:
+                    convertidos, ok = _parse_floats(buffer, comecos[indice], finais[indice])
+                else:
+                    convertidos, ok = self._slices(comecos[indice], finais[indice]), np.ones(len(inicios), bool)
+                convertidos = convertidos if isinstance(convertidos, list) else convertidos.tolist()
+                # Registros com aspas duplicadas ou números fora do formato simples: um a um.
+                for posicao in np.flatnonzero(~(validos & ok)).tolist():
+                    campo = self.fields(int(inicios[posicao]), int(fins[posicao]), indice)[indice]
+                    convertidos[posicao] = campo if tipo is bytes else tipo(campo)
+                valores[name] = convertidos
+            lote = (inicios.tolist(), fins.tolist(), valores)
+            del buffer, comecos, finais, validos, inicios, fins
+            yield lote
+
+    def records(self, start: int | None = None) -> Iterator[Tuple[int, int]]:
+        """
+        Percorre os limites dos registros, sem copiar nem decodificar o conteúdo.
+
+        Args:
+            start (int | None): Offset do primeiro registro; por padrão, logo após o cabeçalho.
+
+        Yields:
+            Tuple[int, int]: Início e fim (exclusivo, sem o terminador) de cada registro não vazio.
+        """
+        for inicios, fins, _ in self.batches({}, start):
+            yield from zip(inicios, fins)
+
+    def integers(self, name: str, start: int | None = None) -> Tuple[List[int], List[int]]:
+        """
+        Lê uma coluna de inteiros (por exemplo, o ID) e o offset de cada registro.
+
+        Args:
+            name (str): Nome da coluna.
+            start (int | None): Offset do primeiro registro; por padrão, logo após o cabeçalho.
+
+        Returns:
+            Tuple[List[int], List[int]]: Offsets dos registros e os valores da coluna.
+        """
+        offsets: List[int] = []
+        valores: List[int] = []
+        for inicios, _, lote in self.batches({name: int}, start):
+            offsets.extend(inicios)
+            valores.extend(lote[name])
+        return offsets, valores
+
+    def fields(self, inicio: int, fim: int, ultimo: int | None = None) -> List[bytes]:
+        """
+        Separa os campos de um registro, parando na coluna `ultimo`.
+
+        Args:
+            inicio (int): Início do registro.
+            fim (int): Fim do registro (exclusivo).
+            ultimo (int | None): Índice da última coluna necessária; por padrão, todas.
+
+        Returns:
+            List[bytes]: Os valores das colunas `0..ultimo`, com `b""` para colunas ausentes.
+        """
+        if ultimo is None:
+            ultimo = len(self.fieldnames) - 1
+        arquivo = self._mmap
+        valores: List[bytes] = []
+        posicao = inicio
+        while len(valores) <= ultimo:
+            if posicao < fim and arquivo[posicao] == ASPAS:
+                fecha = posicao + 1
+                while True:
+                    fecha = arquivo.find(b'"', fecha, fim)
+                    if fecha == -1:
+                        fecha = fim
+                        break
+                    if fecha + 1 < fim and arquivo[fecha + 1] == ASPAS:
+                        fecha += 2  # Aspas duplicadas dentro do campo
+                        continue
+                    break
+                valor = arquivo[posicao + 1:fecha]
+                if b'""' in valor:
+                    valor = valor.replace(b'""', b'"')
+                posicao = fecha + 1
+            else:
+                virgula = arquivo.find(b",", posicao, fim)
+                if virgula == -1:
+                    virgula = fim
+                valor = arquivo[posicao:virgula]
+                posicao = virgula
+            valores.append(valor)
+            if posicao >= fim:
+                break
+            posicao += 1  # Vírgula
+        valores.extend([b""] * (ultimo + 1 - len(valores)))
+        return valores
+
+    def row(self, inicio: int, fim: int) -> dict:
+        """
+        Decodifica um registro completo, como uma linha de `csv.DictReader`.
+
+        Args:
+            inicio (int): Início do registro.
+            fim (int): Fim do registro (exclusivo).
+
+        Returns:
+            dict: Os valores de todas as colunas, como texto.
+        """
+        return dict(zip(self.fieldnames, next(csv.reader([self._mmap[inicio:fim].decode("utf-8")]))))
+
+    def _start(self, start: int | None) -> int | None:
+        """
+        Offset do primeiro registro, ou `None` se não houver registros.
+        """
+        if self._mmap is None:
+            return None
+        if start is None:
+            cabecalho = self._mmap.find(b"\n")
+            return cabecalho + 1 if cabecalho != -1 else None
+        return start if start < self._size else None
+
+    def _record_blocks(self, start: int):
+        """
+        Percorre, bloco a bloco, o início e o fim dos registros não vazios, como arrays numpy.
+
+        Uma quebra de linha entre aspas faz parte do campo: só terminam registros as quebras
+        precedidas por uma quantidade par de aspas.
+        """
+        paridade = 0
+        inicio = start
+        bloco = start
+        tamanho = BLOCO_INICIAL
+        while bloco < self._size:
+            fim_bloco = min(bloco + tamanho, self._size)
+            buffer = np.frombuffer(self._mmap, dtype=np.uint8)
+            trecho = buffer[bloco:fim_bloco]
+            novas_linhas = np.flatnonzero(trecho == NOVA_LINHA)
+            aspas = np.flatnonzero(trecho == ASPAS)
+            if len(aspas) or paridade:
+                novas_linhas = novas_linhas[(np.searchsorted(aspas, novas_linhas) + paridade) % 2 == 0]
+            paridade = (paridade + len(aspas)) % 2
+            terminos = novas_linhas.astype(np.int64) + bloco
+            if fim_bloco == self._size and (int(terminos[-1]) + 1 if len(terminos) else inicio) < self._size:
+                terminos = np.append(terminos, self._size)  # Último registro, sem quebra de linha
+
+            inicios = np.concatenate([[inicio], terminos[:-1] + 1]).astype(np.int64)[:len(terminos)]
+            fins = terminos.copy()
+            fins[(fins > inicios) & (buffer[np.maximum(fins - 1, 0)] == RETORNO)] -= 1
+            del buffer, trecho
+            if len(terminos):
+                inicio = int(terminos[-1]) + 1
+            nao_vazios = fins > inicios
+            if nao_vazios.any():
+                yield inicios[nao_vazios], fins[nao_vazios]
+            bloco = fim_bloco
+            tamanho = min(tamanho * 2, BLOCO)
+
+    def _locate(self, buffer, inicios, fins, ultimo: int):
+        """
+        Localiza, de forma vetorizada, início e fim das colunas `0..ultimo` de cada registro.
+
+        Campos entre aspas sem aspas internas são localizados direto; registros com aspas
+        duplicadas ou mal formados nas colunas pedidas são marcados como inválidos, para que o
+        chamador os separe com `fields`.
+
+        Returns:
+            tuple: Listas (uma por coluna) com os arrays de inícios e de fins dos valores, e o
+            array de registros válidos.
+        """
+        validos = np.ones(len(inicios), dtype=bool)
+        comecos: List = []
+        finais: List = []
+        if ultimo < 0:
+            return comecos, finais, validos
+
+        base, topo = int(inicios[0]), int(fins[-1])
+        regiao = buffer[base:topo]
+        # O próprio `topo` entra como sentinela: "não há outra vírgula (ou aspas) no registro".
+        virgulas = np.append(np.flatnonzero(regiao == VIRGULA) + base, topo)
+        aspas = np.append(np.flatnonzero(regiao == ASPAS) + base, topo)
+
+        campo = inicios
+        for _ in range(ultimo + 1):
+            ausente = campo > fins
+            campo = np.minimum(campo, fins)
+            com_aspas = (campo < fins) & (buffer[np.minimum(campo, topo - 1)] == ASPAS)
+            fim_sem_aspas = np.minimum(virgulas[np.searchsorted(virgulas, campo)], fins)
+            fecha = aspas[np.minimum(np.searchsorted(aspas, campo, side="right"), len(aspas) - 1)]
+            seguinte = buffer[np.minimum(fecha + 1, topo - 1)]
+            fechado = (fecha < fins) & ((fecha + 1 == fins) | (seguinte == VIRGULA))
+            validos &= ~com_aspas | fechado
+
+            comecos.append(np.where(ausente, fins, np.where(com_aspas, campo + 1, campo)))
+            finais.append(np.where(ausente, fins, np.where(com_aspas, fecha, fim_sem_aspas)))
+            campo = np.where(com_aspas, fecha + 1, fim_sem_aspas) + 1
+            campo = np.where(ausente, fins + 1, campo)
+        return comecos, finais, validos
+
+    def _slices(self, comecos, finais) -> List[bytes]:
+        arquivo = self._mmap
+        return [arquivo[comeco:final] for comeco, final in zip(comecos.tolist(), finais.tolist())]
+
+    def _batches_find(self, columns: Dict[str, type], indices: Dict[str, int], ultimo: int, start: int):
+        """
+        Leitura em lotes sem numpy, registro a registro com `mmap.find`.
+        """
+        inicios: List[int] = []
+        fins: List[int] = []
+        valores: Dict[str, list] = {name: [] for name in columns}
+        for inicio, fim in self._records_find(start):
+            inicios.append(inicio)
+            fins.append(fim)
+            if columns:
+                campos = self.fields(inicio, fim, ultimo)
+                for name, tipo in columns.items():
+                    campo = campos[indices[name]]
+                    valores[name].append(campo if tipo is bytes else tipo(campo))
+            if len(inicios) == LOTE:
+                yield inicios, fins, valores
+                inicios, fins, valores = [], [], {name: [] for name in columns}
+        if inicios:
+            yield inicios, fins, valores
+
+    def _records_find(self, start: int) -> Iterator[Tuple[int, int]]:
+        arquivo = self._mmap
+        entre_aspas = False
+        inicio = posicao = start
+        while inicio < self._size:
+            nova_linha = arquivo.find(b"\n", posicao)
+            if nova_linha == -1:
+                nova_linha = self._size
+            aspas = arquivo.find(b'"', posicao, nova_linha)
+            while aspas != -1:
+                entre_aspas = not entre_aspas
+                aspas = arquivo.find(b'"', aspas + 1, nova_linha)
+            posicao = nova_linha + 1
+            if entre_aspas and nova_linha < self._size:
+                continue  # Quebra de linha dentro de um campo entre aspas
+            fim = nova_linha - 1 if nova_linha > inicio and arquivo[nova_linha - 1] == RETORNO else nova_linha
+            if fim > inicio:
+                yield inicio, fim
+            inicio = posicao
+
+
+def _parse_integers(buffer, comecos, finais):
+    """
+    Converte, de forma vetorizada, campos formados só por dígitos em inteiros.
+
+    Returns:
+        tuple: Os valores e o array que indica quais campos foram convertidos.
+    """
+    larguras = finais - comecos
+    convertidos = (larguras > 0) & (larguras <= 18)
+    valores = np.zeros(len(comecos), dtype=np.int64)
+    for posicao in range(int(larguras[convertidos].max(initial=0))):
+        ativos = convertidos & (posicao < larguras)
+        digitos = buffer[np.where(ativos, comecos + posicao, 0)].astype(np.int64) - ord("0")
+        convertidos &= ~ativos | ((digitos >= 0) & (digitos <= 9))
+        valores = np.where(ativos, valores * 10 + digitos, valores)
+    return valores, convertidos
+
+
+def _parse_floats(buffer, comecos, finais):
+    """
+    Converte, de forma vetorizada, campos numéricos em `float`, com o mesmo arredondamento de `float()`.
+
+    Os campos são copiados para uma matriz de largura fixa, interpretada como texto pelo numpy.
+
+    Returns:
+        tuple: Os valores e o array que indica quais campos foram convertidos.
+    """
+    larguras = finais - comecos
+    convertidos = (larguras > 0) & (larguras <= LARGURA_NUMERO)
+    largura = int(larguras[convertidos].max(initial=0))
+    if not largura:
+        return np.zeros(len(comecos)), convertidos
+    deslocamentos = np.arange(largura)
+    posicoes = comecos[:, None] + deslocamentos
+    dentro = convertidos[:, None] & (deslocamentos < larguras[:, None])
+    matriz = np.where(dentro, buffer[np.where(dentro, posicoes, 0)], 0).astype(np.uint8)
+    matriz[~convertidos, 0] = ord("0")  # Campos convertidos um a um depois pelo chamador
+    try:
+        valores = matriz.view(f"S{largura}").ravel().astype(np.float64)
+    except ValueError:  # Algum campo não é um número: todos são convertidos um a um
+        return np.zeros(len(comecos)), np.zeros(len(comecos), dtype=bool)
+    return valores, convertidos
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+
+
+class IdAllocator:
+    """
+    Alocador monotônico de IDs, seguro para uso concorrente.
+
+    O maior ID já entregue (high-water mark) é mantido em memória e gravado em um pequeno
+    arquivo auxiliar a cada reserva, de modo que IDs não são reaproveitados nem após a
+    exclusão do último registro ou o reinício do processo.
+
+    A cada reserva o arquivo auxiliar é relido, para que outro processo que compartilhe os
+    dados não entregue o mesmo ID. O chamador deve manter a trava de escrita do repositório
+    (`RepositoryLock`), que serializa as reservas entre processos.
+
+    Attributes:
+        sidecar_path (str): Caminho do arquivo com o maior ID já entregue.
+    """
+
+    def __init__(self, sidecar_path: str, max_id: int = 0):
+        """
+        Args:
+            sidecar_path (str): Caminho do arquivo com o maior ID já entregue.
+            max_id (int): Maior ID existente nos dados, usado se for maior que o do arquivo auxiliar.
+        """
+        self.sidecar_path = sidecar_path
+        self._lock = threading.Lock()
+        self._high_water_mark = max(self._read_sidecar(), max_id)
+
+    def next_id(self) -> int:
+        """
+        Reserva um único ID.
+
+        Returns:
+            int: O ID reservado.
+        """
+        return self.reserve(1).start
+
+    def reserve(self, quantidade: int) -> range:
+        """
+        Reserva um bloco contíguo de IDs, para inserções em lote.
+
+        Args:
+            quantidade (int): Quantidade de IDs a reservar.
+
+        Returns:
+            range: Os IDs reservados.
+        """
+        with self._lock:
+            self._high_water_mark = max(self._high_water_mark, self._read_sidecar())
+            inicio = self._high_water_mark + 1
+            self._high_water_mark += quantidade
+            self._write_sidecar(self._high_water_mark)
+        return range(inicio, inicio + quantidade)
+
+    def advance_to(self, max_id: int):
+        """
+        Garante que os próximos IDs sejam maiores que `max_id`.
+
+        Usado quando os dados são recarregados após uma alteração feita fora do processo.
+
+        Args:
+            max_id (int): Maior ID existente nos dados.
+        """
+        with self._lock:
+            self._high_water_mark = max(self._high_water_mark, self._read_sidecar())
+            if max_id > self._high_water_mark:
+                self._high_water_mark = max_id
+                self._write_sidecar(max_id)
+
+    def _read_sidecar(self) -> int:
+        try:
+            with open(self.sidecar_path, mode="r") as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_sidecar(self, valor: int):
+        """
+        Grava o arquivo auxiliar de forma atômica (temporário, `fsync` e `os.replace`), para
+        que outro processo nunca leia um arquivo vazio ou pela metade.
+        """
+        diretorio = os.path.dirname(os.path.abspath(self.sidecar_path))
+        fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="w") as file:
+                file.write(str(valor))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.sidecar_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
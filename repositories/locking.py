@@ -0,0 +1,178 @@
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, apenas a trava em memória
+    fcntl = None
+
+
+class RepositoryLock:
+    """
+    Trava de leitura e escrita de um repositório, válida entre threads e entre processos.
+
+    Dentro do processo, é uma trava leitores-escritor com preferência para escritores: várias
+    leituras simultâneas, ou uma única escrita. Entre processos (vários workers do uvicorn),
+    a mesma regra é aplicada com `fcntl.flock` em um arquivo auxiliar: compartilhado enquanto
+    houver leitores no processo, exclusivo durante uma escrita.
+
+    A trava não é reentrante: um método que a adquire não deve chamar outro que também a adquira.
+
+    Attributes:
+        lock_path (str): Caminho do arquivo usado na trava entre processos.
+    """
+
+    def __init__(self, lock_path: str):
+        """
+        Args:
+            lock_path (str): Caminho do arquivo usado na trava entre processos.
+        """
+        self.lock_path = lock_path
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._acquiring = False
+        self._fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644) if fcntl else None
+
+    @contextmanager
+    def read(self):
+        """
+        Adquire a trava para leitura.
+
+        O primeiro leitor do processo obtém a trava compartilhada entre processos em nome de
+        todos. Ele espera o `flock` fora da condição, marcado como pendente, para que as
+        threads que só vão liberar a trava não fiquem bloqueadas atrás de outro processo.
+        """
+        with self._condition:
+            while self._writer or self._writers_waiting or self._acquiring:
+                self._condition.wait()
+            primeiro = self._readers == 0
+            if primeiro:
+                self._acquiring = True
+            else:
+                self._readers += 1
+        if primeiro:
+            try:
+                self._flock(fcntl.LOCK_SH if fcntl else None)
+            except BaseException:
+                with self._condition:
+                    self._acquiring = False
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                self._acquiring = False
+                self._readers += 1
+                self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._flock(fcntl.LOCK_UN if fcntl else None)
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """
+        Adquire a trava para escrita, com exclusividade.
+        """
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers or self._acquiring:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            self._flock(fcntl.LOCK_EX if fcntl else None)
+            try:
+                yield
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        Fecha o arquivo da trava, para usos de curta duração (ferramentas de linha de comando).
+        Não deve ser chamado com a trava adquirida.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _flock(self, operacao: int | None):
+        if self._fd is not None:
+            fcntl.flock(self._fd, operacao)
+
+
+class KeyedLocks:
+    """
+    Travas por chave (por exemplo, por produto), para serializar apenas as operações que
+    disputam as mesmas chaves.
+
+    As chaves são distribuídas em um número fixo de travas (`stripes`), então a memória
+    não cresce com a quantidade de chaves. As travas de um conjunto de chaves são sempre
+    adquiridas em ordem crescente, o que evita deadlock entre operações concorrentes.
+
+    Com `lock_path`, cada trava também vale entre processos: a trava `n` é o byte `n` do
+    arquivo auxiliar, travado depois da trava em memória. No Linux são usadas travas de
+    descrição de arquivo aberto (`F_OFD_SETLKW`): as de `lockf` pertencem ao processo, e o
+    kernel acusaria deadlock entre threads diferentes que só parecem esperar umas pelas outras.
+
+    Attributes:
+        lock_path (str | None): Caminho do arquivo usado nas travas entre processos.
+    """
+
+    def __init__(self, stripes: int = 256, lock_path: str | None = None):
+        """
+        Args:
+            stripes (int): Quantidade de travas entre as quais as chaves são distribuídas.
+            lock_path (str | None): Arquivo usado nas travas entre processos; sem ele, as
+                travas valem apenas dentro do processo.
+        """
+        self.lock_path = lock_path
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644) if fcntl and lock_path else None
+
+    @contextmanager
+    def acquire(self, keys: Iterable[int]):
+        """
+        Adquire as travas de todas as chaves informadas.
+
+        Args:
+            keys (Iterable[int]): Chaves a travar.
+        """
+        adquiridas = []
+        try:
+            for posicao in sorted({hash(key) % len(self._locks) for key in keys}):
+                self._locks[posicao].acquire()
+                try:
+                    self._lockf(fcntl.LOCK_EX if fcntl else None, posicao)
+                except BaseException:
+                    self._locks[posicao].release()
+                    raise
+                adquiridas.append(posicao)
+            yield
+        finally:
+            for posicao in reversed(adquiridas):
+                self._lockf(fcntl.LOCK_UN if fcntl else None, posicao)
+                self._locks[posicao].release()
+
+    def _lockf(self, operacao: int | None, posicao: int):
+        if self._fd is None:
+            return
+        if not hasattr(fcntl, "F_OFD_SETLKW"):
+            fcntl.lockf(self._fd, operacao, 1, posicao)
+            return
+        tipo = fcntl.F_WRLCK if operacao == fcntl.LOCK_EX else fcntl.F_UNLCK
+        # struct flock: l_type, l_whence, l_start, l_len, l_pid
+        fcntl.fcntl(self._fd, fcntl.F_OFD_SETLKW, struct.pack("hhqqi4x", tipo, os.SEEK_SET, posicao, 1, 0))
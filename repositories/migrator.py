@@ -0,0 +1,82 @@
+import csv
+import sys
+
+from repositories.client_repository import ClientRepository
+from repositories.sale_repository import FIELDNAMES as SALE_FIELDNAMES, SaleRepository
+from repositories.sandal_repository import SandalRepository
+from repositories.sqlite_database import SqliteDatabase
+from repositories.sqlite_sale_repository import index_sale_produtos
+from utils.paths import CLIENT_CSV, SALE_CSV, SANDAL_CSV, SQLITE_DB
+
+
+INSERT_CLIENT = "INSERT INTO client (id, nome, celular, endereco) VALUES (:id, :nome, :celular, :endereco)"
+INSERT_SANDAL = (
+    "INSERT INTO sandal (id, codigo, nome, quantidade, valor, cor, tamanho) "
+    "VALUES (:id, :codigo, :nome, :quantidade, :valor, :cor, :tamanho)"
+)
+INSERT_SALE = (
+    "INSERT INTO sale (id, client, valor_total, produtos, snapshot) "
+    "VALUES (:id, :client, :valor_total, :produtos, NULLIF(:snapshot, ''))"
+)
+
+
+def migrate_csv_to_sqlite(
+    database: SqliteDatabase, client_csv: str, sandal_csv: str, sale_csv: str, force: bool = False
+) -> dict:
+    """
+    Importa os arquivos CSV dos repositórios para o banco SQLite em uma única transação.
+
+    Os logs de alterações de clientes, sandálias e vendas são compactados antes da leitura, para que
+    alterações ainda pendentes também sejam migradas. A migração só é feita com o banco vazio, a
+    menos que `force` seja informado, caso em que as tabelas são esvaziadas antes.
+
+    Args:
+        database (SqliteDatabase): Banco de destino.
+        client_csv (str): Caminho do CSV de clientes.
+        sandal_csv (str): Caminho do CSV de sandálias.
+        sale_csv (str): Caminho do CSV de vendas.
+        force (bool): Se `True`, substitui os dados já existentes no banco.
+
+    Returns:
+        dict: Quantidade de linhas importadas por tabela.
+
+    Raises:
+        ValueError: Se o banco já tiver dados e `force` for `False`.
+    """
+    ClientRepository(client_csv).compact()
+    SandalRepository(sandal_csv).compact()
+    SaleRepository(sale_csv, None, None).compact()
+
+    with open(client_csv, mode="r", newline="", encoding="utf-8") as file:
+        clients = list(csv.DictReader(file))
+    with open(sandal_csv, mode="r", newline="", encoding="utf-8") as file:
+        sandals = list(csv.DictReader(file))
+    with open(sale_csv, mode="r", newline="", encoding="utf-8") as file:
+        # Colunas explícitas: vendas antigas não têm a coluna `snapshot` (lida como None).
+        reader = csv.DictReader(file, fieldnames=SALE_FIELDNAMES)
+        next(reader, None)
+        sales = list(reader)
+
+    with database.transaction() as conn:
+        if not force:
+            for table in ("client", "sandal", "sale"):
+                if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    raise ValueError(f"A tabela {table} já possui dados")
+        conn.execute("DELETE FROM sale_produto")
+        conn.execute("DELETE FROM sale")
+        conn.execute("DELETE FROM sandal")
+        conn.execute("DELETE FROM client")
+        conn.executemany(INSERT_CLIENT, clients)
+        conn.executemany(INSERT_SANDAL, sandals)
+        conn.executemany(INSERT_SALE, sales)
+        for sale in sales:
+            index_sale_produtos(conn, int(sale["id"]), sale["produtos"])
+
+    return {"client": len(clients), "sandal": len(sandals), "sale": len(sales)}
+
+
+if __name__ == "__main__":
+    resultado = migrate_csv_to_sqlite(
+        SqliteDatabase(SQLITE_DB), CLIENT_CSV, SANDAL_CSV, SALE_CSV, force="--force" in sys.argv
+    )
+    print(resultado)
@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from typing import Dict, Iterable
+
+
+def to_centavos(valor) -> int:
+    """
+    Converte um valor em reais (número ou texto) para centavos.
+
+    Arredonda metades para longe do zero, como `ROUND` do SQLite, para que os agregados
+    calculados em Python e pelos gatilhos do banco coincidam.
+    """
+    centavos = float(valor) * 100
+    return int(centavos + 0.5) if centavos >= 0 else -int(-centavos + 0.5)
+
+
+class SaleAggregates:
+    """
+    Agregados das vendas mantidos de forma incremental: quantidade de vendas e receita total,
+    unidades vendidas por sandália e vendas e receita por cliente.
+
+    Cada venda gravada soma a sua contribuição (`add`) e cada venda excluída ou substituída a
+    desfaz (`remove`). Os valores ficam em centavos inteiros, para que somar e desfazer deltas
+    repetidamente não acumule erro de arredondamento.
+
+    Attributes:
+        vendas (int): Quantidade de vendas.
+        receita (int): Receita total, em centavos.
+        unidades (Counter): Unidades vendidas por ID de sandália.
+        clients (Dict[int, list]): `[vendas, receita em centavos]` por ID de cliente.
+    """
+
+    def __init__(self):
+        self.vendas = 0
+        self.receita = 0
+        self.unidades: Counter = Counter()
+        self.clients: Dict[int, list] = {}
+
+    def add(self, client: int, centavos: int, produtos: Iterable[int], sinal: int = 1):
+        """
+        Soma (ou, com `sinal=-1`, desfaz) a contribuição de uma venda.
+
+        Args:
+            client (int): ID do cliente da venda.
+            centavos (int): Valor total da venda, em centavos.
+            produtos (Iterable[int]): IDs das sandálias, um por unidade vendida.
+            sinal (int): `1` para somar, `-1` para desfazer.
+        """
+        self.vendas += sinal
+        self.receita += sinal * centavos
+        for sandal_id in produtos:
+            self.unidades[sandal_id] += sinal
+            if not self.unidades[sandal_id]:
+                del self.unidades[sandal_id]
+        totais = self.clients.setdefault(client, [0, 0])
+        totais[0] += sinal
+        totais[1] += sinal * centavos
+        if not totais[0]:
+            del self.clients[client]
+
+    def remove(self, client: int, centavos: int, produtos: Iterable[int]):
+        """
+        Desfaz a contribuição de uma venda, como `add(..., sinal=-1)`.
+        """
+        self.add(client, centavos, produtos, sinal=-1)
+
+    def clear(self):
+        """
+        Zera todos os agregados.
+        """
+        self.vendas = 0
+        self.receita = 0
+        self.unidades.clear()
+        self.clients.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            "vendas": self.vendas,
+            "receita": self.receita,
+            "unidades": {str(sandal_id): unidades for sandal_id, unidades in sorted(self.unidades.items())},
+            "clients": {str(client): totais for client, totais in sorted(self.clients.items())},
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "SaleAggregates":
+        aggregates = SaleAggregates()
+        aggregates.vendas = int(data["vendas"])
+        aggregates.receita = int(data["receita"])
+        aggregates.unidades.update({int(sandal_id): int(n) for sandal_id, n in data["unidades"].items()})
+        aggregates.clients = {int(client): [int(v), int(r)] for client, (v, r) in data["clients"].items()}
+        return aggregates
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SaleAggregates) and self.to_dict() == other.to_dict()
+
+    def save(self, file_path: str, signature: Iterable | None = None):
+        """
+        Grava os agregados em um arquivo JSON, substituindo o anterior de forma atômica.
+
+        Args:
+            file_path (str): Caminho do arquivo.
+            signature (Iterable | None): Assinatura dos dados dos quais os agregados foram
+                calculados, conferida por `load`.
+        """
+        dados = self.to_dict()
+        if signature is not None:
+            dados["signature"] = [list(item) for item in signature]
+        diretorio = os.path.dirname(os.path.abspath(file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="w") as file:
+                json.dump(dados, file, separators=(",", ":"))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def load(file_path: str, signature: Iterable | None = None) -> "SaleAggregates | None":
+        """
+        Lê os agregados gravados por `save`.
+
+        Args:
+            file_path (str): Caminho do arquivo.
+            signature (Iterable | None): Assinatura atual dos dados. Se informada, agregados
+                gravados com outra assinatura (desatualizados) são ignorados.
+
+        Returns:
+            SaleAggregates | None: Os agregados, ou `None` se o arquivo não existir, for inválido
+                ou estiver desatualizado.
+        """
+        try:
+            with open(file_path, mode="r") as file:
+                dados = json.load(file)
+            if signature is not None and dados.get("signature") != [list(item) for item in signature]:
+                return None
+            return SaleAggregates.from_dict(dados)
+        except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+            return None
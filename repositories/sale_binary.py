@@ -0,0 +1,358 @@
+"""
+Formato binário compacto para a tabela de vendas, com conversão de e para o CSV.
+
+Layout do arquivo (inteiros little-endian de 64 bits):
+
+    cabeçalho   MAGIC, base_id, slots, total de produtos, bytes de snapshot
+    registros   `slots` registros de largura fixa, um por ID de `base_id` a `base_id + slots - 1`:
+                id (0 = slot vazio), client, valor_total em centavos,
+                início e quantidade dos produtos, início e tamanho do snapshot
+    produtos    IDs das sandálias de todas as vendas, em sequência
+    snapshots   snapshots (JSON em UTF-8) de todas as vendas, em sequência
+
+O registro de uma venda fica em `cabeçalho + (id - base_id) * RECORD.size`, então a busca
+por ID é uma conta de endereço. O arquivo é lido com `mmap` e as colunas são expostas como
+`memoryview`, sem cópia.
+
+Uso:
+    python -m repositories.sale_binary to-binary <sale.csv> <sale.bin>
+    python -m repositories.sale_binary to-csv <sale.bin> <sale.csv>
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, List
+
+from repositories.base import SaleRepositoryBase
+from repositories.change_log import ChangeLog
+from repositories.csv_files import write_csv_atomic
+from repositories.csv_scan import CsvScan
+from repositories.locking import RepositoryLock
+from repositories.sale_aggregates import to_centavos
+from repositories.sale_repository import FIELDNAMES
+
+
+MAGIC = b"SALEBIN1"
+HEADER = struct.Struct("<8sqqqq")
+RECORD = struct.Struct("<7q")
+CAMPOS = RECORD.size // 8  # Inteiros por registro
+
+# Slots vazios tolerados por venda antes de recusar a conversão (IDs esparsos demais)
+MAX_SLOTS_POR_VENDA = 4
+
+
+def write_sale_binary(file_path: str, rows: Iterable[dict]) -> int:
+    """
+    Grava linhas de vendas no formato binário, de forma atômica.
+
+    Args:
+        file_path (str): Caminho do arquivo binário (substituído se existir).
+        rows (Iterable[dict]): Linhas no formato persistido pelos repositórios
+            (`id`, `client`, `valor_total`, `produtos` e, opcionalmente, `snapshot`).
+
+    Returns:
+        int: Quantidade de vendas gravadas.
+
+    Raises:
+        ValueError: Se os IDs forem esparsos demais para registros endereçados por ID.
+    """
+    rows = sorted(rows, key=lambda row: int(row["id"]))
+    base_id = int(rows[0]["id"]) if rows else 1
+    slots = int(rows[-1]["id"]) - base_id + 1 if rows else 0
+    if slots > MAX_SLOTS_POR_VENDA * len(rows) + 1024:
+        raise ValueError(f"IDs esparsos demais para o formato binário: {len(rows)} vendas em {slots} IDs")
+
+    registros = bytearray(slots * RECORD.size)  # Zeros: slots vazios
+    produtos = array("q")
+    snapshots = bytearray()
+    for row in rows:
+        sale_id = int(row["id"])
+        ids = SaleRepositoryBase._parse_produtos(str(row["produtos"]))
+        snapshot = (row.get("snapshot") or "").encode("utf-8")
+        RECORD.pack_into(
+            registros,
+            (sale_id - base_id) * RECORD.size,
+            sale_id,
+            int(row["client"]),
+            to_centavos(row["valor_total"]),
+            len(produtos),
+            len(ids),
+            len(snapshots),
+            len(snapshot),
+        )
+        produtos.extend(ids)
+        snapshots += snapshot
+    if sys.byteorder == "big":
+        produtos.byteswap()
+
+    diretorio = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode="wb") as file:
+            file.write(HEADER.pack(MAGIC, base_id, slots, len(produtos), len(snapshots)))
+            file.write(registros)
+            file.write(produtos.tobytes())
+            file.write(snapshots)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(rows)
+
+
+class SaleBinaryFile:
+    """
+    Leitura de um arquivo de vendas no formato binário, mapeado em memória com `mmap`.
+
+    As colunas são fatias `memoryview` do próprio mapeamento: ler uma venda ou percorrer
+    todas não copia o arquivo nem interpreta texto.
+
+    Attributes:
+        file_path (str): Caminho do arquivo binário.
+        base_id (int): ID da venda no primeiro registro.
+        slots (int): Quantidade de registros (IDs de `base_id` a `base_id + slots - 1`).
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path (str): Caminho do arquivo binário.
+
+        Raises:
+            ValueError: Se o arquivo não estiver no formato esperado.
+        """
+        if sys.byteorder == "big":
+            raise ValueError("O formato binário de vendas só é lido em máquinas little-endian")
+        self.file_path = file_path
+        with open(file_path, mode="rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.base_id, self.slots, total_produtos, total_snapshots = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{file_path} não é um arquivo binário de vendas")
+
+        inicio_produtos = HEADER.size + self.slots * RECORD.size
+        inicio_snapshots = inicio_produtos + total_produtos * 8
+        self._view = memoryview(self._mmap)
+        self._registros = self._view[HEADER.size:inicio_produtos].cast("q")
+        self._produtos = self._view[inicio_produtos:inicio_snapshots].cast("q")
+        self._snapshots = self._view[inicio_snapshots:inicio_snapshots + total_snapshots]
+        self._count: int | None = None
+
+    def __enter__(self) -> "SaleBinaryFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        if self._count is None:
+            ids = self._registros[0::CAMPOS]
+            self._count = len(ids) - ids.tolist().count(0)
+        return self._count
+
+    def close(self):
+        """
+        Libera as fatias e o mapeamento do arquivo.
+        """
+        for view in (self._registros, self._produtos, self._snapshots, self._view):
+            view.release()
+        self._mmap.close()
+
+    def columns(self) -> Dict[str, memoryview]:
+        """
+        Retorna as colunas do arquivo como `memoryview` de inteiros, sem cópia.
+
+        As colunas por registro (`id`, `client`, `valor_centavos`, `produtos_inicio`,
+        `produtos_quantidade`) têm um item por slot, com `id == 0` nos slots vazios;
+        `produtos` é o array de IDs de sandálias de todas as vendas. As fatias apontam para o
+        mapeamento e precisam ser liberadas antes de `close`.
+
+        Returns:
+            Dict[str, memoryview]: As colunas.
+        """
+        return {
+            "id": self._registros[0::CAMPOS],
+            "client": self._registros[1::CAMPOS],
+            "valor_centavos": self._registros[2::CAMPOS],
+            "produtos_inicio": self._registros[3::CAMPOS],
+            "produtos_quantidade": self._registros[4::CAMPOS],
+            "produtos": self._produtos,
+        }
+
+    def produtos(self, sale_id: int) -> memoryview | None:
+        """
+        IDs das sandálias de uma venda, como fatia do array de produtos (sem cópia).
+
+        Args:
+            sale_id (int): O ID da venda.
+
+        Returns:
+            memoryview | None: Os IDs, ou `None` se a venda não existir.
+        """
+        registro = self._registro(sale_id)
+        if registro is None:
+            return None
+        inicio, quantidade = registro[3], registro[4]
+        return self._produtos[inicio:inicio + quantidade]
+
+    def get(self, sale_id: int) -> dict | None:
+        """
+        Lê uma venda pelo ID, calculando a posição do registro a partir do ID.
+
+        Args:
+            sale_id (int): O ID da venda.
+
+        Returns:
+            dict | None: A linha da venda, no formato dos repositórios, ou `None` se não existir.
+        """
+        registro = self._registro(sale_id)
+        return self._row(registro) if registro is not None else None
+
+    def iter_rows(self) -> Iterator[dict]:
+        """
+        Percorre todas as vendas em ordem de ID.
+
+        Yields:
+            dict: Linhas das vendas, no formato dos repositórios.
+        """
+        # Cada coluna é convertida de uma vez; o laço só monta as linhas.
+        registros = self._registros.tolist()
+        produtos = self._produtos.tolist()
+        snapshots = self._snapshots
+        for posicao in range(0, len(registros), CAMPOS):
+            sale_id, client, centavos, inicio, quantidade, inicio_snapshot, tamanho_snapshot = registros[
+                posicao:posicao + CAMPOS
+            ]
+            if not sale_id:
+                continue
+            yield {
+                "id": sale_id,
+                "client": client,
+                "valor_total": centavos / 100,
+                "produtos": ",".join(map(str, produtos[inicio:inicio + quantidade])),
+                "snapshot": (
+                    str(snapshots[inicio_snapshot:inicio_snapshot + tamanho_snapshot], "utf-8")
+                    if tamanho_snapshot
+                    else ""
+                ),
+            }
+
+    def _registro(self, sale_id: int) -> list | None:
+        slot = sale_id - self.base_id
+        if not 0 <= slot < self.slots:
+            return None
+        registro = self._registros[slot * CAMPOS:(slot + 1) * CAMPOS].tolist()
+        return registro if registro[0] else None
+
+    def _row(self, registro: list) -> dict:
+        sale_id, client, centavos, inicio, quantidade, inicio_snapshot, tamanho_snapshot = registro
+        return {
+            "id": sale_id,
+            "client": client,
+            "valor_total": centavos / 100,
+            "produtos": ",".join(map(str, self._produtos[inicio:inicio + quantidade].tolist())),
+            "snapshot": str(self._snapshots[inicio_snapshot:inicio_snapshot + tamanho_snapshot], "utf-8"),
+        }
+
+
+def csv_to_binary(csv_path: str, binary_path: str) -> int:
+    """
+    Converte o CSV de vendas (com as alterações pendentes no log) para o formato binário.
+
+    Args:
+        csv_path (str): Caminho do CSV de vendas.
+        binary_path (str): Caminho do arquivo binário gerado.
+
+    Returns:
+        int: Quantidade de vendas convertidas.
+    """
+    return write_sale_binary(binary_path, _read_sale_rows(csv_path))
+
+
+def _read_sale_rows(csv_path: str) -> List[dict]:
+    """
+    Lê as vendas de um CSV aplicando as alterações pendentes no log, sem abrir um `SaleRepository`.
+
+    Nenhum arquivo é criado (trava, log, marca de IDs). Se o repositório já tem o arquivo de
+    trava, ela é adquirida para leitura enquanto o CSV é mapeado e o log é lido, para que um
+    processo usando os mesmos arquivos não compacte o CSV entre as duas leituras.
+
+    Args:
+        csv_path (str): Caminho do CSV de vendas.
+
+    Returns:
+        List[dict]: As vendas existentes, já atualizadas, como as linhas de `SaleRepository.iter_rows`.
+    """
+    lock_path, log_path = f"{csv_path}.lock", f"{csv_path}.log"
+    trava = RepositoryLock(lock_path) if os.path.exists(lock_path) else None
+    try:
+        with trava.read() if trava is not None else nullcontext():
+            scan = CsvScan(csv_path, FIELDNAMES)
+            alteracoes: Dict[int, dict | None] = {}
+            if os.path.exists(log_path):
+                for op, row in ChangeLog(log_path, FIELDNAMES).replay():
+                    sale_id = int(row["id"])
+                    alteracoes[sale_id] = None if op == ChangeLog.DELETE else {**row, "id": sale_id}
+    finally:
+        if trava is not None:
+            trava.close()
+
+    rows = []
+    with scan:
+        for inicio, fim in scan.records():
+            row = scan.row(inicio, fim)
+            sale_id = int(row["id"])
+            if sale_id in alteracoes:
+                row = alteracoes[sale_id]
+                if row is None:
+                    continue
+            rows.append(row)
+    return rows
+
+
+def binary_to_csv(binary_path: str, csv_path: str) -> int:
+    """
+    Converte um arquivo binário de vendas para o CSV usado por `SaleRepository`.
+
+    Args:
+        binary_path (str): Caminho do arquivo binário.
+        csv_path (str): Caminho do CSV gerado (substituído se existir).
+
+    Returns:
+        int: Quantidade de vendas convertidas.
+
+    Raises:
+        ValueError: Se o CSV de destino tiver alterações pendentes no log, que passariam a
+            valer sobre as vendas convertidas.
+    """
+    log_path = f"{csv_path}.log"
+    if os.path.exists(log_path) and len(ChangeLog(log_path, FIELDNAMES)):
+        raise ValueError(f"{csv_path} tem alterações pendentes em {log_path}; compacte-o ou remova-o antes")
+    with SaleBinaryFile(binary_path) as binario:
+        write_csv_atomic(csv_path, FIELDNAMES, binario.iter_rows())
+        return len(binario)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("direcao", choices=["to-binary", "to-csv"])
+    parser.add_argument("origem")
+    parser.add_argument("destino")
+    args = parser.parse_args(argv)
+
+    converter = csv_to_binary if args.direcao == "to-binary" else binary_to_csv
+    print(f"{converter(args.origem, args.destino)} vendas convertidas para {args.destino}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+from models import Sale
+from repositories.change_feed import ChangeFeedTruncatedError
+
+
+# Acima desta quantidade de alterações pendentes no feed, limpar o cache sai mais barato que
+# percorrê-las uma a uma
+LIMITE_SINCRONIZACAO = 10_000
+
+# (ID da venda, live)
+Chave = Tuple[int, bool]
+# (tabela, ID) de um registro no feed de alterações
+Dependencia = Tuple[str, int]
+
+
+class SaleCache:
+    """
+    Cache LRU, com tempo de vida, de vendas já montadas (cliente e produtos resolvidos).
+
+    Cada entrada é registrada em um mapa reverso de dependências: a venda, o cliente e cada
+    sandália gravados na venda apontam para as entradas que os usam. Antes de cada consulta o
+    cache lê as alterações novas do feed (`ChangeFeed` ou `SqliteChangeFeed`) e descarta as
+    entradas que dependem de algum registro alterado. Como o feed recebe todas as escritas,
+    inclusive a baixa de estoque das vendas e as de outros processos, nenhuma entrada sobrevive
+    a uma alteração dos dados de que depende.
+
+    As vendas guardadas são compartilhadas entre as consultas e não devem ser alteradas.
+
+    Attributes:
+        change_feed (ChangeFeed | SqliteChangeFeed): Feed de alterações dos repositórios.
+        max_size (int): Quantidade máxima de vendas guardadas.
+        ttl (float): Tempo de vida de cada entrada, em segundos.
+        hits (int): Consultas respondidas pelo cache.
+        misses (int): Consultas que precisaram montar a venda.
+        evictions (int): Entradas descartadas por falta de espaço (a menos usada recentemente).
+        expirations (int): Entradas descartadas por terem passado do tempo de vida.
+        invalidations (int): Entradas descartadas por alteração da venda, do cliente ou de um produto.
+    """
+
+    def __init__(self, change_feed, max_size: int = 1024, ttl: float = 300.0):
+        """
+        Args:
+            change_feed (ChangeFeed | SqliteChangeFeed): Feed de alterações dos repositórios.
+            max_size (int): Quantidade máxima de vendas guardadas.
+            ttl (float): Tempo de vida de cada entrada, em segundos.
+        """
+        self.change_feed = change_feed
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Chave, Tuple[Sale, float]] = OrderedDict()
+        self._dependentes: Dict[Dependencia, Set[Chave]] = {}
+        self._dependencias: Dict[Chave, Set[Dependencia]] = {}
+        self._versao = change_feed.version
+
+    def get_or_load(
+        self,
+        sale_id: int,
+        live: bool,
+        carregar: Callable[[], Tuple[Sale, Iterable[Dependencia]] | None],
+    ) -> Sale | None:
+        """
+        Retorna a venda do cache ou a monta com `carregar`, guardando o resultado.
+
+        Args:
+            sale_id (int): O ID da venda.
+            live (bool): Se a venda é montada com os dados atuais mesmo que tenha snapshot.
+            carregar (Callable[[], Tuple[Sale, Iterable[Dependencia]] | None]): Monta a venda a
+                partir do repositório e informa os registros `(tabela, ID)` de que ela depende,
+                ou retorna `None` se a venda não existir.
+
+        Returns:
+            Sale | None: A venda, ou `None` se não for encontrada (resultado que não é guardado).
+        """
+        chave = (sale_id, live)
+        with self._lock:
+            self._sync()
+            versao = self._versao
+            entrada = self._entries.get(chave)
+            if entrada is not None:
+                if entrada[1] > time.monotonic():
+                    self._entries.move_to_end(chave)
+                    self.hits += 1
+                    return entrada[0]
+                self._remove(chave)
+                self.expirations += 1
+            self.misses += 1
+
+        carregada = carregar()
+        if carregada is None:
+            return None
+        sale, dependencias = carregada
+        with self._lock:
+            # Uma alteração lida do feed enquanto a venda era montada pode não ter encontrado
+            # esta entrada para invalidar; nesse caso a venda montada não é guardada.
+            if self._versao == versao and chave not in self._entries:
+                self._store(chave, sale, set(dependencias))
+        return sale
+
+    def stats(self) -> dict:
+        """
+        Estado e contadores do cache.
+
+        Returns:
+            dict: `size`, `max_size`, `ttl`, `hits`, `misses`, `evictions`, `expirations`,
+                `invalidations` e `versao` (última versão do feed aplicada).
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "versao": self._versao,
+            }
+
+    def clear(self):
+        """
+        Descarta todas as entradas, sem zerar os contadores.
+        """
+        with self._lock:
+            self._clear()
+
+    def _sync(self):
+        """
+        Aplica as alterações registradas no feed desde a última sincronização.
+        Deve ser chamado com `_lock` adquirida.
+        """
+        versao = self.change_feed.version
+        if versao == self._versao:
+            return
+        if versao < self._versao or versao - self._versao > LIMITE_SINCRONIZACAO:
+            self._clear()
+        else:
+            try:
+                for _, tabela, _, record_id in self.change_feed.since(self._versao, versao):
+                    for chave in list(self._dependentes.get((tabela, record_id), ())):
+                        self._remove(chave)
+                        self.invalidations += 1
+            except ChangeFeedTruncatedError:
+                # As alterações desde a última sincronização já saíram do feed.
+                self._clear()
+        self._versao = versao
+
+    def _store(self, chave: Chave, sale: Sale, dependencias: Set[Dependencia]):
+        self._entries[chave] = (sale, time.monotonic() + self.ttl)
+        self._dependencias[chave] = dependencias
+        for dependencia in dependencias:
+            self._dependentes.setdefault(dependencia, set()).add(chave)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, chave: Chave):
+        del self._entries[chave]
+        for dependencia in self._dependencias.pop(chave):
+            dependentes = self._dependentes.get(dependencia)
+            if dependentes is not None:
+                dependentes.discard(chave)
+                if not dependentes:
+                    del self._dependentes[dependencia]
+
+    def _clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._dependentes.clear()
+        self._dependencias.clear()
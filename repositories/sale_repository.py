@@ -1,52 +1,278 @@
+import bisect
 import csv
-from typing import List
-import pandas as pd
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
 
-from models import Sale, Sandal, Client
+from models import Sale
+from repositories.base import SaleRepositoryBase, bulk_result
+from repositories.change_feed import ChangeFeed
+from repositories.change_log import ChangeLog
+from repositories.csv_files import (
+    append_csv_rows,
+    discard_temp,
+    file_id,
+    file_signature,
+    replace_csv,
+    signature_version,
+    write_csv_atomic,
+    write_csv_temp,
+)
+from repositories.csv_scan import CsvScan
+from repositories.id_allocator import IdAllocator
+from repositories.locking import KeyedLocks, RepositoryLock
+from repositories.sale_aggregates import SaleAggregates, to_centavos
+from repositories.sale_cache import SaleCache
+from repositories.secondary_index import SecondaryIndex
 
 
-class SaleRepository:
+FIELDNAMES = ["id", "client", "valor_total", "produtos", "snapshot"]
+
+logger = logging.getLogger(__name__)
+
+
+class SaleRepository(SaleRepositoryBase):
     """
     Repositório de vendas que interage com um arquivo CSV para armazenar,
     recuperar, atualizar e excluir informações de vendas.
 
+    Novas vendas são anexadas ao CSV. Atualizações e exclusões são anexadas a um log
+    (`<arquivo>.log`) como upserts e tombstones, mantidos também em memória e mesclados
+    sobre o CSV nas leituras. Quando o log atinge `compact_threshold` entradas, uma thread
+    em segundo plano regrava o CSV de forma atômica e esvazia o log.
+
+    A posição (offset) de cada linha no CSV também é mantida em memória, o que permite
+    iniciar uma listagem paginada diretamente na primeira venda após o cursor e ler uma
+    venda pelo ID sem percorrer o arquivo. Índices secundários cliente -> vendas e
+    sandália -> vendas são reconstruídos na inicialização e atualizados a cada escrita, assim
+    como os agregados das vendas (`SaleAggregates`). Os agregados são gravados em
+    `<arquivo>.aggregates` apenas na compactação e em `close`, junto com a assinatura dos
+    arquivos, e conferidos com o recálculo completo na inicialização.
+
+    Leituras e escritas são coordenadas por uma `RepositoryLock` (`<arquivo>.lock`), também
+    entre processos. Se o CSV ou o log forem alterados por outro processo, o estado em memória
+    é reconstruído antes da próxima operação.
+
+    Toda escrita movimenta o estoque por `SandalRepository.reserve_stock`, que registra a
+    variação no log de sandálias antes da gravação da venda e a confirma depois. Atualizações
+    e exclusões também adquirem a trava da venda (`<arquivo>.ids.lock`, também entre
+    processos), para que as unidades lidas antes da gravação continuem valendo até ela.
+
     Attributes:
         file_path (str): Caminho para o arquivo CSV onde os dados das vendas são armazenados.
+        change_log (ChangeLog): Log de atualizações e exclusões ainda não compactadas.
+        id_allocator (IdAllocator): Alocador dos IDs de novas vendas.
+        compact_threshold (int): Número de entradas do log que dispara a compactação.
         client_repository (ClientRepository): Repositório de clientes para buscar dados dos clientes.
         sandal_repository (SandalRepository): Repositório de sandálias para buscar dados das sandálias.
+        change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
+        cache (SaleCache | None): Cache das vendas buscadas pelo ID.
     """
 
-    def __init__(self, file_path: str, sandal_repository, client_repository):
+    def __init__(
+        self,
+        file_path: str,
+        sandal_repository,
+        client_repository,
+        compact_threshold: int = 1000,
+        snapshots: bool = False,
+        change_feed: ChangeFeed | None = None,
+        cache: SaleCache | None = None,
+    ):
         """
         Args:
             file_path (str): Caminho para o arquivo CSV onde os dados das vendas serão lidos e escritos.
             sandal_repository (SandalRepository): Repositório de sandálias para realizar operações de pesquisa.
             client_repository (ClientRepository): Repositório de clientes para realizar operações de pesquisa.
+            compact_threshold (int): Número de entradas do log que dispara a compactação.
+            snapshots (bool): Se as vendas gravadas levam o snapshot de cliente e produtos.
+            change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
+            cache (SaleCache | None): Cache das vendas buscadas pelo ID, invalidado pelo feed de
+                alterações.
         """
-        self.client_repository = client_repository
-        self.sandal_repository = sandal_repository
+        super().__init__(sandal_repository, client_repository, snapshots, cache)
         self.file_path = file_path
+        self.change_feed = change_feed
+        self.compact_threshold = compact_threshold
+        self._lock = RepositoryLock(f"{file_path}.lock")
+        self._sale_locks = KeyedLocks(lock_path=f"{file_path}.ids.lock")
+        self._compaction: threading.Thread | None = None
+        self._compaction_lock = threading.Lock()
+        self._compacting = threading.Lock()
         self._initialize_csv()  # Garantir que o arquivo CSV tenha cabeçalhos
+        self.change_log = ChangeLog(f"{file_path}.log", FIELDNAMES)
+        self._overlay: Dict[int, dict | None] = {}
+        self._ids: Set[int] = set()
+        self._row_ids: List[int] = []
+        self._row_offsets: List[int] = []
+        self._ordered = True
+        self._refs: Dict[int, Tuple[int, int, Tuple[int, ...]]] = {}
+        self._by_client = SecondaryIndex()
+        self._by_sandal = SecondaryIndex()
+        self._aggregates = SaleAggregates()
+        self._aggregates_path = f"{file_path}.aggregates"
+        with self._lock.write():
+            self._load_state()
+            self._verify_aggregates()
+            self._update_signature()
+        self.id_allocator = IdAllocator(f"{file_path}.hwm", self._max_id())
+        if sandal_repository is not None:
+            self._resolve_reservations()
 
     def _initialize_csv(self):
         """
         Inicializa o arquivo CSV com cabeçalhos, caso esteja vazio.
 
         Este método cria o arquivo CSV com os cabeçalhos necessários para armazenar informações de vendas
-        caso o arquivo não exista.
+        caso o arquivo não exista. Um arquivo de uma versão anterior, sem alguma das colunas atuais,
+        é regravado com o cabeçalho novo (as colunas ausentes ficam vazias).
         """
         try:
-            with open(self.file_path, mode="x", newline="") as file:
-                writer = csv.DictWriter(
-                    file, fieldnames=["id", "client", "valor_total", "produtos"]
-                )
+            with open(self.file_path, mode="x", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
                 writer.writeheader()
         except FileExistsError:
-            pass  # O arquivo já existe, então não precisamos fazer nada
+            with open(self.file_path, mode="r", newline="", encoding="utf-8") as file:
+                cabecalho = next(csv.reader(file), [])
+                if cabecalho and cabecalho != FIELDNAMES:
+                    rows = list(csv.DictReader(file, fieldnames=cabecalho))
+                else:
+                    return
+            with self._lock.write():
+                write_csv_atomic(self.file_path, FIELDNAMES, rows)
+
+    def _load_state(self):
+        """
+        Carrega o log pendente em memória, o conjunto de IDs das vendas existentes, os
+        índices secundários por cliente e por sandália e os agregados.
+        """
+        self._overlay = {}
+        for op, row in self.change_log.replay():
+            sale_id = int(row["id"])
+            self._overlay[sale_id] = None if op == ChangeLog.DELETE else {**row, "id": sale_id}
+        self._refs = {}
+        self._by_client.clear()
+        self._by_sandal.clear()
+        self._aggregates.clear()
+        self._index_offsets()
+        for sale_id, row in self._overlay.items():
+            if row is None:
+                self._unindex_sale(sale_id)
+            else:
+                self._index_sale(row)
+        self._ids = {
+            sale_id for sale_id in self._row_ids if self._overlay.get(sale_id, True) is not None
+        }
+
+    def _index_sale(self, row: dict):
+        """
+        Registra a venda nos índices por cliente e por sandália e soma a sua contribuição aos
+        agregados, substituindo o registro anterior.
+
+        Args:
+            row (dict): Linha da venda.
+        """
+        self._index_refs(
+            int(row["id"]),
+            int(row["client"]),
+            to_centavos(row["valor_total"]),
+            tuple(self._parse_produtos(str(row["produtos"]))),
+        )
+
+    def _index_refs(self, sale_id: int, client: int, centavos: int, produtos: Tuple[int, ...]):
+        """
+        Registra nos índices e nos agregados os campos já convertidos de uma venda,
+        substituindo o registro anterior.
+        """
+        self._unindex_sale(sale_id)
+        self._refs[sale_id] = (client, centavos, produtos)
+        self._by_client.add(client, sale_id)
+        self._by_sandal.update(set(produtos), sale_id)
+        self._aggregates.add(client, centavos, produtos)
+
+    def _unindex_sale(self, sale_id: int):
+        """
+        Remove a venda dos índices por cliente e por sandália e desfaz a sua contribuição aos agregados.
+
+        Args:
+            sale_id (int): O ID da venda.
+        """
+        refs = self._refs.pop(sale_id, None)
+        if refs is not None:
+            client, centavos, produtos = refs
+            self._by_client.remove(client, sale_id)
+            self._by_sandal.discard(set(produtos), sale_id)
+            self._aggregates.remove(client, centavos, produtos)
+
+    def _verify_aggregates(self):
+        """
+        Confere os agregados gravados com os recalculados a partir das vendas e regrava o
+        arquivo se divergirem. Deve ser chamado com a trava de escrita adquirida.
+
+        Agregados gravados antes das últimas escritas (com outra assinatura dos arquivos) são
+        apenas substituídos; a divergência só é registrada quando a assinatura coincide.
+        """
+        gravados = SaleAggregates.load(self._aggregates_path, self._file_signature())
+        if gravados == self._aggregates:
+            return
+        if gravados is not None:
+            logger.warning("Agregados de %s divergem do recálculo; arquivo regravado", self.file_path)
+        self._save_aggregates()
+
+    def _save_aggregates(self):
+        """
+        Grava os agregados com a assinatura atual dos arquivos. Deve ser chamado com a trava
+        de escrita adquirida.
+        """
+        self._aggregates.save(self._aggregates_path, self._file_signature())
+
+    def _max_id(self) -> int:
+        return max([*self._ids, *self._overlay], default=0)
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados, derivada da assinatura do CSV e do log: muda também quando outro
+        processo altera os arquivos.
+        """
+        self._refresh()
+        return signature_version(self._signature)
+
+    def _update_signature(self):
+        """
+        Registra a assinatura atual dos arquivos após uma escrita ou recarga, mudando `version`.
+        """
+        self._signature = self._file_signature()
+
+    def _refresh(self):
+        """
+        Reconstrói o estado em memória caso o CSV ou o log tenham sido alterados fora deste processo.
+
+        Usado antes das leituras; adquire a trava de escrita apenas se houver o que recarregar.
+        """
+        if self._file_signature() != self._signature:
+            with self._lock.write():
+                self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        """
+        Reconstrói o estado se o CSV ou o log mudaram. Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._file_signature() == self._signature:
+            return
+        self.change_log.recount()
+        self._load_state()
+        self._update_signature()
+        self.id_allocator.advance_to(self._max_id())
+
+    def _file_signature(self):
+        return file_signature(self.file_path, self.change_log.file_path)
 
     def create(self, sale: Sale) -> Sale:
         """
-        Cria uma nova venda e a persiste no arquivo CSV.
+        Cria uma nova venda dando baixa no estoque, como `create_sale`.
 
         Args:
             sale (Sale): Objeto `Sale` com os dados da venda a ser criada.
@@ -54,50 +280,225 @@ class SaleRepository:
         Returns:
             Sale: A venda criada com um ID atribuído.
         """
-        sale.id = self._get_next_id()
-        produtos_dict = self._produto_dict(sale.produtos)
-        sale_dict = {
-            "id": sale.id,
-            "client": sale.client.id,
-            "valor_total": sale.valor_total,
-            "produtos": produtos_dict,
-        }
-        with open(self.file_path, mode="a", newline="") as file:
-            writer = csv.DictWriter(
-                file, fieldnames=["id", "client", "valor_total", "produtos"]
-            )
-            writer.writerow(sale_dict)
+        return self.create_sale(sale)
+
+    def create_sale(self, sale: Sale) -> Sale:
+        """
+        Cria uma venda dando baixa no estoque de cada produto, tudo ou nada.
+
+        O ID da venda é reservado primeiro. A baixa é feita em `SandalRepository.reserve_stock`,
+        que trava apenas os produtos da venda (também entre processos), confere todo o estoque e
+        registra a baixa no log de sandálias com o ID da venda antes de a venda ser gravada. Com
+        a venda gravada (com `fsync`) a baixa é confirmada; se a gravação falhar, o estoque é
+        devolvido antes de liberar as travas. Se o processo parar no meio, a baixa é concluída
+        ou desfeita na próxima inicialização, conforme a venda exista ou não.
+
+        Args:
+            sale (Sale): Objeto `Sale` com os dados da venda a ser criada.
+
+        Returns:
+            Sale: A venda criada com um ID atribuído.
+
+        Raises:
+            ValueError: Se o cliente ou algum produto não existir, ou se a venda for inválida.
+            InsufficientStockError: Se algum produto não tiver estoque suficiente.
+        """
+        erro = self._validate_many([sale])[0]
+        if erro:
+            raise ValueError(erro)
+        unidades = self._quantidades(sale)
+        snapshot = self._snapshots([sale])[0]
+        with self._lock.write():
+            self._reload_if_changed()
+            sale.id = self.id_allocator.next_id()
+        with self.sandal_repository.reserve_stock({sale.id: (self._stock_deltas({}, unidades), unidades)}):
+            with self._lock.write():
+                self._reload_if_changed()
+                self._append(sale, snapshot)
         return sale
 
-    def search_por_id(self, sale_id: int) -> Sale | None:
+    def _append(self, sale: Sale, snapshot: str):
+        """
+        Anexa ao CSV, com `fsync`, uma venda com ID já reservado e atualiza o estado em memória.
+        Deve ser chamado com a trava de escrita adquirida.
+        """
+        inicio = os.path.getsize(self.file_path)
+        append_csv_rows(self.file_path, FIELDNAMES, [self._to_row(sale, snapshot)])
+        self._index_offsets(inicio)
+        self._ids.add(sale.id)
+        self._update_signature()
+        self._record_changes(ChangeFeed.UPSERT, [sale.id])
+
+    def _resolve_reservations(self):
+        """
+        Conclui ou desfaz as movimentações de estoque de vendas interrompidas antes da
+        confirmação: a movimentação é mantida se a venda foi gravada, e desfeita caso contrário.
+        """
+        for venda in self.sandal_repository.pending_reservations():
+            self.sandal_repository.resolve_reservation(venda, self._committed)
+
+    def _committed(self, sale_id: int, unidades: Dict[int, int]) -> bool:
+        """
+        Informa se a venda gravada tem as unidades que uma movimentação de estoque esperava.
+        """
+        self._refresh()
+        with self._lock.read():
+            atuais = self._units(sale_id)
+        return all(atuais.get(sandal_id, 0) == quantidade for sandal_id, quantidade in unidades.items())
+
+    def _units(self, sale_id: int) -> Dict[int, int]:
+        """
+        Unidades de cada sandália em uma venda existente (vazio se ela não existir). Deve ser
+        chamado com a trava adquirida.
+        """
+        refs = self._refs.get(sale_id)
+        return dict(Counter(refs[2])) if refs is not None else {}
+
+    def create_many(self, sales: List[Sale]) -> List[dict]:
+        """
+        Cria várias vendas com uma única reserva de IDs, uma única movimentação de estoque e
+        uma única escrita no CSV.
+
+        As vendas sem estoque são recusadas individualmente, com o resultado `conflict`.
+
+        Args:
+            sales (List[Sale]): Vendas a serem criadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sales)
+        validas = [sale for sale, erro in zip(sales, erros) if erro is None]
+        snapshots = self._snapshots(validas)
+        with self._lock.write():
+            self._reload_if_changed()
+            for sale, sale_id in zip(validas, self.id_allocator.reserve(len(validas))):
+                sale.id = sale_id
+        reservas = {}
+        for sale in validas:
+            unidades = self._quantidades(sale)
+            reservas[sale.id] = (self._stock_deltas({}, unidades), unidades)
+
+        with self.sandal_repository.reserve_stock(reservas, parcial=True) as recusadas:
+            gravadas = [
+                (sale, snapshot) for sale, snapshot in zip(validas, snapshots) if sale.id not in recusadas
+            ]
+            with self._lock.write():
+                self._reload_if_changed()
+                inicio = os.path.getsize(self.file_path)
+                append_csv_rows(
+                    self.file_path, FIELDNAMES, [self._to_row(sale, snapshot) for sale, snapshot in gravadas]
+                )
+                self._index_offsets(inicio)
+                self._ids.update(sale.id for sale, _ in gravadas)
+                self._update_signature()
+                self._record_changes(ChangeFeed.UPSERT, [sale.id for sale, _ in gravadas])
+
+        resultados = []
+        for index, (sale, erro) in enumerate(zip(sales, erros)):
+            if erro:
+                resultados.append(bulk_result(index, "error", detail=erro))
+            elif sale.id in recusadas:
+                resultados.append(self._stock_error(index, recusadas[sale.id]))
+            else:
+                resultados.append(bulk_result(index, "created", sale.id))
+        return resultados
+
+    def upsert_many(self, sales: List[Sale]) -> List[dict]:
+        """
+        Atualiza as vendas cujo ID já existe (via log) e cria as demais no CSV,
+        com uma escrita por arquivo.
+
+        A diferença entre os produtos antigos e os novos de cada venda é aplicada ao estoque
+        com uma única movimentação; as vendas sem estoque recebem o resultado `conflict`.
+
+        Args:
+            sales (List[Sale]): Vendas a serem gravadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sales, upsert=True)
+        snapshots = self._snapshots(sales)
+        validas = [
+            (index, sale, snapshot)
+            for index, (sale, erro, snapshot) in enumerate(zip(sales, erros, snapshots))
+            if erro is None
+        ]
+        status: Dict[int, str] = {}
+        reservas = {}
+        with self._sale_locks.acquire(sale.id for _, sale, _ in validas if sale.id > 0):
+            with self._lock.write():
+                self._reload_if_changed()
+                for _, sale, _ in validas:
+                    if sale.id > 0:
+                        self.id_allocator.advance_to(sale.id)
+                    else:
+                        sale.id = self.id_allocator.next_id()
+                    status[sale.id] = "updated" if sale.id in self._ids else "created"
+                    unidades = self._quantidades(sale)
+                    reservas[sale.id] = (self._stock_deltas(self._units(sale.id), unidades), unidades)
+
+            with self.sandal_repository.reserve_stock(reservas, parcial=True) as recusadas:
+                novas: List[dict] = []
+                alteradas: List[dict] = []
+                with self._lock.write():
+                    self._reload_if_changed()
+                    for _, sale, snapshot in validas:
+                        if sale.id in recusadas:
+                            continue
+                        row = self._to_row(sale, snapshot)
+                        if sale.id in self._ids or sale.id in self._overlay:
+                            # A venda está no CSV (mesmo que excluída no log): o log a sobrescreve.
+                            alteradas.append(row)
+                            self._overlay[sale.id] = row
+                            self._index_sale(row)
+                        else:
+                            novas.append(row)
+                        self._ids.add(sale.id)
+
+                    if novas:
+                        inicio = os.path.getsize(self.file_path)
+                        append_csv_rows(self.file_path, FIELDNAMES, novas)
+                        self._index_offsets(inicio)
+                    if alteradas:
+                        self.change_log.append_upserts(alteradas)
+                    self._update_signature()
+                    self._record_changes(ChangeFeed.UPSERT, [row["id"] for row in novas + alteradas])
+        self._compact_if_needed()
+
+        resultados = [bulk_result(index, "error", detail=erro) for index, erro in enumerate(erros)]
+        for index, sale, _ in validas:
+            if sale.id in recusadas:
+                resultados[index] = self._stock_error(index, recusadas[sale.id])
+            else:
+                resultados[index] = bulk_result(index, status[sale.id], sale.id)
+        return resultados
+
+    def search_por_id(self, sale_id: int, live: bool = False) -> Sale | None:
         """
         Busca uma venda pelo ID.
 
         Args:
             sale_id (int): O ID da venda a ser buscada.
+            live (bool): Se `True`, monta a venda com os dados atuais mesmo que ela tenha snapshot.
 
         Returns:
             Sale | None: A venda encontrada, ou `None` se não for encontrada.
         """
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sale_id:
-                    produtos = self._search_produtos(
-                        list(map(int, row["produtos"].split(",")))
-                    )
-                    client = self._bucar_client(int(row["client"]))
-                    return Sale(
-                        id=row["id"],
-                        client=client,
-                        valor_total=row["valor_total"],
-                        produtos=produtos,
-                    )
-        return None
+        def ler() -> List[dict]:
+            self._refresh()
+            with self._lock.read():
+                return self._read_rows([sale_id]) if sale_id in self._ids else []
+
+        return self._search_cached(sale_id, live, ler)
 
     def update(self, sale: Sale) -> Sale:
         """
-        Atualiza os dados de uma venda no arquivo CSV.
+        Atualiza os dados de uma venda, registrando a alteração no log.
+
+        A diferença entre os produtos antigos e os novos é aplicada ao estoque antes da
+        gravação, como em `create_sale`.
 
         Args:
             sale (Sale): Objeto `Sale` contendo os dados atualizados da venda.
@@ -106,40 +507,36 @@ class SaleRepository:
             Sale: A venda atualizada.
 
         Raises:
-            ValueError: Se a venda não for encontrada.
-        """
-        sales = []
-        updated: bool = False
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sale.id:
-                    produtos_dict = self._produto_dict(sale.produtos)
-                    sale_dict = {
-                        "id": sale.id,
-                        "client": sale.client.id,
-                        "valor_total": sale.valor_total,
-                        "produtos": produtos_dict,
-                    }
-                    sales.append(sale_dict)
-                    updated = True
-                else:
-                    sales.append(row)
-
-        with open(self.file_path, mode="w", newline="") as file:
-            writer = csv.DictWriter(
-                file, fieldnames=["id", "client", "valor_total", "produtos"]
-            )
-            writer.writeheader()
-            writer.writerows(sales)
-
-        if not updated:
-            raise ValueError("User not found")
+            ValueError: Se a venda não for encontrada, ou se o cliente ou algum produto não existir.
+            InsufficientStockError: Se algum produto não tiver estoque suficiente.
+        """
+        erro = self._validate_many([sale])[0]
+        if erro:
+            raise ValueError(erro)
+        unidades = self._quantidades(sale)
+        snapshot = self._snapshots([sale])[0]
+        with self._sale_locks.acquire([sale.id]):
+            self._refresh()
+            with self._lock.read():
+                if sale.id not in self._ids:
+                    raise ValueError("User not found")
+                deltas = self._stock_deltas(self._units(sale.id), unidades)
+            with self.sandal_repository.reserve_stock({sale.id: (deltas, unidades)}):
+                with self._lock.write():
+                    self._reload_if_changed()
+                    row = self._to_row(sale, snapshot)
+                    self.change_log.append_upsert(row)
+                    self._overlay[sale.id] = row
+                    self._index_sale(row)
+                    self._update_signature()
+                    self._record_changes(ChangeFeed.UPSERT, [sale.id])
+        self._compact_if_needed()
         return sale
 
     def delete(self, sale_id: int) -> bool:
         """
-        Exclui uma venda pelo ID.
+        Exclui uma venda pelo ID, registrando um tombstone no log e devolvendo as suas unidades
+        ao estoque.
 
         Args:
             sale_id (int): O ID da venda a ser excluída.
@@ -147,115 +544,527 @@ class SaleRepository:
         Returns:
             bool: `True` se a venda foi excluída com sucesso, `False` caso contrário.
         """
-        sales: List[dict] = []
-        deleted: bool = False
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sale_id:
-                    deleted = True
-                else:
-                    sales.append(row)
+        with self._sale_locks.acquire([sale_id]):
+            self._refresh()
+            with self._lock.read():
+                if sale_id not in self._ids:
+                    return False
+                deltas = self._stock_deltas(self._units(sale_id), {})
+            with self.sandal_repository.reserve_stock({sale_id: (deltas, {})}):
+                with self._lock.write():
+                    self._reload_if_changed()
+                    self.change_log.append_delete(sale_id)
+                    self._overlay[sale_id] = None
+                    self._ids.discard(sale_id)
+                    self._unindex_sale(sale_id)
+                    self._update_signature()
+                    self._record_changes(ChangeFeed.DELETE, [sale_id])
+        self._compact_if_needed()
+        return True
+
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        client: int | None = None,
+        valor_min: float | None = None,
+        valor_max: float | None = None,
+        live: bool = False,
+    ) -> List[Sale]:
+        """
+        Lista as vendas em ordem de ID, com paginação por cursor e filtros opcionais.
+
+        A leitura começa na primeira linha após o cursor (usando os offsets em memória)
+        e termina assim que `limit` vendas compatíveis com os filtros são encontradas.
+
+        Args:
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            client (int | None): Filtra pelo ID do cliente.
+            valor_min (float | None): Valor total mínimo.
+            valor_max (float | None): Valor total máximo.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
+
+        Returns:
+            List[Sale]: Lista de objetos `Sale` encontrados.
+        """
+        if client is not None and valor_min is None and valor_max is None:
+            return self.list_by_client(client, limit, cursor, live)
 
-        with open(self.file_path, mode="w", newline="") as file:
-            writer = csv.DictWriter(
-                file, fieldnames=["id", "client", "valor_total", "produtos"]
-            )
-            writer.writeheader()
-            writer.writerows(sales)
+        def where(row: dict) -> bool:
+            if client is not None and int(row["client"]) != client:
+                return False
+            if valor_min is not None and float(row["valor_total"]) < valor_min:
+                return False
+            if valor_max is not None and float(row["valor_total"]) > valor_max:
+                return False
+            return True
 
-        return deleted
+        self._refresh()
+        rows: List[dict] = []
+        for row in self._filter_rows(where, {"client": int, "valor_total": float}, after_id=cursor):
+            rows.append(row)
+            if self._ordered and limit is not None and len(rows) >= limit:
+                break
 
-    def list(self) -> List[Sale]:
+        if not self._ordered:
+            rows.sort(key=lambda row: int(row["id"]))
+            rows = rows[:limit]
+        return self._hydrate(rows, live)
+
+    def iter_rows(self) -> Iterator[dict]:
+        """
+        Percorre as linhas de todas as vendas, com as alterações do log já aplicadas.
+
+        A leitura usa uma cópia das alterações tirada na abertura do arquivo, então escritas
+        feitas durante a leitura não a afetam.
+
+        Yields:
+            dict: Linhas de vendas existentes.
         """
-        Lista todas as vendas armazenadas no arquivo CSV.
+        self._refresh()
+        return self._iter_rows()
+
+    def search_rows(self, sale_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Busca as linhas de várias vendas pelo ID, com as alterações do log já aplicadas.
+
+        Cada linha é lida direto pelo seu offset, em ordem de ID.
+
+        Args:
+            sale_ids (Iterable[int]): IDs das vendas.
 
         Returns:
-            List[Sale]: Lista de objetos `Sale` com todas as vendas encontradas.
+            Dict[int, dict]: Mapa de ID para linha, contendo apenas os IDs encontrados.
         """
-        try:
-            sales: List[Sale] = []
-            with open(self.file_path, mode="r", newline="") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    produtos = self._search_produtos(
-                        list(map(int, row["produtos"].split(",")))
-                    )
-                    client = self._bucar_client(int(row["client"]))
-                    sales.append(
-                        Sale(
-                            id=row["id"],
-                            client=client,
-                            valor_total=row["valor_total"],
-                            produtos=produtos,
-                        )
-                    )
-            return sales
-        except FileNotFoundError:
-            pass
+        self._refresh()
+        with self._lock.read():
+            rows = self._read_rows(sorted(sale_id for sale_id in set(sale_ids) if sale_id in self._ids))
+        return {int(row["id"]): row for row in rows}
 
-    def count(self):
+    def sale_refs(self, sale_ids: Iterable[int] | None = None) -> List[Tuple[int, int, float, Tuple[int, ...]]]:
         """
-        Conta o número de vendas armazenadas no arquivo CSV.
+        Campos já convertidos das vendas, copiados dos índices em memória sem ler o CSV.
+
+        Args:
+            sale_ids (Iterable[int] | None): IDs das vendas; por padrão, todas.
 
         Returns:
-            int: O número total de vendas registradas no arquivo CSV.
+            List[Tuple[int, int, float, Tuple[int, ...]]]: `(id, client, valor_total, produtos)`
+                de cada venda existente.
         """
-        df = pd.read_csv(self.file_path)
-        return df.shape[0]
+        self._refresh()
+        with self._lock.read():
+            if sale_ids is None:
+                refs = list(self._refs.items())
+            else:
+                refs = [(sale_id, self._refs[sale_id]) for sale_id in set(sale_ids) if sale_id in self._refs]
+        return [(sale_id, client, centavos / 100, produtos) for sale_id, (client, centavos, produtos) in refs]
 
-    def _search_produtos(self, produtos: [int]) -> List[Sandal] | None:
+    def list_by_client(
+        self, client_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
         """
-        Busca as sandálias baseadas nos IDs fornecidos.
+        Lista as vendas de um cliente em ordem de ID, usando o índice por cliente.
+
+        Apenas as linhas da página são lidas do CSV, cada uma direto pelo seu offset.
 
         Args:
-            produtos (List[int]): Lista de IDs das sandálias a serem buscadas.
+            client_id (int): O ID do cliente.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
 
         Returns:
-            List[Sandal] | None: Lista de objetos `Sandal` encontrados, ou `None` se não encontrados.
+            List[Sale]: As vendas do cliente.
         """
-        produtos_list = []
-        for produto in produtos:
-            produtos_list.append(self.sandal_repository.search_por_id(produto))
-        return produtos_list
+        self._refresh()
+        with self._lock.read():
+            rows = self._read_rows(self._by_client.page(client_id, limit, cursor))
+        return self._hydrate(rows, live)
 
-    def _produto_dict(self, produtos: List[Sandal]) -> List[int] | None:
+    def list_by_sandal(
+        self, sandal_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
         """
-        Converte uma lista de objetos `Sandal` para uma lista de IDs de sandálias.
+        Lista as vendas que contêm uma sandália em ordem de ID, usando o índice por sandália.
+
+        Apenas as linhas da página são lidas do CSV, cada uma direto pelo seu offset.
 
         Args:
-            produtos (List[Sandal]): Lista de objetos `Sandal`.
+            sandal_id (int): O ID da sandália.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
 
         Returns:
-            List[int] | None: Lista de IDs das sandálias.
+            List[Sale]: As vendas que contêm a sandália.
+        """
+        self._refresh()
+        with self._lock.read():
+            rows = self._read_rows(self._by_sandal.page(sandal_id, limit, cursor))
+        return self._hydrate(rows, live)
+
+    def count(self) -> int:
         """
-        produto_dic: List[int] = []
-        for produto in produtos:
-            produto_dic.append(produto.id)
-        return produto_dic
+        Conta o número de vendas armazenadas.
+
+        O total vem do conjunto de IDs mantido em memória: calculado na inicialização a partir
+        da varredura de linhas feita para o índice de offsets e atualizado a cada escrita.
 
-    def _bucar_client(self, client_id: int) -> Client | None:
+        Returns:
+            int: O número total de vendas registradas.
         """
-        Busca um cliente pelo ID.
+        self._refresh()
+        return len(self._ids)
+
+    def totals(self) -> dict:
+        """
+        Quantidade de vendas e receita total, lidas dos agregados em memória.
+
+        Returns:
+            dict: `{"vendas": int, "receita": float}`.
+        """
+        self._refresh()
+        with self._lock.read():
+            return {"vendas": self._aggregates.vendas, "receita": self._aggregates.receita / 100}
+
+    def units_by_sandal(self, sandal_id: int | None = None) -> Dict[int, int]:
+        """
+        Unidades vendidas por sandália, lidas dos agregados em memória.
 
         Args:
-            client_id (int): O ID do cliente a ser buscado.
+            sandal_id (int | None): Retorna apenas esta sandália.
 
         Returns:
-            Client | None: O cliente encontrado, ou `None` se não encontrado.
+            Dict[int, int]: Unidades vendidas por ID de sandália.
         """
-        return self.client_repository.search_por_id(client_id)
+        self._refresh()
+        with self._lock.read():
+            unidades = self._aggregates.unidades
+            if sandal_id is not None:
+                return {sandal_id: unidades[sandal_id]} if sandal_id in unidades else {}
+            return dict(sorted(unidades.items()))
 
-    def _get_next_id(self) -> int:
+    def totals_by_client(self, client_id: int | None = None) -> Dict[int, dict]:
         """
-        Gera o próximo ID com base no maior ID existente no arquivo CSV.
+        Quantidade de vendas e receita por cliente, lidas dos agregados em memória.
+
+        Args:
+            client_id (int | None): Retorna apenas este cliente.
 
         Returns:
-            int: O próximo ID disponível.
-        """
-        max_id = 0
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                max_id = max(max_id, int(row["id"]))
-        return max_id + 1
+            Dict[int, dict]: `{"vendas": int, "receita": float}` por ID de cliente.
+        """
+        self._refresh()
+        with self._lock.read():
+            clients = self._aggregates.clients
+            ids = [client_id] if client_id is not None else sorted(clients)
+            return {
+                client: {"vendas": clients[client][0], "receita": clients[client][1] / 100}
+                for client in ids
+                if client in clients
+            }
+
+    def compact(self):
+        """
+        Regrava o arquivo CSV já mesclado com o log e esvazia o log.
+
+        A trava de escrita só é mantida durante dois trechos curtos. No primeiro, são lidos o
+        tamanho do CSV, a posição do log e uma cópia das alterações. Sem a trava, o CSV até
+        aquele tamanho é mesclado com a cópia e escrito em um arquivo temporário, sincronizado
+        com `fsync`. No segundo trecho, as vendas anexadas ao CSV nesse meio-tempo são copiadas
+        para o final do temporário, que é renomeado sobre o original, e o log passa a conter só
+        as entradas gravadas depois da leitura. Uma falha nunca deixa o CSV truncado.
+
+        Se outro processo compactou os arquivos nesse meio-tempo, o temporário é descartado.
+        """
+        with self._compacting:
+            with self._lock.write():
+                self._reload_if_changed()
+                if len(self.change_log) == 0 and self._ordered:
+                    return
+                overlay = dict(self._overlay)
+                ordenado = self._ordered
+                log_inicio = self.change_log.offset
+                log_id = file_id(self.change_log.file_path)
+                csv_id = file_id(self.file_path)
+                file = open(self.file_path, mode="rb")
+                fim = os.fstat(file.fileno()).st_size
+
+            with file:
+                rows = self._merge_rows(file, fim, overlay)
+                if not ordenado:
+                    # Aproveita a regravação para devolver o CSV à ordem de ID.
+                    rows = sorted(rows, key=lambda row: int(row["id"]))
+                tmp_path = write_csv_temp(self.file_path, FIELDNAMES, rows)
+            try:
+                with CsvScan(tmp_path, FIELDNAMES) as scan:
+                    offsets, ids = scan.integers("id")
+                ids_ordenados = _increasing(ids)
+            except BaseException:
+                discard_temp(tmp_path)
+                raise
+
+            with self._lock.write():
+                self._reload_if_changed()
+                if file_id(self.file_path) != csv_id or file_id(self.change_log.file_path) != log_id:
+                    discard_temp(tmp_path)
+                    return
+                recentes = self.change_log.entries_since(log_inicio)
+                base = replace_csv(tmp_path, self.file_path, fim)
+                self.change_log.clear(recentes)
+                self._overlay = {
+                    int(entry["id"]): self._overlay[int(entry["id"])] for entry in recentes
+                }
+                # As vendas anexadas depois da leitura ficam no final, deslocadas para o novo arquivo.
+                posicao = bisect.bisect_left(self._row_offsets, fim)
+                novos_ids = self._row_ids[posicao:]
+                self._row_offsets = offsets + [offset - fim + base for offset in self._row_offsets[posicao:]]
+                self._row_ids = ids + novos_ids
+                self._ordered = ids_ordenados and _increasing(ids[-1:] + novos_ids)
+                self._update_signature()
+                self._save_aggregates()
+
+    def close(self):
+        """
+        Aguarda uma compactação em andamento e grava os agregados, para que a próxima
+        inicialização os encontre atualizados.
+        """
+        with self._compaction_lock:
+            compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+        with self._lock.write():
+            self._reload_if_changed()
+            self._save_aggregates()
+
+    def _compact_if_needed(self):
+        """
+        Inicia a compactação em segundo plano quando o log atinge `compact_threshold` entradas.
+        """
+        if len(self.change_log) < self.compact_threshold:
+            return
+        with self._compaction_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+
+    def _iter_rows(
+        self, overlay: Dict[int, dict | None] | None = None, after_id: int | None = None
+    ) -> Iterator[dict]:
+        """
+        Percorre as linhas do CSV aplicando as alterações do log.
+
+        O tamanho do arquivo é lido junto com a abertura, com a trava adquirida, e a leitura
+        para nele: uma venda anexada depois (possivelmente ainda pela metade) não é lida.
+
+        Args:
+            overlay (Dict[int, dict | None] | None): Alterações a aplicar; por padrão, uma
+                cópia das alterações atuais tirada junto com a abertura do arquivo.
+            after_id (int | None): Percorre apenas as vendas com ID maior que este. Se o
+                CSV está em ordem de ID, a leitura começa direto no offset correspondente.
+
+        Yields:
+            dict: Linhas de vendas existentes, já atualizadas.
+        """
+        pular_cabecalho = True
+        with self._lock.read():
+            overlay = dict(self._overlay)
+            file = open(self.file_path, mode="rb")
+            fim = os.fstat(file.fileno()).st_size
+            inicio = self._offset_after(after_id)
+            if inicio is not None:
+                file.seek(inicio)
+                pular_cabecalho = False
+        with file:
+            yield from self._merge_rows(file, fim, overlay, after_id, pular_cabecalho)
+
+    @staticmethod
+    def _merge_rows(
+        file,
+        fim: int,
+        overlay: Dict[int, dict | None],
+        after_id: int | None = None,
+        pular_cabecalho: bool = True,
+    ) -> Iterator[dict]:
+        """
+        Lê as linhas de um CSV de vendas já aberto, até o offset `fim`, aplicando as alterações.
+
+        Args:
+            file: O CSV, aberto em modo binário e posicionado no início da leitura.
+            fim (int): Offset onde a leitura para.
+            overlay (Dict[int, dict | None]): Alterações a aplicar.
+            after_id (int | None): Percorre apenas as vendas com ID maior que este.
+            pular_cabecalho (bool): Se a leitura começa no cabeçalho.
+
+        Yields:
+            dict: Linhas de vendas existentes, já atualizadas.
+        """
+        reader = csv.reader(_lines_until(file, fim))
+        if pular_cabecalho:
+            next(reader, None)
+        for campos in reader:
+            if not campos:
+                continue
+            row = dict(zip(FIELDNAMES, campos))
+            sale_id = int(row["id"])
+            if after_id is not None and sale_id <= after_id:
+                continue
+            if sale_id in overlay:
+                row = overlay[sale_id]
+                if row is None:
+                    continue
+            yield row
+
+    def _filter_rows(
+        self, where: Callable[[dict], bool], columns: Dict[str, type], after_id: int | None = None
+    ) -> Iterator[dict]:
+        """
+        Percorre as linhas aceitas por um filtro, aplicando as alterações do log.
+
+        O CSV é lido com `CsvScan`: de cada linha são extraídos apenas o ID e as colunas do
+        filtro, já convertidos, e só as linhas aceitas são decodificadas por completo.
+
+        Args:
+            where (Callable[[dict], bool]): Filtro das linhas. Nas linhas do CSV, recebe apenas
+                as colunas de `columns`.
+            columns (Dict[str, type]): Colunas lidas pelo filtro e o tipo de cada uma (veja
+                `CsvScan.batches`).
+            after_id (int | None): Percorre apenas as vendas com ID maior que este.
+
+        Yields:
+            dict: Linhas de vendas existentes aceitas pelo filtro, já atualizadas.
+        """
+        with self._lock.read():
+            overlay = dict(self._overlay)
+            scan = CsvScan(self.file_path, FIELDNAMES)
+            inicio = self._offset_after(after_id)
+
+        nomes = list(columns)
+        with scan:
+            for inicios, fins, lote in scan.batches({"id": int, **columns}, inicio):
+                for posicao, sale_id in enumerate(lote["id"]):
+                    if after_id is not None and sale_id <= after_id:
+                        continue
+                    if sale_id in overlay:
+                        row = overlay[sale_id]
+                        if row is not None and where(row):
+                            yield row
+                        continue
+                    if where({nome: lote[nome][posicao] for nome in nomes}):
+                        yield scan.row(inicios[posicao], fins[posicao])
+
+    def _offset_after(self, after_id: int | None) -> int | None:
+        """
+        Offset da primeira linha com ID maior que `after_id`, se o CSV estiver em ordem de ID.
+        Deve ser chamado com a trava adquirida.
+
+        Returns:
+            int | None: O offset, ou `None` para ler o arquivo desde o início.
+        """
+        if after_id is None or not self._ordered:
+            return None
+        posicao = bisect.bisect_right(self._row_ids, after_id)
+        if posicao < len(self._row_offsets):
+            return self._row_offsets[posicao]
+        return os.path.getsize(self.file_path)
+
+    def _read_rows(self, sale_ids: Iterable[int]) -> List[dict]:
+        """
+        Lê as linhas de vendas existentes pelo ID, na ordem pedida, aplicando as alterações do log.
+
+        Cada linha é lida direto pelo seu offset. Se o CSV não estiver em ordem de ID (até a
+        próxima compactação), o offset vem de um mapa ID -> offset montado para a chamada.
+        Deve ser chamado com a trava adquirida.
+
+        Args:
+            sale_ids (Iterable[int]): IDs das vendas.
+
+        Returns:
+            List[dict]: As linhas encontradas.
+        """
+        offsets = None if self._ordered else dict(zip(self._row_ids, self._row_offsets))
+        rows: List[dict] = []
+        with open(self.file_path, mode="rb") as file:
+            for sale_id in sale_ids:
+                if sale_id in self._overlay:
+                    if self._overlay[sale_id] is not None:
+                        rows.append(self._overlay[sale_id])
+                    continue
+                if offsets is not None:
+                    offset = offsets.get(sale_id)
+                else:
+                    posicao = bisect.bisect_left(self._row_ids, sale_id)
+                    encontrado = posicao < len(self._row_ids) and self._row_ids[posicao] == sale_id
+                    offset = self._row_offsets[posicao] if encontrado else None
+                if offset is None:
+                    continue
+                file.seek(offset)
+                rows.append(self._parse_line(file.readline()))
+        return rows
+
+    @staticmethod
+    def _parse_line(linha: bytes) -> dict:
+        """
+        Converte uma linha do CSV, em bytes, em um dicionário com as colunas de `FIELDNAMES`.
+        """
+        return dict(zip(FIELDNAMES, next(csv.reader([linha.decode("utf-8")]))))
+
+    def _index_offsets(self, inicio: int | None = None):
+        """
+        Registra o ID e o offset das linhas do CSV a partir de `inicio`, e indexa cada venda
+        por cliente e por sandália.
+
+        Só as colunas usadas pelos índices são separadas; o snapshot nunca é decodificado.
+        Sem `inicio`, o índice de offsets é reconstruído a partir do arquivo inteiro.
+        Deve ser chamado com a trava de escrita adquirida.
+
+        Args:
+            inicio (int | None): Offset a partir do qual as linhas foram anexadas.
+        """
+        if inicio is None:
+            self._row_ids, self._row_offsets, self._ordered = [], [], True
+        colunas = {"id": int, "client": int, "valor_total": float, "produtos": bytes}
+        with CsvScan(self.file_path, FIELDNAMES) as scan:
+            for offsets, _, lote in scan.batches(colunas, inicio):
+                for offset, sale_id, client, valor_total, produtos in zip(
+                    offsets, lote["id"], lote["client"], lote["valor_total"], lote["produtos"]
+                ):
+                    self._index_refs(
+                        sale_id,
+                        client,
+                        to_centavos(valor_total),
+                        tuple(self._parse_produtos(produtos.decode("utf-8"))),
+                    )
+                    if self._row_ids and sale_id <= self._row_ids[-1]:
+                        self._ordered = False
+                    self._row_ids.append(sale_id)
+                    self._row_offsets.append(offset)
+
+
+def _lines_until(file, fim: int) -> Iterator[str]:
+    """
+    Lê as linhas de um arquivo binário, decodificadas em UTF-8, até o offset `fim`.
+
+    Args:
+        file: Arquivo aberto em modo binário.
+        fim (int): Offset onde a leitura para; uma linha que o ultrapasse não é lida.
+
+    Yields:
+        str: As linhas completas, com a quebra de linha.
+    """
+    posicao = file.tell()
+    for linha in file:
+        posicao += len(linha)
+        if posicao > fim:
+            return
+        yield linha.decode("utf-8")
+
+
+def _increasing(ids: List[int]) -> bool:
+    """
+    Informa se os IDs estão em ordem estritamente crescente.
+    """
+    return all(anterior < atual for anterior, atual in zip(ids, ids[1:]))
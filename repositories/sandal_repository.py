@@ -1,24 +1,93 @@
+import bisect
 import csv
-from typing import Optional, List
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Tuple
 from models import Sandal
+from repositories.base import InsufficientStockError, SandalRepositoryBase, bulk_result
+from repositories.change_feed import ChangeFeed
+from repositories.change_log import ChangeLog
+from repositories.csv_files import (
+    append_csv_rows,
+    discard_temp,
+    file_id,
+    file_signature,
+    replace_csv,
+    signature_version,
+    write_csv_temp,
+)
+from repositories.id_allocator import IdAllocator
+from repositories.locking import KeyedLocks, RepositoryLock
 
 
-class SandalRepository:
+FIELDNAMES = ["id", "codigo", "nome", "quantidade", "valor", "cor", "tamanho"]
+# Colunas do log: as do CSV, mais a venda, a variação de uma baixa de estoque e as unidades
+# da sandália na venda depois da gravação
+LOG_FIELDNAMES = [*FIELDNAMES, "venda", "delta", "unidades"]
+
+logger = logging.getLogger(__name__)
+
+
+class SandalRepository(SandalRepositoryBase):
     """
     Repositório de sandálias que interage com um arquivo CSV para armazenar,
     recuperar, atualizar e excluir informações de sandálias.
 
+    As sandálias ficam em um índice em memória (ID -> registro) carregado na inicialização.
+    Novas sandálias são anexadas ao CSV; atualizações, exclusões e baixas de estoque são
+    anexadas a um log de alterações (`<arquivo>.log`), aplicado sobre o CSV ao carregar o
+    índice. Quando o log atinge `compact_threshold` entradas, uma thread em segundo plano
+    regrava o CSV de forma atômica e esvazia o log. Se o CSV for alterado fora do processo
+    (mudança de mtime ou tamanho), o índice é recarregado; entradas anexadas ao log por
+    outros processos são aplicadas a partir de onde o índice parou.
+
+    Inclusões, atualizações e exclusões usam a trava de escrita da `RepositoryLock`
+    (`<arquivo>.lock`), também entre processos. As baixas de estoque usam apenas a trava
+    compartilhada e as travas dos produtos envolvidos (`<arquivo>.stock.lock`), então baixas
+    de produtos diferentes não esperam umas pelas outras. Cada baixa (ou devolução) é uma
+    entrada `S` no log com a nova quantidade, a variação, o ID da venda e as unidades da
+    sandália na venda depois da gravação; a venda é confirmada por uma entrada `C` depois de
+    gravada. Uma baixa sem confirmação (o processo parou no meio da gravação da venda) é
+    concluída ou desfeita por `resolve_reservation`.
+
     Attributes:
         file_path (str): Caminho para o arquivo CSV onde os dados das sandálias são armazenados.
+        id_allocator (IdAllocator): Alocador dos IDs de novas sandálias.
+        change_log (ChangeLog): Log de atualizações, exclusões e baixas ainda não compactadas.
+        compact_threshold (int): Número de entradas do log que dispara a compactação.
+        change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
     """
 
-    def __init__(self, file_path: str):
+    # Operações do log além de `ChangeLog.UPSERT` e `ChangeLog.DELETE`
+    STOCK = "S"
+    CONFIRM = "C"
+
+    def __init__(self, file_path: str, compact_threshold: int = 1000, change_feed: ChangeFeed | None = None):
         """
         Args:
             file_path (str): Caminho para o arquivo CSV onde os dados das sandálias serão lidos e escritos.
+            compact_threshold (int): Número de entradas do log que dispara a compactação.
+            change_feed (ChangeFeed | None): Feed onde cada escrita é registrada.
         """
         self.file_path = file_path
+        self.change_feed = change_feed
+        self.compact_threshold = compact_threshold
+        self._index: Dict[int, dict] = {}
+        self._reservations: Dict[int, List[Tuple[int, int, int | None]]] = {}
+        self._signature: tuple | None = None
+        self._sorted_ids: List[int] | None = None
+        self._compaction: threading.Thread | None = None
+        self._compaction_lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self.id_allocator = IdAllocator(f"{file_path}.hwm")
+        self._lock = RepositoryLock(f"{file_path}.lock")
+        self._stock_locks = KeyedLocks(lock_path=f"{file_path}.stock.lock")
         self._initialize_csv()  # Garantir que o arquivo CSV tenha cabeçalhos
+        self.change_log = ChangeLog(f"{file_path}.log", LOG_FIELDNAMES)
+        with self._lock.write():
+            self._load_index()
 
     def _initialize_csv(self):
         """
@@ -28,19 +97,8 @@ class SandalRepository:
         caso o arquivo não exista.
         """
         try:
-            with open(self.file_path, mode="x", newline="") as file:
-                writer = csv.DictWriter(
-                    file,
-                    fieldnames=[
-                        "id",
-                        "codigo",
-                        "nome",
-                        "quantidade",
-                        "valor",
-                        "cor",
-                        "tamanho",
-                    ],
-                )
+            with open(self.file_path, mode="x", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
                 writer.writeheader()
         except FileExistsError:
             pass  # O arquivo já existe, então não precisamos fazer nada
@@ -55,23 +113,199 @@ class SandalRepository:
         Returns:
             Sandal: A sandália criada com um ID atribuído.
         """
-        sandal.id = self._get_next_id()
-        with open(self.file_path, mode="a", newline="") as file:
-            writer = csv.DictWriter(
-                file,
-                fieldnames=[
-                    "id",
-                    "codigo",
-                    "nome",
-                    "quantidade",
-                    "valor",
-                    "cor",
-                    "tamanho",
-                ],
-            )
-            writer.writerow(sandal.model_dump())
+        with self._lock.write():
+            self._reload_if_changed()
+            sandal.id = self.id_allocator.next_id()
+            append_csv_rows(self.file_path, FIELDNAMES, [sandal.model_dump()])
+            self._index[sandal.id] = sandal.model_dump()
+            self._add_sorted_ids([sandal.id])
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [sandal.id])
         return sandal
 
+    def create_many(self, sandals: List[Sandal]) -> List[dict]:
+        """
+        Cria várias sandálias com uma única reserva de IDs e uma única escrita no CSV.
+
+        Args:
+            sandals (List[Sandal]): Sandálias a serem criadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sandals)
+        validas = [sandal for sandal, erro in zip(sandals, erros) if erro is None]
+        with self._lock.write():
+            self._reload_if_changed()
+            for sandal, sandal_id in zip(validas, self.id_allocator.reserve(len(validas))):
+                sandal.id = sandal_id
+
+            rows = [sandal.model_dump() for sandal in validas]
+            append_csv_rows(self.file_path, FIELDNAMES, rows)
+            for row in rows:
+                self._index[row["id"]] = row
+            self._add_sorted_ids(row["id"] for row in rows)
+            self._update_signature()
+            self._record_changes(ChangeFeed.UPSERT, [row["id"] for row in rows])
+
+        return [
+            bulk_result(index, "error", detail=erro) if erro else bulk_result(index, "created", sandal.id)
+            for index, (sandal, erro) in enumerate(zip(sandals, erros))
+        ]
+
+    def upsert_many(self, sandals: List[Sandal]) -> List[dict]:
+        """
+        Grava várias sandálias: as que têm ID vão para o log em uma única escrita,
+        as sem ID são criadas no CSV.
+
+        Args:
+            sandals (List[Sandal]): Sandálias a serem gravadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sandals)
+        resultados: List[dict] = []
+        novas: List[dict] = []
+        alteradas: List[dict] = []
+        with self._lock.write():
+            self._reload_if_changed()
+            for index, (sandal, erro) in enumerate(zip(sandals, erros)):
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                    continue
+                if sandal.id > 0:
+                    # Com ID informado, mesmo que novo, vai para o log: o ID pode ter um tombstone lá.
+                    status = "updated" if sandal.id in self._index else "created"
+                    self.id_allocator.advance_to(sandal.id)
+                    alteradas.append({**sandal.model_dump(), "op": ChangeLog.UPSERT})
+                else:
+                    status = "created"
+                    sandal.id = self.id_allocator.next_id()
+                    novas.append(sandal.model_dump())
+                resultados.append(bulk_result(index, status, sandal.id))
+
+            if novas:
+                append_csv_rows(self.file_path, FIELDNAMES, novas)
+                for row in novas:
+                    self._index[row["id"]] = row
+                self._add_sorted_ids(row["id"] for row in novas)
+                self._update_signature()
+            if alteradas:
+                self.change_log.append(alteradas, self._apply_log)
+            self._record_changes(ChangeFeed.UPSERT, [r["id"] for r in resultados if r["status"] != "error"])
+        self._compact_if_needed()
+        return resultados
+
+    @contextmanager
+    def reserve_stock(self, reservas: Dict[int, Tuple[Dict[int, int], Dict[int, int]]], parcial: bool = False):
+        """
+        Aplica ao estoque as variações de uma ou mais vendas e mantém as travas dos produtos
+        enquanto as vendas são gravadas.
+
+        As variações são anexadas ao log (com `fsync`, em uma única escrita) antes de entrar no
+        bloco. Se o bloco terminar normalmente, as vendas são confirmadas no log; se levantar
+        uma exceção, as variações são desfeitas. Durante o bloco, apenas as travas dos produtos
+        ficam adquiridas, nunca a trava do repositório, então o bloco pode usar outros
+        repositórios.
+
+        Args:
+            reservas (Dict[int, Tuple[Dict[int, int], Dict[int, int]]]): Por ID de venda, a
+                variação da quantidade de cada sandália (negativa para baixa) e as unidades de
+                cada uma na venda depois da gravação, usadas por `resolve_reservation` para
+                saber se a venda foi gravada. Devoluções a sandálias excluídas são ignoradas.
+            parcial (bool): Se `True`, as vendas sem estoque (ou com sandálias inexistentes)
+                são recusadas individualmente, na ordem recebida, e as demais seguem; senão, a
+                primeira recusa levanta a exceção e nada é alterado.
+
+        Yields:
+            Dict[int, ValueError]: O erro de cada venda recusada (vazio sem `parcial`).
+
+        Raises:
+            ValueError: Se alguma sandália não for encontrada (sem `parcial`).
+            InsufficientStockError: Se alguma quantidade ficaria negativa (sem `parcial`).
+        """
+        produtos = {sandal_id for deltas, _ in reservas.values() for sandal_id in deltas}
+        with self._stock_locks.acquire(produtos):
+            with self._stock_section():
+                recusadas: Dict[int, ValueError] = {}
+                aceitas: Dict[int, Dict[int, int]] = {}
+                quantidades: Dict[int, int] = {}
+                entries: List[dict] = []
+                for venda, (deltas, unidades) in reservas.items():
+                    try:
+                        novas = self._new_quantities(deltas, quantidades)
+                    except ValueError as erro:
+                        if not parcial:
+                            raise
+                        recusadas[venda] = erro
+                        continue
+                    quantidades.update(novas)
+                    aceitas[venda] = deltas
+                    entries.extend(self._stock_entries(novas, deltas, venda, unidades))
+                if entries:
+                    self.change_log.append(entries, self._apply_log)
+                    self._record_changes(ChangeFeed.UPSERT, quantidades)
+            try:
+                yield recusadas
+            except BaseException:
+                with self._stock_section():
+                    self._revert_stock(aceitas)
+                raise
+            if aceitas:
+                with self._stock_section():
+                    self.change_log.append(
+                        [{"op": self.CONFIRM, "venda": venda} for venda in aceitas], self._apply_log
+                    )
+
+    def pending_reservations(self) -> List[int]:
+        """
+        Vendas com baixa de estoque registrada no log, mas ainda não confirmada.
+
+        Returns:
+            List[int]: IDs das vendas.
+        """
+        self._refresh_index()
+        with self._lock.read():
+            return list(self._reservations)
+
+    def resolve_reservation(self, venda: int, committed: Callable[[int, Dict[int, int]], bool]):
+        """
+        Conclui ou desfaz a baixa de estoque de uma venda que não foi confirmada.
+
+        As travas dos produtos são adquiridas antes da decisão: se a venda ainda estiver em
+        andamento em outro processo, a espera termina com ela confirmada ou desfeita.
+
+        Args:
+            venda (int): ID da venda.
+            committed (Callable[[int, Dict[int, int]], bool]): Recebe a venda e as unidades de
+                cada sandália que ela teria depois da gravação, e informa se a gravação
+                aconteceu. Se aconteceu, a baixa é confirmada; senão, é desfeita.
+        """
+        with self._lock.read():
+            produtos = [sandal_id for sandal_id, _, _ in self._reservations.get(venda, ())]
+        if not produtos:
+            return
+        with self._stock_locks.acquire(produtos):
+            self._refresh_index()
+            with self._lock.read():
+                if venda not in self._reservations:
+                    return
+            with self._lock.read():
+                reservadas = list(self._reservations.get(venda, ()))
+            # Entradas sem `unidades` são de versões em que só a criação da venda dava baixa.
+            unidades = {sandal_id: -delta if alvo is None else alvo for sandal_id, delta, alvo in reservadas}
+            gravada = committed(venda, unidades)
+            with self._stock_section():
+                if gravada:
+                    self.change_log.append([{"op": self.CONFIRM, "venda": venda}], self._apply_log)
+                    return
+                deltas: Dict[int, int] = {}
+                for sandal_id, delta, _ in self._reservations.get(venda, ()):
+                    deltas[sandal_id] = deltas.get(sandal_id, 0) + delta
+                logger.warning("Baixa de estoque da venda %s desfeita: a venda não foi gravada", venda)
+                self._revert_stock({venda: deltas})
+
     def search_por_id(self, sandal_id: int) -> Optional[Sandal]:
         """
         Busca uma sandália pelo ID.
@@ -82,16 +316,32 @@ class SandalRepository:
         Returns:
             Optional[Sandal]: A sandália encontrada ou `None` se não for encontrada.
         """
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sandal_id:
-                    return Sandal(**row)
-        return None
+        self._refresh_index()
+        with self._lock.read():
+            row = self._index.get(sandal_id)
+        return Sandal(**row) if row is not None else None
+
+    def search_por_ids(self, sandal_ids: Iterable[int]) -> Dict[int, Sandal]:
+        """
+        Busca várias sandálias pelo ID diretamente no índice em memória.
+
+        Args:
+            sandal_ids (Iterable[int]): IDs das sandálias a serem buscadas.
+
+        Returns:
+            Dict[int, Sandal]: Mapa de ID para sandália, contendo apenas os IDs encontrados.
+        """
+        self._refresh_index()
+        with self._lock.read():
+            return {
+                sandal_id: Sandal(**self._index[sandal_id])
+                for sandal_id in set(sandal_ids)
+                if sandal_id in self._index
+            }
 
     def update(self, sandal: Sandal) -> Sandal:
         """
-        Atualiza os dados de uma sandália no arquivo CSV.
+        Atualiza os dados de uma sandália, registrando a alteração no log.
 
         Args:
             sandal (Sandal): Objeto `Sandal` contendo os dados atualizados da sandália.
@@ -102,40 +352,19 @@ class SandalRepository:
         Raises:
             ValueError: Se a sandália não for encontrada.
         """
-        sandals = []
-        updated = False
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sandal.id:
-                    sandals.append(sandal.model_dump())
-                    updated = True
-                else:
-                    sandals.append(row)
-
-        with open(self.file_path, mode="w", newline="") as file:
-            writer = csv.DictWriter(
-                file,
-                fieldnames=[
-                    "id",
-                    "codigo",
-                    "nome",
-                    "quantidade",
-                    "valor",
-                    "cor",
-                    "tamanho",
-                ],
-            )
-            writer.writeheader()
-            writer.writerows(sandals)
-
-        if not updated:
-            raise ValueError("User not found")
+        with self._lock.write():
+            self._reload_if_changed()
+            if sandal.id not in self._index:
+                raise ValueError("User not found")
+
+            self.change_log.append([{**sandal.model_dump(), "op": ChangeLog.UPSERT}], self._apply_log)
+            self._record_changes(ChangeFeed.UPSERT, [sandal.id])
+        self._compact_if_needed()
         return sandal
 
     def delete(self, sandal_id: int) -> bool:
         """
-        Exclui uma sandália pelo ID.
+        Exclui uma sandália pelo ID, registrando um tombstone no log.
 
         Args:
             sandal_id (int): O ID da sandália a ser excluída.
@@ -143,61 +372,328 @@ class SandalRepository:
         Returns:
             bool: `True` se a sandália foi excluída com sucesso, `False` caso contrário.
         """
-        sandals = []
-        deleted = False
-        with open(self.file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id"]) == sandal_id:
-                    deleted = True
-                else:
-                    sandals.append(row)
-
-        with open(self.file_path, mode="w", newline="") as file:
-            writer = csv.DictWriter(
-                file,
-                fieldnames=[
-                    "id",
-                    "codigo",
-                    "nome",
-                    "quantidade",
-                    "valor",
-                    "cor",
-                    "tamanho",
-                ],
-            )
-            writer.writeheader()
-            writer.writerows(sandals)
-
-        return deleted
-
-    def list(self) -> List[Sandal]:
-        """
-        Lista todas as sandálias armazenadas no arquivo CSV.
+        with self._lock.write():
+            self._reload_if_changed()
+            if sandal_id not in self._index:
+                return False
+
+            self.change_log.append([{"op": ChangeLog.DELETE, "id": sandal_id}], self._apply_log)
+            self._record_changes(ChangeFeed.DELETE, [sandal_id])
+        self._compact_if_needed()
+        return True
+
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        cor: str | None = None,
+        tamanho: int | None = None,
+    ) -> List[Sandal]:
+        """
+        Lista as sandálias em ordem de ID, com paginação por cursor e filtros opcionais.
+
+        A busca começa no primeiro ID após o cursor (busca binária sobre os IDs ordenados)
+        e termina assim que `limit` sandálias compatíveis com os filtros são encontradas.
+
+        Args:
+            limit (int | None): Quantidade máxima de sandálias retornadas.
+            cursor (int | None): Retorna apenas sandálias com ID maior que este.
+            cor (str | None): Filtra pela cor, sem diferenciar maiúsculas.
+            tamanho (int | None): Filtra pelo tamanho.
 
         Returns:
-            List[Sandal]: Lista de objetos `Sandal` com todas as sandálias encontradas.
+            List[Sandal]: Lista de objetos `Sandal` encontrados.
         """
-        try:
-            sandals: List[Sandal] = []
-            with open(self.file_path, mode="r", newline="") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    sandals.append(Sandal(**row))
-            return sandals
-        except FileNotFoundError:
-            pass
+        self._refresh_index()
+        sandals: List[Sandal] = []
+        with self._lock.read():
+            for sandal_id in self._ids_after(cursor):
+                row = self._index[sandal_id]
+                if cor is not None and str(row["cor"]).casefold() != cor.casefold():
+                    continue
+                if tamanho is not None and int(row["tamanho"]) != tamanho:
+                    continue
+                sandals.append(Sandal(**row))
+                if limit is not None and len(sandals) >= limit:
+                    break
+        return sandals
 
-    def _get_next_id(self) -> int:
+    def _ids_after(self, cursor: int | None) -> Iterator[int]:
         """
-        Gera o próximo ID com base no maior ID existente no arquivo CSV.
+        Percorre, em ordem, os IDs maiores que o cursor, sem copiar a lista de IDs.
 
-        Returns:
-            int: O próximo ID disponível.
+        Args:
+            cursor (int | None): Último ID já visto, ou `None` para começar do início.
+
+        Yields:
+            int: IDs ordenados a partir do cursor.
+        """
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self._index)
+        ids = self._sorted_ids
+        inicio = 0 if cursor is None else bisect.bisect_right(ids, cursor)
+        for posicao in range(inicio, len(ids)):
+            yield ids[posicao]
+
+    def _add_sorted_ids(self, sandal_ids: Iterable[int]):
+        """
+        Insere novos IDs na lista ordenada, se ela já foi montada. IDs alocados são sempre os
+        maiores, então vão para o final; só um ID informado pelo chamador precisa de busca binária.
+        Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._sorted_ids is None:
+            return
+        for sandal_id in sandal_ids:
+            if not self._sorted_ids or sandal_id > self._sorted_ids[-1]:
+                self._sorted_ids.append(sandal_id)
+            else:
+                bisect.insort(self._sorted_ids, sandal_id)
+
+    def _remove_sorted_id(self, sandal_id: int):
+        """
+        Remove um ID da lista ordenada, se ela já foi montada. Deve ser chamado com a trava de escrita adquirida.
+        """
+        if self._sorted_ids is None:
+            return
+        posicao = bisect.bisect_left(self._sorted_ids, sandal_id)
+        if posicao < len(self._sorted_ids) and self._sorted_ids[posicao] == sandal_id:
+            del self._sorted_ids[posicao]
+
+    @contextmanager
+    def _stock_section(self):
+        """
+        Adquire a trava compartilhada com o índice em dia, para uma baixa de estoque.
+
+        Entradas `S` e `C` anexadas por outros processos são aplicadas com a trava
+        compartilhada; se o CSV mudou ou há outras entradas novas no log, o índice é
+        atualizado com a trava de escrita e a tentativa se repete. Deve ser chamado com as
+        travas dos produtos adquiridas.
+        """
+        while True:
+            self._refresh_index()
+            with self._lock.read():
+                if self._file_signature() == self._signature and self.change_log.tail(
+                    self._apply_log, ops=(self.STOCK, self.CONFIRM)
+                ):
+                    yield
+                    return
+
+    def _new_quantities(self, deltas: Dict[int, int], pendentes: Dict[int, int]) -> Dict[int, int]:
+        """
+        Calcula a nova quantidade de cada sandália, conferindo todas antes de qualquer alteração.
+
+        Args:
+            deltas (Dict[int, int]): Variação da quantidade por ID.
+            pendentes (Dict[int, int]): Quantidades já calculadas para vendas anteriores do
+                mesmo lote, usadas no lugar das do índice.
+
+        Raises:
+            ValueError: Se alguma sandália não for encontrada para uma baixa.
+            InsufficientStockError: Se alguma quantidade ficaria negativa.
+        """
+        quantidades: Dict[int, int] = {}
+        for sandal_id, delta in deltas.items():
+            row = self._index.get(sandal_id)
+            if row is None:
+                if delta > 0:
+                    continue  # Devolução a uma sandália excluída
+                raise ValueError(f"Sandália {sandal_id} não encontrada")
+            disponivel = pendentes.get(sandal_id, int(row["quantidade"]))
+            quantidades[sandal_id] = disponivel + delta
+            if quantidades[sandal_id] < 0:
+                raise InsufficientStockError(
+                    f"Estoque insuficiente da sandália {sandal_id}: "
+                    f"disponível {disponivel}, pedido {-delta}"
+                )
+        return quantidades
+
+    def _stock_entries(
+        self, quantidades: Dict[int, int], deltas: Dict[int, int], venda: int, unidades: Dict[int, int]
+    ) -> List[dict]:
+        """
+        Entradas `S` do log de uma venda: a nova quantidade (o que torna a entrada
+        idempotente), a variação, a venda e as unidades da sandália na venda.
+        """
+        return [
+            {
+                "op": self.STOCK,
+                "id": sandal_id,
+                "quantidade": quantidade,
+                "venda": venda,
+                "delta": deltas[sandal_id],
+                "unidades": unidades.get(sandal_id, 0),
+            }
+            for sandal_id, quantidade in quantidades.items()
+        ]
+
+    def _revert_stock(self, reservas: Dict[int, Dict[int, int]]):
         """
-        max_id = 0
-        with open(self.file_path, mode="r", newline="") as file:
+        Desfaz as variações de estoque de vendas e encerra as reservas com entradas `C`.
+        Deve ser chamado dentro de `_stock_section`, com as travas dos produtos adquiridas.
+
+        Args:
+            reservas (Dict[int, Dict[int, int]]): Variações aplicadas, por ID de venda.
+        """
+        entries: List[dict] = []
+        alteradas: Dict[int, int] = {}
+        for venda, deltas in reservas.items():
+            reverso = {
+                sandal_id: -delta
+                for sandal_id, delta in deltas.items()
+                if delta and sandal_id in self._index
+            }
+            quantidades = {
+                sandal_id: alteradas.get(sandal_id, int(self._index[sandal_id]["quantidade"])) + delta
+                for sandal_id, delta in reverso.items()
+            }
+            alteradas.update(quantidades)
+            entries.extend(self._stock_entries(quantidades, reverso, venda, {}))
+            entries.append({"op": self.CONFIRM, "venda": venda})
+        if entries:
+            self.change_log.append(entries, self._apply_log)
+        self._record_changes(ChangeFeed.UPSERT, alteradas)
+
+    def _apply_log(self, op: str, row: dict):
+        """
+        Aplica uma entrada do log ao índice em memória.
+
+        Args:
+            op (str): A operação (`U`, `D`, `S` ou `C`).
+            row (dict): As colunas da entrada.
+        """
+        if op == self.CONFIRM:
+            self._reservations.pop(int(row["venda"]), None)
+        elif op == self.STOCK:
+            sandal_id = int(row["id"])
+            atual = self._index.get(sandal_id)
+            if atual is not None:
+                self._index[sandal_id] = {**atual, "quantidade": int(row["quantidade"])}
+            if row.get("venda") not in (None, ""):
+                unidades = None if row.get("unidades") in (None, "") else int(row["unidades"])
+                self._reservations.setdefault(int(row["venda"]), []).append(
+                    (sandal_id, int(row["delta"]), unidades)
+                )
+        elif op == ChangeLog.DELETE:
+            sandal_id = int(row["id"])
+            if self._index.pop(sandal_id, None) is not None:
+                self._remove_sorted_id(sandal_id)
+        else:
+            sandal_id = int(row["id"])
+            if sandal_id not in self._index:
+                self._add_sorted_ids([sandal_id])
+            self._index[sandal_id] = {**{campo: row.get(campo) for campo in FIELDNAMES}, "id": sandal_id}
+
+    def compact(self):
+        """
+        Regrava o arquivo CSV com o estado atual e esvazia o log de alterações.
+
+        A trava de escrita só é mantida para copiar o índice e, depois, para a troca: as
+        sandálias copiadas são escritas em um arquivo temporário, sincronizado com `fsync`,
+        sem a trava, então vendas e baixas de estoque seguem durante a escrita. Na troca, as
+        sandálias anexadas ao CSV nesse meio-tempo são copiadas para o final do temporário,
+        que é renomeado sobre o original, de modo que uma falha nunca deixa o CSV truncado.
+        O novo log contém as baixas ainda não confirmadas na cópia, com a quantidade
+        compactada, seguidas das entradas gravadas depois dela. Se outro processo compactou
+        os arquivos nesse meio-tempo, o temporário é descartado.
+        """
+        with self._compacting:
+            with self._lock.write():
+                self._reload_if_changed()
+                if len(self.change_log) == 0:
+                    return
+                rows = list(self._index.values())
+                pendentes = [
+                    {
+                        "op": self.STOCK,
+                        "id": sandal_id,
+                        "quantidade": self._index[sandal_id]["quantidade"] if sandal_id in self._index else 0,
+                        "venda": venda,
+                        "delta": delta,
+                        "unidades": "" if unidades is None else unidades,
+                    }
+                    for venda, produtos in self._reservations.items()
+                    for sandal_id, delta, unidades in produtos
+                ]
+                log_inicio = self.change_log.offset
+                ids = (file_id(self.file_path), file_id(self.change_log.file_path))
+                fim = os.path.getsize(self.file_path)
+
+            tmp_path = write_csv_temp(self.file_path, FIELDNAMES, rows)
+
+            with self._lock.write():
+                self._reload_if_changed()
+                if (file_id(self.file_path), file_id(self.change_log.file_path)) != ids:
+                    discard_temp(tmp_path)
+                    return
+                recentes = self.change_log.entries_since(log_inicio)
+                replace_csv(tmp_path, self.file_path, fim)
+                self.change_log.clear(pendentes + recentes)
+                self._update_signature()
+
+    def _compact_if_needed(self):
+        """
+        Inicia a compactação em segundo plano quando o log atinge `compact_threshold` entradas.
+        """
+        if len(self.change_log) < self.compact_threshold:
+            return
+        with self._compaction_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+
+    def _load_index(self):
+        """
+        Carrega o índice em memória lendo o arquivo CSV uma única vez e aplicando o log por cima.
+        Deve ser chamado com a trava de escrita adquirida.
+        """
+        with open(self.file_path, mode="r", newline="", encoding="utf-8") as file:
             reader = csv.DictReader(file)
-            for row in reader:
-                max_id = max(max_id, int(row["id"]))
-        return max_id + 1
+            self._index = {int(row["id"]): row for row in reader}
+        self._reservations = {}
+        self._sorted_ids = None
+        self.change_log.recount()
+        for op, row in self.change_log.replay():
+            self._apply_log(op, row)
+        self.change_log.discard_torn_tail()
+        self._update_signature()
+        self.id_allocator.advance_to(max(self._index, default=0))
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados, derivada da assinatura do CSV e de até onde o log foi aplicado: muda
+        também quando outro processo altera o CSV ou o log.
+        """
+        self._refresh_index()
+        return signature_version(self._signature, self.change_log.offset)
+
+    def _update_signature(self):
+        """
+        Registra a assinatura atual do CSV após uma escrita ou recarga.
+        """
+        self._signature = self._file_signature()
+
+    def _refresh_index(self):
+        """
+        Atualiza o índice caso o CSV ou o log tenham sido alterados fora deste processo.
+
+        Usado antes das leituras; adquire a trava de escrita apenas se houver o que atualizar.
+        """
+        if self._file_signature() != self._signature or self.change_log.size() != self.change_log.offset:
+            with self._lock.write():
+                self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        """
+        Recarrega o índice se o CSV mudou ou o log foi regravado, ou aplica as entradas novas
+        do log. Deve ser chamado com a trava de escrita adquirida.
+        """
+        tamanho = self.change_log.size()
+        if self._file_signature() != self._signature or tamanho < self.change_log.offset:
+            self._load_index()
+        elif tamanho > self.change_log.offset:
+            self.change_log.tail(self._apply_log)
+
+    def _file_signature(self):
+        return file_signature(self.file_path)
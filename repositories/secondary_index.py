@@ -0,0 +1,93 @@
+import bisect
+from typing import Dict, Iterable, List
+
+
+class SecondaryIndex:
+    """
+    Índice secundário em memória: para cada chave (por exemplo, um ID de cliente), os IDs
+    dos registros que a referenciam, em ordem crescente.
+
+    Manter os IDs ordenados permite paginar por cursor com busca binária. Como novos IDs
+    são sempre maiores que os existentes, a inserção costuma ser um simples `append`.
+    """
+
+    def __init__(self):
+        self._ids: Dict[int, List[int]] = {}
+
+    def add(self, key: int, record_id: int):
+        """
+        Registra que `record_id` referencia `key`.
+
+        Args:
+            key (int): A chave indexada.
+            record_id (int): O ID do registro.
+        """
+        ids = self._ids.setdefault(key, [])
+        if not ids or record_id > ids[-1]:
+            ids.append(record_id)
+            return
+        posicao = bisect.bisect_left(ids, record_id)
+        if posicao == len(ids) or ids[posicao] != record_id:
+            ids.insert(posicao, record_id)
+
+    def remove(self, key: int, record_id: int):
+        """
+        Remove a referência de `record_id` a `key`, se existir.
+
+        Args:
+            key (int): A chave indexada.
+            record_id (int): O ID do registro.
+        """
+        ids = self._ids.get(key)
+        if not ids:
+            return
+        posicao = bisect.bisect_left(ids, record_id)
+        if posicao < len(ids) and ids[posicao] == record_id:
+            del ids[posicao]
+            if not ids:
+                del self._ids[key]
+
+    def page(self, key: int, limit: int | None = None, cursor: int | None = None) -> List[int]:
+        """
+        Retorna, em ordem, os IDs que referenciam `key` e são maiores que o cursor.
+
+        Args:
+            key (int): A chave indexada.
+            limit (int | None): Quantidade máxima de IDs retornados.
+            cursor (int | None): Retorna apenas IDs maiores que este.
+
+        Returns:
+            List[int]: Os IDs da página.
+        """
+        ids = self._ids.get(key, [])
+        inicio = 0 if cursor is None else bisect.bisect_right(ids, cursor)
+        fim = len(ids) if limit is None else inicio + limit
+        return ids[inicio:fim]
+
+    def update(self, keys: Iterable[int], record_id: int):
+        """
+        Registra que `record_id` referencia cada uma das chaves.
+
+        Args:
+            keys (Iterable[int]): As chaves indexadas.
+            record_id (int): O ID do registro.
+        """
+        for key in keys:
+            self.add(key, record_id)
+
+    def discard(self, keys: Iterable[int], record_id: int):
+        """
+        Remove a referência de `record_id` a cada uma das chaves.
+
+        Args:
+            keys (Iterable[int]): As chaves indexadas.
+            record_id (int): O ID do registro.
+        """
+        for key in keys:
+            self.remove(key, record_id)
+
+    def clear(self):
+        """
+        Esvazia o índice.
+        """
+        self._ids.clear()
@@ -0,0 +1,94 @@
+from typing import Iterator
+
+from repositories.change_feed import Change, ChangeFeedTruncatedError
+from repositories.sqlite_database import SqliteDatabase
+
+
+SELECT_VERSION = "SELECT COALESCE(MAX(versao), 0) FROM change_feed"
+SELECT_BASE = "SELECT COALESCE(MIN(versao) - 1, 0) FROM change_feed"
+SELECT_SINCE = (
+    "SELECT versao, tabela, op, record_id FROM change_feed "
+    "WHERE versao > ? AND (? IS NULL OR versao <= ?) ORDER BY versao"
+)
+
+# A cada `retention` alterações, descarta as anteriores às últimas `retention`
+RETENTION_TRIGGER = """
+CREATE TRIGGER change_feed_retention AFTER INSERT ON change_feed WHEN NEW.versao % {retention} = 0
+BEGIN
+    DELETE FROM change_feed WHERE versao <= NEW.versao - {retention};
+END;
+"""
+
+
+class SqliteChangeFeed:
+    """
+    Feed de alterações do backend SQLite, com a mesma interface de leitura de `ChangeFeed`.
+
+    As alterações são gravadas por gatilhos na tabela `change_feed`, na mesma transação de cada
+    escrita, inclusive de outros processos. A versão é a chave `AUTOINCREMENT` da tabela: como
+    as transações de escrita são serializadas, um leitor que vê a versão `N` vê todas as
+    alterações até ela.
+
+    Como em `ChangeFeed`, apenas as alterações mais recentes são mantidas: um gatilho descarta,
+    a cada `retention` alterações, as anteriores às últimas `retention`, na mesma transação.
+    Um leitor que ainda está antes desse ponto recebe `ChangeFeedTruncatedError` de `since`.
+
+    Attributes:
+        database (SqliteDatabase): Banco de dados compartilhado pelos repositórios.
+        retention (int): Quantidade mínima de alterações mantidas no feed.
+    """
+
+    UPSERT = "U"
+    DELETE = "D"
+
+    def __init__(self, database: SqliteDatabase, retention: int = 100_000):
+        """
+        Args:
+            database (SqliteDatabase): Banco de dados compartilhado pelos repositórios.
+            retention (int): Quantidade mínima de alterações mantidas no feed.
+        """
+        self.database = database
+        self.retention = max(retention, 1)
+        # Recriado a cada inicialização, para valer a retenção configurada agora.
+        with database.transaction() as conn:
+            conn.execute("DROP TRIGGER IF EXISTS change_feed_retention")
+            conn.execute(RETENTION_TRIGGER.format(retention=self.retention))
+
+    @property
+    def version(self) -> int:
+        """
+        Versão da última alteração registrada (0 se nenhuma).
+        """
+        return self.database.connection().execute(SELECT_VERSION).fetchone()[0]
+
+    @property
+    def base_version(self) -> int:
+        """
+        Versão até a qual as alterações foram descartadas: `since` aceita apenas versões a
+        partir dela (0 se nenhuma foi descartada).
+        """
+        return self.database.connection().execute(SELECT_BASE).fetchone()[0]
+
+    def since(self, versao: int, ate: int | None = None) -> Iterator[Change]:
+        """
+        Percorre as alterações com versão maior que `versao`, em ordem de versão.
+
+        Args:
+            versao (int): Última versão já conhecida pelo leitor.
+            ate (int | None): Maior versão percorrida; por padrão, até a última.
+
+        Yields:
+            Change: `(versao, tabela, op, id)` de cada alteração.
+
+        Raises:
+            ChangeFeedTruncatedError: Se alterações posteriores a `versao` já foram descartadas.
+                Como só as mais antigas são descartadas, a verificação é feita depois da leitura:
+                se a base ainda não passou de `versao`, nenhuma alteração lida faltou.
+        """
+        for row in self.database.connection().execute(SELECT_SINCE, (versao, ate, ate)):
+            yield tuple(row)
+        base = self.base_version
+        if versao < base:
+            raise ChangeFeedTruncatedError(
+                f"Alterações até a versão {base} já foram descartadas do feed (pedida: {versao})"
+            )
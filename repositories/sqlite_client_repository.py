@@ -0,0 +1,197 @@
+import json
+from typing import Dict, Iterable, List
+
+from models import Client
+from repositories.base import ClientRepositoryBase, bulk_result
+from repositories.sqlite_database import SqliteDatabase
+
+
+INSERT = "INSERT INTO client (nome, celular, endereco) VALUES (?, ?, ?)"
+SELECT_BY_ID = "SELECT id, nome, celular, endereco FROM client WHERE id = ?"
+SELECT_BY_IDS = (
+    "SELECT id, nome, celular, endereco FROM client "
+    "WHERE id IN (SELECT value FROM json_each(?))"
+)
+SELECT_PAGE = (
+    "SELECT id, nome, celular, endereco FROM client "
+    "WHERE id > ? AND (? IS NULL OR nome LIKE '%' || ? || '%') "
+    "ORDER BY id LIMIT ?"
+)
+UPDATE = "UPDATE client SET nome = ?, celular = ?, endereco = ? WHERE id = ?"
+DELETE = "DELETE FROM client WHERE id = ?"
+INSERT_WITH_ID = "INSERT INTO client (id, nome, celular, endereco) VALUES (?, ?, ?, ?)"
+SELECT_IDS = "SELECT id FROM client WHERE id IN (SELECT value FROM json_each(?))"
+
+
+class SqliteClientRepository(ClientRepositoryBase):
+    """
+    Repositório de clientes persistido em um banco SQLite.
+
+    Attributes:
+        database (SqliteDatabase): Banco de dados onde a tabela `client` é armazenada.
+    """
+
+    def __init__(self, database: SqliteDatabase):
+        """
+        Args:
+            database (SqliteDatabase): Banco de dados compartilhado pelos repositórios.
+        """
+        self.database = database
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados da tabela `client`, que também muda com escritas de outros processos.
+        """
+        return self.database.version("client")
+
+    def create(self, client: Client) -> Client:
+        """
+        Cria um novo cliente.
+
+        Args:
+            client (Client): Objeto `Client` com os dados do cliente a ser criado.
+
+        Returns:
+            Client: O cliente criado com um ID atribuído.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(INSERT, (client.nome, client.celular, client.endereco))
+        client.id = cursor.lastrowid
+        return client
+
+    def create_many(self, clients: List[Client]) -> List[dict]:
+        """
+        Cria vários clientes em uma única transação.
+
+        Args:
+            clients (List[Client]): Clientes a serem criados.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(clients)
+        with self.database.transaction() as conn:
+            for client, erro in zip(clients, erros):
+                if erro is None:
+                    cursor = conn.execute(INSERT, (client.nome, client.celular, client.endereco))
+                    client.id = cursor.lastrowid
+
+        return [
+            bulk_result(index, "error", detail=erro) if erro else bulk_result(index, "created", client.id)
+            for index, (client, erro) in enumerate(zip(clients, erros))
+        ]
+
+    def upsert_many(self, clients: List[Client]) -> List[dict]:
+        """
+        Atualiza os clientes cujo ID já existe e cria os demais, em uma única transação.
+
+        Args:
+            clients (List[Client]): Clientes a serem gravados.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(clients)
+        resultados: List[dict] = []
+        with self.database.transaction() as conn:
+            ids = json.dumps([client.id for client in clients if client.id is not None])
+            existentes = {row["id"] for row in conn.execute(SELECT_IDS, (ids,))}
+            for index, (client, erro) in enumerate(zip(clients, erros)):
+                valores = (client.nome, client.celular, client.endereco)
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                elif client.id in existentes:
+                    conn.execute(UPDATE, (*valores, client.id))
+                    resultados.append(bulk_result(index, "updated", client.id))
+                else:
+                    if client.id is not None:
+                        conn.execute(INSERT_WITH_ID, (client.id, *valores))
+                    else:
+                        client.id = conn.execute(INSERT, valores).lastrowid
+                    existentes.add(client.id)
+                    resultados.append(bulk_result(index, "created", client.id))
+        return resultados
+
+    def search_por_id(self, client_id: int) -> Client | None:
+        """
+        Busca um cliente pelo ID.
+
+        Args:
+            client_id (int): O ID do cliente a ser buscado.
+
+        Returns:
+            Client | None: O cliente encontrado, ou `None` se não encontrado.
+        """
+        row = self.database.connection().execute(SELECT_BY_ID, (client_id,)).fetchone()
+        return Client.from_dict(dict(row)) if row is not None else None
+
+    def search_por_ids(self, client_ids: Iterable[int]) -> Dict[int, Client]:
+        """
+        Busca vários clientes pelo ID em uma única consulta.
+
+        Args:
+            client_ids (Iterable[int]): IDs dos clientes a serem buscados.
+
+        Returns:
+            Dict[int, Client]: Mapa de ID para cliente, contendo apenas os IDs encontrados.
+        """
+        ids = json.dumps(sorted(set(client_ids)))
+        rows = self.database.connection().execute(SELECT_BY_IDS, (ids,))
+        return {row["id"]: Client.from_dict(dict(row)) for row in rows}
+
+    def update(self, client: Client) -> Client:
+        """
+        Atualiza as informações de um cliente.
+
+        Args:
+            client (Client): Objeto `Client` contendo os dados atualizados do cliente.
+
+        Returns:
+            Client: O cliente atualizado.
+
+        Raises:
+            ValueError: Se o cliente não for encontrado.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(
+                UPDATE, (client.nome, client.celular, client.endereco, client.id)
+            )
+        if cursor.rowcount == 0:
+            raise ValueError("User not found")
+        return client
+
+    def delete(self, client_id: int) -> bool:
+        """
+        Exclui um cliente pelo ID.
+
+        Args:
+            client_id (int): O ID do cliente a ser excluído.
+
+        Returns:
+            bool: `True` se o cliente foi excluído com sucesso, `False` caso contrário.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(DELETE, (client_id,))
+        return cursor.rowcount > 0
+
+    def list(
+        self, limit: int | None = None, cursor: int | None = None, nome: str | None = None
+    ) -> List[Client]:
+        """
+        Lista os clientes em ordem de ID, com paginação por cursor e filtro opcional por nome.
+
+        O cursor é aplicado como `id > ?` sobre a chave primária, então a consulta começa
+        direto no ponto certo do índice e para ao atingir o limite.
+
+        Args:
+            limit (int | None): Quantidade máxima de clientes retornados.
+            cursor (int | None): Retorna apenas clientes com ID maior que este.
+            nome (str | None): Trecho do nome.
+
+        Returns:
+            List[Client]: Lista de objetos `Client` encontrados.
+        """
+        parametros = (cursor or 0, nome, nome, -1 if limit is None else limit)
+        rows = self.database.connection().execute(SELECT_PAGE, parametros)
+        return [Client.from_dict(dict(row)) for row in rows]
@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS client (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    celular TEXT NOT NULL,
+    endereco TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sandal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    cor TEXT NOT NULL,
+    tamanho INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sale (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client INTEGER NOT NULL,
+    valor_total REAL NOT NULL,
+    produtos TEXT NOT NULL,
+    snapshot TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sale_client ON sale (client);
+CREATE TABLE IF NOT EXISTS sale_produto (
+    sandal_id INTEGER NOT NULL,
+    sale_id INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (sandal_id, sale_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sale_produto_sale ON sale_produto (sale_id);
+CREATE TABLE IF NOT EXISTS table_version (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sale_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    vendas INTEGER NOT NULL,
+    receita INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sale_totals (id, vendas, receita) VALUES (1, 0, 0);
+CREATE TABLE IF NOT EXISTS sale_client_totals (
+    client INTEGER PRIMARY KEY,
+    vendas INTEGER NOT NULL,
+    receita INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sandal_units (
+    sandal_id INTEGER PRIMARY KEY,
+    unidades INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS change_feed (
+    versao INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabela TEXT NOT NULL,
+    op TEXT NOT NULL,
+    record_id INTEGER NOT NULL
+);
+"""
+
+# Agregados das vendas (receita em centavos) mantidos por gatilhos a cada escrita. As
+# unidades por sandália seguem as linhas de `sale_produto`, gravadas junto com cada venda.
+AGGREGATE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS sale_aggregates_insert AFTER INSERT ON sale
+BEGIN
+    UPDATE sale_totals SET vendas = vendas + 1, receita = receita + CAST(ROUND(NEW.valor_total * 100) AS INTEGER);
+    INSERT INTO sale_client_totals (client, vendas, receita)
+    VALUES (NEW.client, 1, CAST(ROUND(NEW.valor_total * 100) AS INTEGER))
+    ON CONFLICT (client) DO UPDATE SET vendas = vendas + 1, receita = receita + excluded.receita;
+END;
+CREATE TRIGGER IF NOT EXISTS sale_aggregates_delete AFTER DELETE ON sale
+BEGIN
+    UPDATE sale_totals SET vendas = vendas - 1, receita = receita - CAST(ROUND(OLD.valor_total * 100) AS INTEGER);
+    UPDATE sale_client_totals
+    SET vendas = vendas - 1, receita = receita - CAST(ROUND(OLD.valor_total * 100) AS INTEGER)
+    WHERE client = OLD.client;
+    DELETE FROM sale_client_totals WHERE client = OLD.client AND vendas = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS sale_aggregates_update AFTER UPDATE OF client, valor_total ON sale
+BEGIN
+    UPDATE sale_totals SET receita = receita
+        - CAST(ROUND(OLD.valor_total * 100) AS INTEGER) + CAST(ROUND(NEW.valor_total * 100) AS INTEGER);
+    UPDATE sale_client_totals
+    SET vendas = vendas - 1, receita = receita - CAST(ROUND(OLD.valor_total * 100) AS INTEGER)
+    WHERE client = OLD.client;
+    DELETE FROM sale_client_totals WHERE client = OLD.client AND vendas = 0;
+    INSERT INTO sale_client_totals (client, vendas, receita)
+    VALUES (NEW.client, 1, CAST(ROUND(NEW.valor_total * 100) AS INTEGER))
+    ON CONFLICT (client) DO UPDATE SET vendas = vendas + 1, receita = receita + excluded.receita;
+END;
+CREATE TRIGGER IF NOT EXISTS sale_produto_units_insert AFTER INSERT ON sale_produto
+BEGIN
+    INSERT INTO sandal_units (sandal_id, unidades) VALUES (NEW.sandal_id, NEW.quantidade)
+    ON CONFLICT (sandal_id) DO UPDATE SET unidades = unidades + excluded.unidades;
+END;
+CREATE TRIGGER IF NOT EXISTS sale_produto_units_delete AFTER DELETE ON sale_produto
+BEGIN
+    UPDATE sandal_units SET unidades = unidades - OLD.quantidade WHERE sandal_id = OLD.sandal_id;
+    DELETE FROM sandal_units WHERE sandal_id = OLD.sandal_id AND unidades = 0;
+END;
+"""
+
+# Tabelas cuja versão (ver `SqliteDatabase.version`) é mantida por gatilhos
+VERSIONED_TABLES = ("client", "sandal", "sale")
+
+VERSION_TRIGGERS = "".join(
+    f"""
+INSERT OR IGNORE INTO table_version (name, version) VALUES ('{table}', 0);
+CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table}
+BEGIN
+    UPDATE table_version SET version = version + 1 WHERE name = '{table}';
+END;
+"""
+    for table in VERSIONED_TABLES
+    for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+SELECT_VERSION = "SELECT version FROM table_version WHERE name = ?"
+
+# Feed de alterações (ver `SqliteChangeFeed`): uma linha por registro incluído, alterado
+# ou excluído, na mesma transação da escrita
+CHANGE_FEED_TRIGGERS = "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS {table}_change_feed_{event.lower()} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO change_feed (tabela, op, record_id) VALUES ('{table}', '{op}', {row}.id);
+END;
+"""
+    for table in VERSIONED_TABLES
+    for event, op, row in (("INSERT", "U", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD"))
+)
+
+# Colunas adicionadas depois da criação do esquema: (tabela, coluna, DDL que a adiciona)
+ADDED_COLUMNS = [
+    ("sale", "snapshot", "ALTER TABLE sale ADD COLUMN snapshot TEXT"),
+    ("sale_produto", "quantidade", "ALTER TABLE sale_produto ADD COLUMN quantidade INTEGER NOT NULL DEFAULT 1"),
+]
+
+
+class SqliteDatabase:
+    """
+    Banco SQLite embutido usado pelos repositórios quando o backend `sqlite` está ativo.
+
+    Cada thread recebe sua própria conexão, configurada com journal em modo WAL para que
+    leituras não bloqueiem a escrita. As escritas do processo são serializadas por `write_lock`.
+    As consultas dos repositórios são constantes com parâmetros `?`, então o cache de
+    instruções do `sqlite3` reaproveita as instruções já preparadas a cada chamada.
+
+    Attributes:
+        file_path (str): Caminho do arquivo do banco de dados.
+        write_lock (threading.Lock): Lock que serializa as transações de escrita.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path (str): Caminho do arquivo do banco de dados (criado se não existir).
+        """
+        self.file_path = file_path
+        self.write_lock = threading.Lock()
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA + VERSION_TRIGGERS + CHANGE_FEED_TRIGGERS)
+        self._add_missing_columns()
+        # Depois das colunas novas, das quais os gatilhos dependem.
+        self.connection().executescript(AGGREGATE_TRIGGERS)
+
+    def version(self, table: str) -> int:
+        """
+        Retorna a versão de uma tabela, incrementada por gatilhos a cada linha inserida,
+        alterada ou excluída, inclusive por outros processos.
+
+        Args:
+            table (str): Nome da tabela (uma de `VERSIONED_TABLES`).
+
+        Returns:
+            int: A versão atual da tabela.
+        """
+        return self.connection().execute(SELECT_VERSION, (table,)).fetchone()[0]
+
+    def _add_missing_columns(self):
+        """
+        Adiciona a bancos criados por versões anteriores as colunas que o esquema ganhou depois.
+        """
+        with self.transaction() as conn:
+            for table, column, ddl in ADDED_COLUMNS:
+                colunas = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in colunas:
+                    conn.execute(ddl)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Retorna a conexão da thread atual, abrindo-a na primeira chamada.
+
+        Returns:
+            sqlite3.Connection: Conexão configurada com WAL e `sqlite3.Row` como fábrica de linhas.
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.file_path, timeout=30, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Abre uma transação de escrita, confirmada ao final ou desfeita em caso de erro.
+
+        Args:
+            immediate (bool): Se `True`, a trava de escrita do banco é adquirida já no início
+                (`BEGIN IMMEDIATE`), para transações que leem antes de escrever e não podem
+                ver os dados mudarem entre a leitura e a escrita.
+
+        Yields:
+            sqlite3.Connection: A conexão da thread atual dentro da transação.
+        """
+        with self.write_lock:
+            conn = self.connection()
+            with conn:
+                if immediate:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+
+
+@contextmanager
+def savepoint(conn: sqlite3.Connection, name: str = "item") -> Iterator[None]:
+    """
+    Trecho de uma transação aberta que é desfeito sozinho em caso de erro, sem desfazer o resto.
+
+    Usado nas operações em lote para recusar um item (por exemplo, sem estoque) e seguir com os
+    demais na mesma transação.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com a transação aberta.
+        name (str): Nome do savepoint.
+    """
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
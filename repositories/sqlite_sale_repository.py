@@ -0,0 +1,499 @@
+import json
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from models import Sale
+from repositories.base import SaleRepositoryBase, bulk_result
+from repositories.sale_aggregates import SaleAggregates, to_centavos
+from repositories.sale_cache import SaleCache
+from repositories.sqlite_database import SqliteDatabase, savepoint
+from repositories.sqlite_sandal_repository import apply_stock_deltas
+
+
+COLUMNS = "id, client, valor_total, produtos, snapshot"
+INSERT = "INSERT INTO sale (client, valor_total, produtos, snapshot) VALUES (?, ?, ?, ?)"
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM sale WHERE id = ?"
+SELECT_PRODUTOS = "SELECT produtos FROM sale WHERE id = ?"
+SELECT_BY_IDS = f"SELECT {COLUMNS} FROM sale WHERE id IN (SELECT value FROM json_each(?))"
+SELECT_PAGE = (
+    f"SELECT {COLUMNS} FROM sale "
+    "WHERE id > ? AND (? IS NULL OR client = ?) "
+    "AND (? IS NULL OR valor_total >= ?) AND (? IS NULL OR valor_total <= ?) "
+    "ORDER BY id LIMIT ?"
+)
+UPDATE = "UPDATE sale SET client = ?, valor_total = ?, produtos = ?, snapshot = ? WHERE id = ?"
+DELETE = "DELETE FROM sale WHERE id = ?"
+COUNT = "SELECT vendas FROM sale_totals"
+SELECT_TOTALS = "SELECT vendas, receita FROM sale_totals"
+SELECT_UNITS = "SELECT sandal_id, unidades FROM sandal_units WHERE ? IS NULL OR sandal_id = ? ORDER BY sandal_id"
+SELECT_CLIENT_TOTALS = (
+    "SELECT client, vendas, receita FROM sale_client_totals WHERE ? IS NULL OR client = ? ORDER BY client"
+)
+INSERT_WITH_ID = "INSERT INTO sale (id, client, valor_total, produtos, snapshot) VALUES (?, ?, ?, ?, ?)"
+SELECT_ROWS = "SELECT id, client, valor_total, produtos FROM sale"
+SELECT_ROWS_BY_IDS = f"{SELECT_ROWS} WHERE id IN (SELECT value FROM json_each(?))"
+SELECT_IDS = "SELECT id FROM sale WHERE id IN (SELECT value FROM json_each(?))"
+# O índice `idx_sale_client` inclui o rowid (`id`), então a página sai em ordem sem ordenar.
+SELECT_BY_CLIENT = f"SELECT {COLUMNS} FROM sale WHERE client = ? AND id > ? ORDER BY id LIMIT ?"
+SELECT_BY_SANDAL = (
+    f"SELECT {COLUMNS} FROM sale WHERE id IN ("
+    "SELECT sale_id FROM sale_produto WHERE sandal_id = ? AND sale_id > ? ORDER BY sale_id LIMIT ?"
+    ") ORDER BY id"
+)
+INSERT_SALE_PRODUTO = "INSERT INTO sale_produto (sandal_id, sale_id, quantidade) VALUES (?, ?, ?)"
+DELETE_SALE_PRODUTO = "DELETE FROM sale_produto WHERE sale_id = ?"
+
+logger = logging.getLogger(__name__)
+
+
+def index_sale_produtos(conn, sale_id: int, produtos: str):
+    """
+    Atualiza as linhas de `sale_produto` (sandália -> venda, com a quantidade vendida) de uma venda.
+
+    Deve ser chamada na mesma transação que grava a venda.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com a transação aberta.
+        sale_id (int): O ID da venda.
+        produtos (str): Valor da coluna `produtos` da venda.
+    """
+    conn.execute(DELETE_SALE_PRODUTO, (sale_id,))
+    quantidades = Counter(SaleRepositoryBase._parse_produtos(produtos))
+    conn.executemany(
+        INSERT_SALE_PRODUTO,
+        [(sandal_id, sale_id, quantidade) for sandal_id, quantidade in quantidades.items()],
+    )
+
+
+class SqliteSaleRepository(SaleRepositoryBase):
+    """
+    Repositório de vendas persistido em um banco SQLite.
+
+    Attributes:
+        database (SqliteDatabase): Banco de dados onde a tabela `sale` é armazenada.
+        cache (SaleCache | None): Cache das vendas buscadas pelo ID.
+    """
+
+    def __init__(
+        self,
+        database: SqliteDatabase,
+        sandal_repository,
+        client_repository,
+        snapshots: bool = False,
+        cache: SaleCache | None = None,
+    ):
+        """
+        Args:
+            database (SqliteDatabase): Banco de dados compartilhado pelos repositórios.
+            sandal_repository (SandalRepositoryBase): Repositório de sandálias para realizar operações de pesquisa.
+            client_repository (ClientRepositoryBase): Repositório de clientes para realizar operações de pesquisa.
+            snapshots (bool): Se as vendas gravadas levam o snapshot de cliente e produtos.
+            cache (SaleCache | None): Cache das vendas buscadas pelo ID, invalidado pelo feed de
+                alterações.
+        """
+        super().__init__(sandal_repository, client_repository, snapshots, cache)
+        self.database = database
+        self._verify_aggregates()
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados da tabela `sale`, que também muda com escritas de outros processos.
+        """
+        return self.database.version("sale")
+
+    def _verify_aggregates(self):
+        """
+        Confere os agregados mantidos pelos gatilhos com o recálculo completo a partir das vendas.
+
+        Se divergirem (ou em bancos criados antes deles), `sale_produto` e as tabelas de
+        agregados são reconstruídas a partir da tabela `sale`.
+        """
+        conn = self.database.connection()
+        rows = [tuple(row) for row in conn.execute(SELECT_ROWS)]
+        recalculados = SaleAggregates()
+        for _, client, valor_total, produtos in rows:
+            recalculados.add(client, to_centavos(valor_total), self._parse_produtos(produtos))
+        if recalculados == self._stored_aggregates(conn):
+            return
+        if rows:
+            logger.warning("Agregados de vendas divergem do recálculo; reconstruindo")
+        with self.database.transaction() as conn:
+            conn.execute("DELETE FROM sale_produto")
+            for sale_id, _, _, produtos in rows:
+                index_sale_produtos(conn, sale_id, produtos)
+            conn.execute("DELETE FROM sandal_units")
+            conn.executemany(
+                "INSERT INTO sandal_units (sandal_id, unidades) VALUES (?, ?)", recalculados.unidades.items()
+            )
+            conn.execute("DELETE FROM sale_client_totals")
+            conn.executemany(
+                "INSERT INTO sale_client_totals (client, vendas, receita) VALUES (?, ?, ?)",
+                [(client, vendas, receita) for client, (vendas, receita) in recalculados.clients.items()],
+            )
+            conn.execute("UPDATE sale_totals SET vendas = ?, receita = ?", (recalculados.vendas, recalculados.receita))
+
+    @staticmethod
+    def _stored_aggregates(conn) -> SaleAggregates:
+        aggregates = SaleAggregates()
+        aggregates.vendas, aggregates.receita = conn.execute(SELECT_TOTALS).fetchone()
+        aggregates.unidades.update({row[0]: row[1] for row in conn.execute(SELECT_UNITS, (None, None))})
+        aggregates.clients = {row[0]: [row[1], row[2]] for row in conn.execute(SELECT_CLIENT_TOTALS, (None, None))}
+        return aggregates
+
+    def create(self, sale: Sale) -> Sale:
+        """
+        Cria uma nova venda dando baixa no estoque, como `create_sale`.
+
+        Args:
+            sale (Sale): Objeto `Sale` com os dados da venda a ser criada.
+
+        Returns:
+            Sale: A venda criada com um ID atribuído.
+        """
+        return self.create_sale(sale)
+
+    def create_sale(self, sale: Sale) -> Sale:
+        """
+        Cria uma venda dando baixa no estoque de cada produto, em uma única transação.
+
+        A baixa de cada produto é um `UPDATE` condicional; se algum não tiver estoque, a
+        transação inteira é desfeita e nenhuma quantidade é alterada.
+
+        Args:
+            sale (Sale): Objeto `Sale` com os dados da venda a ser criada.
+
+        Returns:
+            Sale: A venda criada com um ID atribuído.
+
+        Raises:
+            ValueError: Se o cliente ou algum produto não existir, ou se a venda for inválida.
+            InsufficientStockError: Se algum produto não tiver estoque suficiente.
+        """
+        erro = self._validate_many([sale])[0]
+        if erro:
+            raise ValueError(erro)
+        row = self._to_row(sale)
+        with self.database.transaction() as conn:
+            apply_stock_deltas(conn, self._stock_deltas({}, self._quantidades(sale)))
+            cursor = conn.execute(INSERT, self._values(row))
+            index_sale_produtos(conn, cursor.lastrowid, row["produtos"])
+        sale.id = cursor.lastrowid
+        return sale
+
+    def create_many(self, sales: List[Sale]) -> List[dict]:
+        """
+        Cria várias vendas em uma única transação, dando baixa no estoque de cada uma.
+
+        Cada venda é gravada em um savepoint: uma venda sem estoque é desfeita sozinha e recebe
+        o resultado `conflict`, e as demais seguem.
+
+        Args:
+            sales (List[Sale]): Vendas a serem criadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sales)
+        snapshots = self._snapshots(sales)
+        resultados: List[dict] = []
+        with self.database.transaction(immediate=True) as conn:
+            for index, (sale, erro, snapshot) in enumerate(zip(sales, erros, snapshots)):
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                    continue
+                row = self._to_row(sale, snapshot)
+                try:
+                    with savepoint(conn):
+                        apply_stock_deltas(conn, self._stock_deltas({}, self._quantidades(sale)))
+                        sale.id = conn.execute(INSERT, self._values(row)).lastrowid
+                        index_sale_produtos(conn, sale.id, row["produtos"])
+                except ValueError as e:
+                    resultados.append(self._stock_error(index, e))
+                    continue
+                resultados.append(bulk_result(index, "created", sale.id))
+        return resultados
+
+    def upsert_many(self, sales: List[Sale]) -> List[dict]:
+        """
+        Atualiza as vendas cujo ID já existe e cria as demais, em uma única transação.
+
+        O estoque acompanha cada venda: a diferença entre os produtos antigos e os novos é
+        aplicada em um savepoint, e uma venda sem estoque recebe o resultado `conflict`.
+
+        Args:
+            sales (List[Sale]): Vendas a serem gravadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sales, upsert=True)
+        snapshots = self._snapshots(sales)
+        resultados: List[dict] = []
+        with self.database.transaction(immediate=True) as conn:
+            ids = json.dumps([sale.id for sale in sales])
+            existentes = {row["id"] for row in conn.execute(SELECT_IDS, (ids,))}
+            for index, (sale, erro, snapshot) in enumerate(zip(sales, erros, snapshots)):
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                    continue
+                row = self._to_row(sale, snapshot)
+                valores = self._values(row)
+                existe = sale.id in existentes
+                try:
+                    with savepoint(conn):
+                        antes = self._units(conn, sale.id) if existe else None
+                        apply_stock_deltas(conn, self._stock_deltas(antes or {}, self._quantidades(sale)))
+                        if existe:
+                            conn.execute(UPDATE, (*valores, sale.id))
+                        elif sale.id > 0:
+                            conn.execute(INSERT_WITH_ID, (sale.id, *valores))
+                        else:
+                            sale.id = conn.execute(INSERT, valores).lastrowid
+                        index_sale_produtos(conn, sale.id, row["produtos"])
+                except ValueError as e:
+                    resultados.append(self._stock_error(index, e))
+                    continue
+                existentes.add(sale.id)
+                resultados.append(bulk_result(index, "updated" if existe else "created", sale.id))
+        return resultados
+
+    def _units(self, conn, sale_id: int) -> Dict[int, int] | None:
+        """
+        Unidades de cada sandália em uma venda gravada, lidas na transação aberta, ou `None`
+        se a venda não existir.
+        """
+        row = conn.execute(SELECT_PRODUTOS, (sale_id,)).fetchone()
+        return dict(Counter(self._parse_produtos(row["produtos"]))) if row is not None else None
+
+    def search_por_id(self, sale_id: int, live: bool = False) -> Sale | None:
+        """
+        Busca uma venda pelo ID.
+
+        Args:
+            sale_id (int): O ID da venda a ser buscada.
+            live (bool): Se `True`, monta a venda com os dados atuais mesmo que ela tenha snapshot.
+
+        Returns:
+            Sale | None: A venda encontrada, ou `None` se não for encontrada.
+        """
+        def ler() -> List[dict]:
+            row = self.database.connection().execute(SELECT_BY_ID, (sale_id,)).fetchone()
+            return [dict(row)] if row is not None else []
+
+        return self._search_cached(sale_id, live, ler)
+
+    def update(self, sale: Sale) -> Sale:
+        """
+        Atualiza os dados de uma venda, aplicando ao estoque a diferença entre os produtos
+        antigos e os novos na mesma transação.
+
+        Args:
+            sale (Sale): Objeto `Sale` contendo os dados atualizados da venda.
+
+        Returns:
+            Sale: A venda atualizada.
+
+        Raises:
+            ValueError: Se a venda não for encontrada, ou se o cliente ou algum produto não existir.
+            InsufficientStockError: Se algum produto não tiver estoque suficiente.
+        """
+        erro = self._validate_many([sale])[0]
+        if erro:
+            raise ValueError(erro)
+        row = self._to_row(sale)
+        with self.database.transaction(immediate=True) as conn:
+            antes = self._units(conn, sale.id)
+            if antes is None:
+                raise ValueError("User not found")
+            apply_stock_deltas(conn, self._stock_deltas(antes, self._quantidades(sale)))
+            conn.execute(UPDATE, (*self._values(row), sale.id))
+            index_sale_produtos(conn, sale.id, row["produtos"])
+        return sale
+
+    def delete(self, sale_id: int) -> bool:
+        """
+        Exclui uma venda pelo ID, devolvendo as suas unidades ao estoque na mesma transação.
+
+        Args:
+            sale_id (int): O ID da venda a ser excluída.
+
+        Returns:
+            bool: `True` se a venda foi excluída com sucesso, `False` caso contrário.
+        """
+        with self.database.transaction(immediate=True) as conn:
+            apply_stock_deltas(conn, self._stock_deltas(self._units(conn, sale_id) or {}, {}))
+            cursor = conn.execute(DELETE, (sale_id,))
+            conn.execute(DELETE_SALE_PRODUTO, (sale_id,))
+        return cursor.rowcount > 0
+
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        client: int | None = None,
+        valor_min: float | None = None,
+        valor_max: float | None = None,
+        live: bool = False,
+    ) -> List[Sale]:
+        """
+        Lista as vendas em ordem de ID, com paginação por cursor e filtros opcionais.
+
+        O cursor é aplicado como `id > ?` sobre a chave primária, então a consulta começa
+        direto no ponto certo do índice e para ao atingir o limite.
+
+        Args:
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            client (int | None): Filtra pelo ID do cliente.
+            valor_min (float | None): Valor total mínimo.
+            valor_max (float | None): Valor total máximo.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
+
+        Returns:
+            List[Sale]: Lista de objetos `Sale` encontrados.
+        """
+        parametros = (
+            cursor or 0,
+            client,
+            client,
+            valor_min,
+            valor_min,
+            valor_max,
+            valor_max,
+            -1 if limit is None else limit,
+        )
+        rows = self.database.connection().execute(SELECT_PAGE, parametros)
+        return self._hydrate([dict(row) for row in rows], live)
+
+    def iter_rows(self) -> Iterator[dict]:
+        """
+        Percorre as linhas de todas as vendas.
+
+        Yields:
+            dict: Linhas de vendas existentes.
+        """
+        for row in self.database.connection().execute(SELECT_ROWS):
+            yield dict(row)
+
+    def search_rows(self, sale_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Busca as linhas de várias vendas pelo ID com uma única consulta.
+
+        Args:
+            sale_ids (Iterable[int]): IDs das vendas.
+
+        Returns:
+            Dict[int, dict]: Mapa de ID para linha, contendo apenas os IDs encontrados.
+        """
+        rows = self.database.connection().execute(SELECT_BY_IDS, (json.dumps(list(set(sale_ids))),))
+        return {row["id"]: dict(row) for row in rows}
+
+    def sale_refs(self, sale_ids: Iterable[int] | None = None) -> List[Tuple[int, int, float, Tuple[int, ...]]]:
+        """
+        Campos já convertidos das vendas, lidos com uma única consulta.
+
+        Args:
+            sale_ids (Iterable[int] | None): IDs das vendas; por padrão, todas.
+
+        Returns:
+            List[Tuple[int, int, float, Tuple[int, ...]]]: `(id, client, valor_total, produtos)`
+                de cada venda existente.
+        """
+        conn = self.database.connection()
+        if sale_ids is None:
+            rows = conn.execute(SELECT_ROWS)
+        else:
+            rows = conn.execute(SELECT_ROWS_BY_IDS, (json.dumps(list(set(sale_ids))),))
+        return [
+            (sale_id, client, valor_total, tuple(self._parse_produtos(produtos)))
+            for sale_id, client, valor_total, produtos in rows
+        ]
+
+    def list_by_client(
+        self, client_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
+        """
+        Lista as vendas de um cliente em ordem de ID, usando o índice `idx_sale_client`.
+
+        Args:
+            client_id (int): O ID do cliente.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
+
+        Returns:
+            List[Sale]: As vendas do cliente.
+        """
+        parametros = (client_id, cursor or 0, -1 if limit is None else limit)
+        rows = self.database.connection().execute(SELECT_BY_CLIENT, parametros)
+        return self._hydrate([dict(row) for row in rows], live)
+
+    def list_by_sandal(
+        self, sandal_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> List[Sale]:
+        """
+        Lista as vendas que contêm uma sandália em ordem de ID, usando a tabela `sale_produto`.
+
+        Args:
+            sandal_id (int): O ID da sandália.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, monta as vendas com os dados atuais mesmo que tenham snapshot.
+
+        Returns:
+            List[Sale]: As vendas que contêm a sandália.
+        """
+        parametros = (sandal_id, cursor or 0, -1 if limit is None else limit)
+        rows = self.database.connection().execute(SELECT_BY_SANDAL, parametros)
+        return self._hydrate([dict(row) for row in rows], live)
+
+    def totals(self) -> dict:
+        """
+        Quantidade de vendas e receita total, lidas da tabela `sale_totals`.
+
+        Returns:
+            dict: `{"vendas": int, "receita": float}`.
+        """
+        vendas, receita = self.database.connection().execute(SELECT_TOTALS).fetchone()
+        return {"vendas": vendas, "receita": receita / 100}
+
+    def units_by_sandal(self, sandal_id: int | None = None) -> Dict[int, int]:
+        """
+        Unidades vendidas por sandália, lidas da tabela `sandal_units`.
+
+        Args:
+            sandal_id (int | None): Retorna apenas esta sandália.
+
+        Returns:
+            Dict[int, int]: Unidades vendidas por ID de sandália.
+        """
+        rows = self.database.connection().execute(SELECT_UNITS, (sandal_id, sandal_id))
+        return {row["sandal_id"]: row["unidades"] for row in rows}
+
+    def totals_by_client(self, client_id: int | None = None) -> Dict[int, dict]:
+        """
+        Quantidade de vendas e receita por cliente, lidas da tabela `sale_client_totals`.
+
+        Args:
+            client_id (int | None): Retorna apenas este cliente.
+
+        Returns:
+            Dict[int, dict]: `{"vendas": int, "receita": float}` por ID de cliente.
+        """
+        rows = self.database.connection().execute(SELECT_CLIENT_TOTALS, (client_id, client_id))
+        return {row["client"]: {"vendas": row["vendas"], "receita": row["receita"] / 100} for row in rows}
+
+    @staticmethod
+    def _values(row: dict) -> tuple:
+        return row["client"], row["valor_total"], row["produtos"], row["snapshot"]
+
+    def count(self) -> int:
+        """
+        Conta o número de vendas, lido da tabela `sale_totals` (mantida por gatilhos).
+
+        Returns:
+            int: O número total de vendas registradas.
+        """
+        return self.database.connection().execute(COUNT).fetchone()[0]
@@ -0,0 +1,256 @@
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from models import Sandal
+from repositories.base import InsufficientStockError, SandalRepositoryBase, bulk_result
+from repositories.sqlite_database import SqliteDatabase
+
+
+COLUMNS = "id, codigo, nome, quantidade, valor, cor, tamanho"
+INSERT = (
+    "INSERT INTO sandal (codigo, nome, quantidade, valor, cor, tamanho) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM sandal WHERE id = ?"
+SELECT_BY_IDS = f"SELECT {COLUMNS} FROM sandal WHERE id IN (SELECT value FROM json_each(?))"
+SELECT_PAGE = (
+    f"SELECT {COLUMNS} FROM sandal "
+    "WHERE id > ? AND (? IS NULL OR cor = ? COLLATE NOCASE) AND (? IS NULL OR tamanho = ?) "
+    "ORDER BY id LIMIT ?"
+)
+UPDATE = (
+    "UPDATE sandal SET codigo = ?, nome = ?, quantidade = ?, valor = ?, cor = ?, tamanho = ? "
+    "WHERE id = ?"
+)
+DELETE = "DELETE FROM sandal WHERE id = ?"
+INSERT_WITH_ID = (
+    "INSERT INTO sandal (id, codigo, nome, quantidade, valor, cor, tamanho) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_IDS = "SELECT id FROM sandal WHERE id IN (SELECT value FROM json_each(?))"
+ADJUST_STOCK = "UPDATE sandal SET quantidade = quantidade + ? WHERE id = ? AND quantidade + ? >= 0"
+SELECT_STOCK = "SELECT id, quantidade FROM sandal WHERE id IN (SELECT value FROM json_each(?))"
+
+
+def apply_stock_deltas(conn: sqlite3.Connection, deltas: Dict[int, int]) -> Dict[int, int]:
+    """
+    Aplica variações de estoque dentro de uma transação já aberta.
+
+    Cada baixa é um `UPDATE` condicional (`quantidade + delta >= 0`), então a conferência
+    e a alteração são atômicas por sandália. Devoluções a sandálias excluídas são ignoradas.
+    Ao lançar, o chamador deve desfazer a transação (ou voltar a um savepoint).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com a transação aberta.
+        deltas (Dict[int, int]): Variação da quantidade por ID (negativa para baixa).
+
+    Returns:
+        Dict[int, int]: A nova quantidade de cada sandália alterada.
+
+    Raises:
+        ValueError: Se alguma sandália não for encontrada para uma baixa.
+        InsufficientStockError: Se alguma quantidade ficaria negativa.
+    """
+    for sandal_id, delta in sorted(deltas.items()):
+        if conn.execute(ADJUST_STOCK, (delta, sandal_id, delta)).rowcount == 0:
+            row = conn.execute(SELECT_BY_ID, (sandal_id,)).fetchone()
+            if row is None and delta > 0:
+                continue
+            if row is None:
+                raise ValueError(f"Sandália {sandal_id} não encontrada")
+            raise InsufficientStockError(
+                f"Estoque insuficiente da sandália {sandal_id}: "
+                f"disponível {row['quantidade']}, pedido {-delta}"
+            )
+    rows = conn.execute(SELECT_STOCK, (json.dumps(list(deltas)),))
+    return {row["id"]: row["quantidade"] for row in rows}
+
+
+class SqliteSandalRepository(SandalRepositoryBase):
+    """
+    Repositório de sandálias persistido em um banco SQLite.
+
+    Attributes:
+        database (SqliteDatabase): Banco de dados onde a tabela `sandal` é armazenada.
+    """
+
+    def __init__(self, database: SqliteDatabase):
+        """
+        Args:
+            database (SqliteDatabase): Banco de dados compartilhado pelos repositórios.
+        """
+        self.database = database
+
+    @property
+    def version(self) -> int:
+        """
+        Versão dos dados da tabela `sandal`, que também muda com escritas de outros processos.
+        """
+        return self.database.version("sandal")
+
+    def create(self, sandal: Sandal) -> Sandal:
+        """
+        Cria uma nova sandália.
+
+        Args:
+            sandal (Sandal): Objeto `Sandal` com os dados da sandália a ser criada.
+
+        Returns:
+            Sandal: A sandália criada com um ID atribuído.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(INSERT, self._values(sandal))
+        sandal.id = cursor.lastrowid
+        return sandal
+
+    def create_many(self, sandals: List[Sandal]) -> List[dict]:
+        """
+        Cria várias sandálias em uma única transação.
+
+        Args:
+            sandals (List[Sandal]): Sandálias a serem criadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sandals)
+        with self.database.transaction() as conn:
+            for sandal, erro in zip(sandals, erros):
+                if erro is None:
+                    sandal.id = conn.execute(INSERT, self._values(sandal)).lastrowid
+
+        return [
+            bulk_result(index, "error", detail=erro) if erro else bulk_result(index, "created", sandal.id)
+            for index, (sandal, erro) in enumerate(zip(sandals, erros))
+        ]
+
+    def upsert_many(self, sandals: List[Sandal]) -> List[dict]:
+        """
+        Atualiza as sandálias cujo ID já existe e cria as demais, em uma única transação.
+
+        Args:
+            sandals (List[Sandal]): Sandálias a serem gravadas.
+
+        Returns:
+            List[dict]: Resultado de cada item, na ordem recebida.
+        """
+        erros = self._validate_many(sandals)
+        resultados: List[dict] = []
+        with self.database.transaction() as conn:
+            ids = json.dumps([sandal.id for sandal in sandals])
+            existentes = {row["id"] for row in conn.execute(SELECT_IDS, (ids,))}
+            for index, (sandal, erro) in enumerate(zip(sandals, erros)):
+                if erro:
+                    resultados.append(bulk_result(index, "error", detail=erro))
+                elif sandal.id in existentes:
+                    conn.execute(UPDATE, (*self._values(sandal), sandal.id))
+                    resultados.append(bulk_result(index, "updated", sandal.id))
+                else:
+                    if sandal.id > 0:
+                        conn.execute(INSERT_WITH_ID, (sandal.id, *self._values(sandal)))
+                    else:
+                        sandal.id = conn.execute(INSERT, self._values(sandal)).lastrowid
+                    existentes.add(sandal.id)
+                    resultados.append(bulk_result(index, "created", sandal.id))
+        return resultados
+
+    def search_por_id(self, sandal_id: int) -> Optional[Sandal]:
+        """
+        Busca uma sandália pelo ID.
+
+        Args:
+            sandal_id (int): O ID da sandália a ser buscada.
+
+        Returns:
+            Optional[Sandal]: A sandália encontrada ou `None` se não for encontrada.
+        """
+        row = self.database.connection().execute(SELECT_BY_ID, (sandal_id,)).fetchone()
+        return Sandal(**row) if row is not None else None
+
+    def search_por_ids(self, sandal_ids: Iterable[int]) -> Dict[int, Sandal]:
+        """
+        Busca várias sandálias pelo ID em uma única consulta.
+
+        Args:
+            sandal_ids (Iterable[int]): IDs das sandálias a serem buscadas.
+
+        Returns:
+            Dict[int, Sandal]: Mapa de ID para sandália, contendo apenas os IDs encontrados.
+        """
+        ids = json.dumps(sorted(set(sandal_ids)))
+        rows = self.database.connection().execute(SELECT_BY_IDS, (ids,))
+        return {row["id"]: Sandal(**row) for row in rows}
+
+    def update(self, sandal: Sandal) -> Sandal:
+        """
+        Atualiza os dados de uma sandália.
+
+        Args:
+            sandal (Sandal): Objeto `Sandal` contendo os dados atualizados da sandália.
+
+        Returns:
+            Sandal: A sandália atualizada.
+
+        Raises:
+            ValueError: Se a sandália não for encontrada.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(UPDATE, (*self._values(sandal), sandal.id))
+        if cursor.rowcount == 0:
+            raise ValueError("User not found")
+        return sandal
+
+    def delete(self, sandal_id: int) -> bool:
+        """
+        Exclui uma sandália pelo ID.
+
+        Args:
+            sandal_id (int): O ID da sandália a ser excluída.
+
+        Returns:
+            bool: `True` se a sandália foi excluída com sucesso, `False` caso contrário.
+        """
+        with self.database.transaction() as conn:
+            cursor = conn.execute(DELETE, (sandal_id,))
+        return cursor.rowcount > 0
+
+    def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        cor: str | None = None,
+        tamanho: int | None = None,
+    ) -> List[Sandal]:
+        """
+        Lista as sandálias em ordem de ID, com paginação por cursor e filtros opcionais.
+
+        O cursor é aplicado como `id > ?` sobre a chave primária, então a consulta começa
+        direto no ponto certo do índice e para ao atingir o limite.
+
+        Args:
+            limit (int | None): Quantidade máxima de sandálias retornadas.
+            cursor (int | None): Retorna apenas sandálias com ID maior que este.
+            cor (str | None): Filtra pela cor, sem diferenciar maiúsculas.
+            tamanho (int | None): Filtra pelo tamanho.
+
+        Returns:
+            List[Sandal]: Lista de objetos `Sandal` encontrados.
+        """
+        parametros = (cursor or 0, cor, cor, tamanho, tamanho, -1 if limit is None else limit)
+        rows = self.database.connection().execute(SELECT_PAGE, parametros)
+        return [Sandal(**row) for row in rows]
+
+    @staticmethod
+    def _values(sandal: Sandal) -> tuple:
+        """
+        Retorna os campos da sandália na ordem das colunas, sem o ID.
+        """
+        return (
+            sandal.codigo,
+            sandal.nome,
+            sandal.quantidade,
+            sandal.valor,
+            sandal.cor,
+            sandal.tamanho,
+        )
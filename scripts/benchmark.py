@@ -0,0 +1,510 @@
+"""
+Benchmarks dos métodos dos repositórios e das principais rotas da API.
+
+Os dados são gerados por `scripts.synthetic_data` em uma pasta de trabalho com a estrutura de
+`repositories/data/`, e a aplicação de `main.py` é montada sobre ela com o backend escolhido
+(com `--backend sqlite`, os CSVs gerados são migrados para o banco). Os métodos são chamados
+direto nos repositórios e as rotas, pelo `TestClient` do FastAPI. Cada benchmark roda algumas
+vezes sem medição e depois `--repeat` vezes; o resultado traz o mínimo, a mediana, a média e o
+p95 de cada um, em milissegundos.
+
+Com `--output`, os resultados são gravados em JSON. Com `--baseline`, são comparados pela
+mediana aos de um JSON gravado antes: um benchmark mais lento que o baseline além de
+`--threshold` (0.2 = 20%) e de `--min-delta-ms` é uma regressão, e o comando termina com
+código 1. A diferença mínima em milissegundos evita que o ruído das operações de poucos
+microssegundos seja reportado como regressão, e um benchmark mais lento é medido de novo até
+`--retries` vezes antes de ser reportado, ficando a melhor medição.
+
+Tempos absolutos só são comparáveis na mesma máquina, então o baseline não é versionado:
+`--save-baseline` grava os resultados como o baseline local da escala e do backend
+(`.benchmarks/<escala>-<backend>.json`, ignorado pelo git), e `--baseline` sem arquivo
+compara com ele. O fluxo é gravar o baseline antes da alteração e comparar depois, nas
+escalas que a alteração afeta (1k, 100k e 1M). Junto com cada benchmark é medido um laço de
+calibração fixo, em Python puro; na comparação, a mediana do baseline é multiplicada pela
+razão entre as calibrações, o que compensa a máquina estar mais lenta ou mais rápida (por
+carga, frequência da CPU etc.) do que quando o baseline foi gravado.
+
+Uso:
+    python -m scripts.benchmark [--scale 1k|100k|1M] [--backend csv|sqlite] [--repeat 50]
+        [--filter TEXTO] [--output ARQUIVO] [--save-baseline [ARQUIVO]] [--baseline [ARQUIVO]]
+        [--threshold 0.2] [--min-delta-ms 0.05] [--retries 3] [--dir DIR]
+"""
+import argparse
+import csv
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from scripts.synthetic_data import SCALES, counts, generate
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Baselines locais, um por escala e backend
+BASELINES = os.path.join(RAIZ, ".benchmarks")
+
+# Execuções sem medição antes de cada benchmark
+AQUECIMENTO = 3
+# Limite de execuções dos benchmarks lentos (reconstrução do ZIP)
+REPETICOES_LENTAS = 5
+# Execuções do laço de calibração, antes e depois de cada benchmark
+CALIBRACOES = 5
+
+
+class Benchmark:
+    """
+    Uma operação medida.
+
+    Attributes:
+        nome (str): Nome do benchmark nos resultados.
+        executar (Callable[[], object]): A operação; só ela é cronometrada.
+        antes (Callable[[], object] | None): Preparação feita antes de cada execução, fora da medição.
+        repeticoes (int | None): Limite de execuções, para operações lentas.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        executar: Callable[[], object],
+        antes: Callable[[], object] | None = None,
+        repeticoes: int | None = None,
+    ):
+        self.nome = nome
+        self.executar = executar
+        self.antes = antes
+        self.repeticoes = repeticoes
+
+
+def prepare(pasta: str, escala: str, backend: str):
+    """
+    Gera os dados em `pasta` (se ainda não houver) e monta a aplicação sobre eles.
+
+    Os caminhos de `utils.paths` são relativos, então o diretório de trabalho passa a ser `pasta`.
+
+    Returns:
+        module: O módulo `main`, com a aplicação e os repositórios.
+    """
+    pasta_csv = os.path.join(pasta, "repositories", "data", "archive_csv")
+    os.makedirs(os.path.join(pasta, "repositories", "data", "archive_zip"), exist_ok=True)
+    if not os.path.exists(os.path.join(pasta_csv, "sale.csv")):
+        generate(pasta_csv, escala)
+
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    os.chdir(pasta)
+    os.environ["STORAGE_BACKEND"] = backend
+    if backend == "sqlite":
+        from repositories.migrator import migrate_csv_to_sqlite
+        from repositories.sqlite_database import SqliteDatabase
+        from utils.paths import CLIENT_CSV, SALE_CSV, SANDAL_CSV, SQLITE_DB
+
+        if not os.path.exists(SQLITE_DB):
+            migrate_csv_to_sqlite(SqliteDatabase(SQLITE_DB), CLIENT_CSV, SANDAL_CSV, SALE_CSV)
+    return importlib.import_module("main")
+
+
+def repository_benchmarks(app, quantidades: Dict[str, int], rng: random.Random) -> List[Benchmark]:
+    """
+    Benchmarks chamados direto nos repositórios, sem a API nem o pool de threads.
+    """
+    from models import Client, Sale, Sandal
+
+    clients, sandals, sales = app.client_repository, app.sandal_repository, app.sale_repository
+    client = clients.search_por_id(1)
+    sandal = sandals.search_por_id(1)
+
+    def client_id() -> int:
+        return rng.randint(1, quantidades["client"])
+
+    def sandal_id() -> int:
+        return rng.randint(1, quantidades["sandal"])
+
+    def sale_id() -> int:
+        return rng.randint(1, quantidades["sale"])
+
+    def cursor(tabela: str) -> int:
+        return rng.randint(0, max(quantidades[tabela] - 100, 0))
+
+    def novo_client(record_id: int | None = None) -> Client:
+        return Client(id=record_id, nome="Benchmark", celular="90000-0000", endereco="Rua do Benchmark 1")
+
+    def novo_sandal(record_id: int = 0) -> Sandal:
+        return Sandal(
+            id=record_id, codigo="BENCH", nome="Benchmark", quantidade=1_000_000, valor=10.0, cor="Azul", tamanho=38
+        )
+
+    def nova_venda(record_id: int = 0) -> Sale:
+        return Sale(id=record_id, client=client, valor_total=sandal.valor, produtos=[sandal])
+
+    def sem_cache(executar: Callable[[], object]) -> Callable[[], object]:
+        def chamar():
+            cache, sales.cache = sales.cache, None
+            try:
+                return executar()
+            finally:
+                sales.cache = cache
+
+        return chamar
+
+    quente: Dict[str, int] = {}
+
+    def carregar_quente():
+        quente["id"] = sale_id()
+        sales.search_por_id(quente["id"])
+
+    benchmarks = [
+        Benchmark("client.search_por_id", lambda: clients.search_por_id(client_id())),
+        Benchmark("client.list", lambda: clients.list(limit=100, cursor=cursor("client"))),
+        Benchmark("sandal.search_por_id", lambda: sandals.search_por_id(sandal_id())),
+        Benchmark("sandal.list", lambda: sandals.list(limit=100, cursor=cursor("sandal"))),
+        Benchmark("sale.search_por_id", sem_cache(lambda: sales.search_por_id(sale_id()))),
+    ]
+    if sales.cache is not None:
+        benchmarks.append(
+            Benchmark("sale.search_por_id[cache]", lambda: sales.search_por_id(quente["id"]), antes=carregar_quente)
+        )
+    benchmarks += [
+        Benchmark("sale.list", lambda: sales.list(limit=100, cursor=cursor("sale"))),
+        Benchmark("sale.list_by_client", lambda: sales.list_by_client(client_id(), limit=100)),
+        Benchmark("sale.count", sales.count),
+        Benchmark("sale.totals", sales.totals),
+        Benchmark("client.create", lambda: clients.create(novo_client())),
+        Benchmark("client.update", lambda: clients.update(novo_client(client_id()))),
+        Benchmark("sandal.create", lambda: sandals.create(novo_sandal())),
+        Benchmark("sandal.update", lambda: sandals.update(novo_sandal(sandal_id()))),
+        Benchmark("sale.create_sale", lambda: sales.create_sale(nova_venda())),
+        Benchmark("sale.update", lambda: sales.update(nova_venda(sale_id()))),
+    ]
+    return benchmarks
+
+
+def route_benchmarks(app, quantidades: Dict[str, int], rng: random.Random) -> List[Benchmark]:
+    """
+    Benchmarks das rotas, pelo `TestClient`: incluem a validação, a serialização e o pool de threads.
+    """
+    from fastapi.testclient import TestClient
+
+    http = TestClient(app.app)
+    client = http.get("/clients/1").json()
+    sandal = http.get("/sandals/1").json()
+
+    def enviar(metodo: str, url: str, **kwargs):
+        resposta = http.request(metodo, url, **kwargs)
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{metodo} {url}: {resposta.status_code} {resposta.text[:200]}")
+        return resposta
+
+    def record_id(tabela: str) -> int:
+        return rng.randint(1, quantidades[tabela])
+
+    def cursor(tabela: str) -> int:
+        return rng.randint(0, max(quantidades[tabela] - 100, 0))
+
+    def venda(sale_id: int = 0) -> dict:
+        return {"id": sale_id, "client": client, "valor_total": sandal["valor"], "produtos": [sandal]}
+
+    def atualizar(url: str, tabela: str, corpo: Callable[[int], dict]):
+        alvo = record_id(tabela)
+        return enviar("PUT", f"{url}/{alvo}", json=corpo(alvo))
+
+    def reconstruir_zip(nivel: int):
+        resposta = enviar("POST", "/zip/create/", params={"compresslevel": nivel})
+        job_id = resposta.headers.get("x-zip-job") or resposta.json()["id"]
+        while (job := enviar("GET", f"/zip/jobs/{job_id}").json())["status"] not in ("done", "failed"):
+            time.sleep(0.002)
+        if job["status"] == "failed":
+            raise RuntimeError(f"Falha ao gerar o ZIP: {job['erro']}")
+
+    def descartar_manifesto():
+        app.data_service.manifest_path.unlink(missing_ok=True)
+
+    def garantir_zip():
+        if not app.data_service.zip_path.exists():
+            reconstruir_zip(app.data_service.compresslevel)
+
+    etag: Dict[str, str] = {}
+
+    def ler_etag():
+        garantir_zip()
+        etag["atual"] = enviar("HEAD", "/zip/download/").headers["etag"]
+
+    return [
+        Benchmark("GET /clients/{id}", lambda: enviar("GET", f"/clients/{record_id('client')}")),
+        Benchmark("GET /clients", lambda: enviar("GET", "/clients", params={"limit": 100, "cursor": cursor("client")})),
+        Benchmark("GET /sandals/{id}", lambda: enviar("GET", f"/sandals/{record_id('sandal')}")),
+        Benchmark("GET /sandals", lambda: enviar("GET", "/sandals", params={"limit": 100, "cursor": cursor("sandal")})),
+        Benchmark("GET /sales/{id}", lambda: enviar("GET", f"/sales/{record_id('sale')}")),
+        Benchmark("GET /sales", lambda: enviar("GET", "/sales", params={"limit": 100, "cursor": cursor("sale")})),
+        Benchmark(
+            "GET /clients/{id}/sales",
+            lambda: enviar("GET", f"/clients/{record_id('client')}/sales", params={"limit": 100}),
+        ),
+        Benchmark("GET /sales/aggregates", lambda: enviar("GET", "/sales/aggregates")),
+        Benchmark("POST /clients", lambda: enviar("POST", "/clients", json={**client, "id": 0})),
+        Benchmark("PUT /clients/{id}", lambda: atualizar("/clients", "client", lambda i: {**client, "id": i})),
+        Benchmark("PUT /sandals/{id}", lambda: atualizar("/sandals", "sandal", lambda i: {**sandal, "id": i})),
+        Benchmark("POST /sales", lambda: enviar("POST", "/sales", json=venda())),
+        Benchmark("PUT /sales/{id}", lambda: atualizar("/sales", "sale", venda)),
+        Benchmark(
+            "POST /zip/create/[0]", lambda: reconstruir_zip(0), antes=descartar_manifesto, repeticoes=REPETICOES_LENTAS
+        ),
+        Benchmark(
+            "POST /zip/create/[6]", lambda: reconstruir_zip(6), antes=descartar_manifesto, repeticoes=REPETICOES_LENTAS
+        ),
+        Benchmark(
+            "GET /zip/download/",
+            lambda: enviar("GET", "/zip/download/"),
+            antes=garantir_zip,
+            repeticoes=REPETICOES_LENTAS,
+        ),
+        Benchmark(
+            "GET /zip/download/[304]",
+            lambda: enviar("GET", "/zip/download/", headers={"If-None-Match": etag["atual"]}),
+            antes=ler_etag,
+        ),
+    ]
+
+
+def measure(benchmark: Benchmark, repeat: int) -> dict:
+    """
+    Executa o benchmark e resume os tempos medidos.
+
+    O laço de calibração roda logo antes e logo depois das execuções medidas.
+
+    Returns:
+        dict: `runs`, `min_ms`, `median_ms`, `mean_ms`, `p95_ms` e `calibration_ms`.
+    """
+    execucoes = min(repeat, benchmark.repeticoes or repeat)
+    calibracoes = [calibrate()]
+    tempos: List[float] = []
+    for rodada in range(min(AQUECIMENTO, execucoes) + execucoes):
+        if benchmark.antes is not None:
+            benchmark.antes()
+        inicio = time.perf_counter()
+        benchmark.executar()
+        if rodada >= min(AQUECIMENTO, execucoes):
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    calibracoes.append(calibrate())
+    p95 = statistics.quantiles(tempos, n=20, method="inclusive")[18] if len(tempos) > 1 else tempos[0]
+    return {
+        "runs": len(tempos),
+        "min_ms": round(min(tempos), 4),
+        "median_ms": round(statistics.median(tempos), 4),
+        "mean_ms": round(statistics.fmean(tempos), 4),
+        "p95_ms": round(p95, 4),
+        "calibration_ms": min(calibracoes),
+    }
+
+
+def calibrate() -> float:
+    """
+    Mede um trabalho fixo em Python puro, parecido com o dos repositórios: converter linhas
+    CSV em dicionários, indexá-las e ordená-las.
+
+    O mínimo das execuções é usado por variar menos que a mediana entre uma rodada e outra.
+
+    Returns:
+        float: O menor tempo de `CALIBRACOES` execuções, em milissegundos.
+    """
+    linhas = [f"{i},{i % 97},{i * 1.5:.2f},\"{i % 13},{i % 7}\",Cliente {i}" for i in range(5_000)]
+
+    def trabalho():
+        indice = {}
+        for campos in csv.reader(linhas):
+            indice[int(campos[0])] = dict(zip(("id", "client", "valor_total", "produtos", "nome"), campos))
+        return sorted(indice.values(), key=lambda row: (row["client"], -float(row["valor_total"])))
+
+    tempos = []
+    for _ in range(CALIBRACOES):
+        inicio = time.perf_counter()
+        trabalho()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return round(min(tempos), 4)
+
+
+def adjusted(resultado: dict, anterior: dict) -> float:
+    """
+    Mediana de um resultado do baseline ajustada pela razão entre as calibrações medidas
+    junto com o benchmark nas duas execuções (sem ajuste se alguma não tiver calibração).
+
+    Returns:
+        float: A mediana ajustada, em milissegundos.
+    """
+    if resultado.get("calibration_ms") and anterior.get("calibration_ms"):
+        return anterior["median_ms"] * resultado["calibration_ms"] / anterior["calibration_ms"]
+    return anterior["median_ms"]
+
+
+def compare(resultados: Dict[str, dict], baseline: Dict[str, dict]) -> Dict[str, float]:
+    """
+    Compara as medianas com as do baseline, ajustadas por `adjusted`.
+
+    Returns:
+        Dict[str, float]: Variação relativa da mediana de cada benchmark presente nos dois
+            (0.25 = 25% mais lento).
+    """
+    return {
+        nome: resultado["median_ms"] / adjusted(resultado, baseline[nome]) - 1
+        for nome, resultado in resultados.items()
+        if nome in baseline and baseline[nome]["median_ms"] > 0
+    }
+
+
+def regressions(
+    resultados: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta_ms: float
+) -> List[str]:
+    """
+    Benchmarks cuja mediana piorou além de `threshold` e de `min_delta_ms` em relação à
+    mediana ajustada do baseline.
+
+    Returns:
+        List[str]: Os nomes dos benchmarks, na ordem dos resultados.
+    """
+    return [
+        nome
+        for nome, variacao in compare(resultados, baseline).items()
+        if variacao > threshold
+        and resultados[nome]["median_ms"] - adjusted(resultados[nome], baseline[nome]) > min_delta_ms
+    ]
+
+
+def baseline_path(escala: str, backend: str) -> str:
+    """
+    Caminho do baseline local de uma escala e um backend.
+    """
+    return os.path.join(BASELINES, f"{escala}-{backend}.json")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--repeat", type=int, default=50, help="Execuções medidas de cada benchmark")
+    parser.add_argument("--filter", action="append", help="Roda só os benchmarks cujo nome contém o texto")
+    parser.add_argument("--output", help="Arquivo JSON onde gravar os resultados")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const="",
+        help="Arquivo JSON de uma execução anterior, para comparação (sem arquivo: o baseline local)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const="",
+        help="Grava os resultados como baseline (sem arquivo: o baseline local da escala e do backend)",
+    )
+    parser.add_argument("--threshold", type=float, default=0.2, help="Piora tolerada da mediana (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Piora mínima da mediana, em ms")
+    parser.add_argument(
+        "--retries", type=int, default=3, help="Novas medições de um benchmark mais lento que o baseline"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", help="Pasta de trabalho, reaproveitada se já tiver dados (padrão: temporária)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline is not None:
+        if not args.baseline:
+            args.baseline = baseline_path(args.scale, args.backend)
+        if not os.path.exists(args.baseline):
+            print(f"Baseline {args.baseline} não encontrado; grave um antes com --save-baseline")
+            return 2
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    if args.save_baseline == "":
+        args.save_baseline = baseline_path(args.scale, args.backend)
+    saidas = [os.path.abspath(caminho) for caminho in (args.output, args.save_baseline) if caminho]
+    origem = os.getcwd()
+
+    pasta = os.path.abspath(args.dir) if args.dir else tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        inicio = time.perf_counter()
+        app = prepare(pasta, args.scale, args.backend)
+        quantidades = counts(args.scale)
+        print(f"{args.scale} ({args.backend}) pronto em {time.perf_counter() - inicio:.1f} s, em {pasta}")
+
+        rng = random.Random(args.seed)
+        benchmarks = repository_benchmarks(app, quantidades, rng) + route_benchmarks(app, quantidades, rng)
+        if args.filter:
+            benchmarks = [b for b in benchmarks if any(texto in b.nome for texto in args.filter)]
+
+        resultados: Dict[str, dict] = {}
+        for benchmark in benchmarks:
+            resultados[benchmark.nome] = resultado = measure(benchmark, args.repeat)
+            print(
+                f"  {benchmark.nome:<32} mediana {resultado['median_ms']:>10.3f} ms"
+                f"   p95 {resultado['p95_ms']:>10.3f} ms"
+            )
+
+        # Uma piora só é regressão se persistir: os benchmarks mais lentos que o baseline são
+        # medidos de novo e fica a melhor medição, para descartar o ruído da máquina.
+        for _ in range(args.retries if baseline is not None else 0):
+            suspeitos = regressions(resultados, baseline["results"], args.threshold, args.min_delta_ms)
+            if not suspeitos:
+                break
+            print(f"Medindo de novo: {', '.join(suspeitos)}")
+            for benchmark in benchmarks:
+                if benchmark.nome in suspeitos:
+                    resultado = measure(benchmark, args.repeat)
+                    anterior = baseline["results"][benchmark.nome]
+                    atual = resultados[benchmark.nome]
+                    if resultado["median_ms"] / adjusted(resultado, anterior) < atual["median_ms"] / adjusted(
+                        atual, anterior
+                    ):
+                        resultados[benchmark.nome] = resultado
+    finally:
+        os.chdir(origem)
+        if not args.dir:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    relatorio = {
+        "meta": {
+            "scale": args.scale,
+            "backend": args.backend,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": resultados,
+    }
+    for saida in saidas:
+        os.makedirs(os.path.dirname(saida), exist_ok=True)
+        with open(saida, "w") as file:
+            json.dump(relatorio, file, indent=2)
+
+    if baseline is None:
+        return 0
+    meta = baseline.get("meta", {})
+    if (meta.get("scale"), meta.get("backend")) != (args.scale, args.backend):
+        print(f"Aviso: baseline de {meta.get('scale')} ({meta.get('backend')}); a comparação pode não fazer sentido")
+    if meta.get("machine") != platform.node():
+        print(f"Aviso: baseline gravado em outra máquina ({meta.get('machine')}); os tempos podem não ser comparáveis")
+    variacoes = compare(resultados, baseline["results"])
+    antes = {nome: adjusted(resultados[nome], baseline["results"][nome]) for nome in variacoes}
+    regressoes = regressions(resultados, baseline["results"], args.threshold, args.min_delta_ms)
+    print(
+        f"Comparação com {args.baseline} (tolerância {args.threshold:.0%} e {args.min_delta_ms} ms; "
+        "baseline ajustado pela calibração):"
+    )
+    for nome, variacao in variacoes.items():
+        depois = resultados[nome]["median_ms"]
+        marca = "  REGRESSÃO" if nome in regressoes else ""
+        print(f"  {nome:<32} {variacao:>+8.1%}  ({antes[nome]:.3f} -> {depois:.3f} ms){marca}")
+    print(f"{len(regressoes)} regressões" if regressoes else "OK: nenhuma regressão")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+"""
+Teste de estresse das escritas concorrentes nos repositórios CSV.
+
+Vários processos, cada um com várias threads, criam, atualizam e excluem clientes, sandálias
+e vendas nos mesmos arquivos. Cada thread trabalha apenas com os registros que criou e
+guarda o estado final esperado deles; no fim, os arquivos são relidos por repositórios novos e
+comparados com o esperado. Qualquer escrita perdida, ID repetido ou registro excluído que
+reapareça é reportado e o comando termina com código 1.
+
+Cada venda própria dá baixa de uma unidade da sandália criada no mesmo ciclo, a atualização
+passa a venda para duas unidades e a exclusão as devolve, então o estoque final esperado de
+cada sandália também é conferido. Além disso, todas as threads vendem, com `create_sale`,
+unidades de algumas sandálias compartilhadas, com estoque para apenas parte das tentativas. No
+fim, o estoque restante de cada uma somado às unidades vendidas deve ser igual ao estoque inicial.
+
+Uso:
+    python -m scripts.stress_writes [--processes 4] [--threads 4] [--ops 50] [--dir DIR]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from models import Client, Sale, Sandal
+from repositories import ClientRepository, InsufficientStockError, SaleRepository, SandalRepository
+
+# Sandálias vendidas por todas as threads e o estoque inicial de cada uma, em vendas por thread
+COMPARTILHADAS = 4
+ESTOQUE_POR_THREAD = 0.5
+
+
+def open_repositories(pasta: str):
+    client_repository = ClientRepository(os.path.join(pasta, "client.csv"), compact_threshold=50)
+    sandal_repository = SandalRepository(os.path.join(pasta, "sandal.csv"))
+    sale_repository = SaleRepository(
+        os.path.join(pasta, "sale.csv"), sandal_repository, client_repository, compact_threshold=50
+    )
+    return client_repository, sandal_repository, sale_repository
+
+
+def run_thread(repositories, worker: str, ops: int, compartilhadas: list[int]) -> dict:
+    """
+    Executa `ops` ciclos de criação, atualização e, a cada terceiro, exclusão em cada repositório,
+    e uma venda de uma das sandálias compartilhadas por ciclo.
+
+    Returns:
+        dict: Por tabela, os IDs criados e o valor final esperado de cada registro (`None` se
+            excluído), e em `vendidas` as unidades vendidas de cada sandália compartilhada.
+    """
+    client_repository, sandal_repository, sale_repository = repositories
+    esperado = {"client": {}, "sandal": {}, "sale": {}, "vendidas": {}}
+    for i in range(ops):
+        client = client_repository.create(Client(nome=f"{worker}-{i}", celular="0", endereco="-"))
+        client.nome = f"{worker}-{i}-atualizado"
+        client_repository.update(client)
+        esperado["client"][client.id] = client.nome
+
+        sandal = sandal_repository.create(
+            Sandal(id=0, codigo=f"{worker}-{i}", nome="S", quantidade=0, valor=1.0, cor="azul", tamanho=38)
+        )
+        sandal.quantidade = i + 2
+        sandal_repository.update(sandal)
+
+        sale = sale_repository.create(Sale(id=0, client=client, valor_total=1.0, produtos=[sandal]))
+        sale.valor_total = float(i + 2)
+        sale.produtos = [sandal, sandal]
+        sale_repository.update(sale)
+        esperado["sale"][sale.id] = sale.valor_total
+        esperado["sandal"][sandal.id] = i
+
+        if i % 3 == 0:
+            sale_repository.delete(sale.id)
+            esperado["sale"][sale.id] = None
+            esperado["sandal"][sandal.id] = i + 2
+
+        produto = sandal_repository.search_por_id(compartilhadas[i % len(compartilhadas)])
+        try:
+            venda = sale_repository.create_sale(Sale(id=0, client=client, valor_total=1.0, produtos=[produto]))
+        except InsufficientStockError:
+            continue
+        esperado["sale"][venda.id] = venda.valor_total
+        esperado["vendidas"][produto.id] = esperado["vendidas"].get(produto.id, 0) + 1
+    return esperado
+
+
+def run_process(pasta: str, processo: int, threads: int, ops: int, compartilhadas: list[int]) -> list:
+    repositories = open_repositories(pasta)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [
+            executor.submit(run_thread, repositories, f"p{processo}t{thread}", ops, compartilhadas)
+            for thread in range(threads)
+        ]
+        return [future.result() for future in futures]
+
+
+def verify(pasta: str, resultados: list, estoque_inicial: dict[int, int]) -> list[str]:
+    """
+    Relê os arquivos com repositórios novos e compara com o estado esperado.
+
+    Returns:
+        list[str]: Descrição de cada divergência encontrada.
+    """
+    client_repository, sandal_repository, sale_repository = open_repositories(pasta)
+    atual = {
+        "client": {client.id: client.nome for client in client_repository.list()},
+        "sandal": {
+            sandal.id: sandal.quantidade for sandal in sandal_repository.list() if sandal.id not in estoque_inicial
+        },
+        "sale": {sale.id: sale.valor_total for sale in sale_repository.list()},
+    }
+    erros = []
+    for tabela, registros in atual.items():
+        vistos: dict[int, int] = {}
+        for esperado in resultados:
+            for record_id, valor in esperado[tabela].items():
+                vistos[record_id] = vistos.get(record_id, 0) + 1
+                if valor is None and record_id in registros:
+                    erros.append(f"{tabela} {record_id}: excluído, mas ainda existe")
+                elif valor is not None and registros.get(record_id) != valor:
+                    erros.append(f"{tabela} {record_id}: esperado {valor!r}, encontrado {registros.get(record_id)!r}")
+        erros.extend(f"{tabela} {record_id}: ID entregue {n} vezes" for record_id, n in vistos.items() if n > 1)
+        vivos = sum(1 for esperado in resultados for valor in esperado[tabela].values() if valor is not None)
+        if len(registros) != vivos:
+            erros.append(f"{tabela}: esperados {vivos} registros, encontrados {len(registros)}")
+    if sale_repository.count() != len(atual["sale"]):
+        erros.append(f"sale: count() = {sale_repository.count()}, listadas {len(atual['sale'])}")
+    for sandal_id, inicial in estoque_inicial.items():
+        vendidas = sum(esperado["vendidas"].get(sandal_id, 0) for esperado in resultados)
+        restante = sandal_repository.search_por_id(sandal_id).quantidade
+        if restante < 0 or restante + vendidas != inicial:
+            erros.append(f"sandal {sandal_id}: estoque {inicial}, vendidas {vendidas}, restam {restante}")
+    if sandal_repository.pending_reservations():
+        erros.append(f"sandal: baixas sem confirmação {sandal_repository.pending_reservations()}")
+    return erros
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=50)
+    parser.add_argument("--dir", help="Pasta dos CSVs (por padrão, uma pasta temporária nova)")
+    args = parser.parse_args(argv)
+
+    pasta = args.dir or tempfile.mkdtemp(prefix="stress_writes_")
+    _, sandal_repository, _ = open_repositories(pasta)  # Cria os arquivos antes de iniciar os processos
+    estoque = int(args.processes * args.threads * args.ops * ESTOQUE_POR_THREAD / COMPARTILHADAS)
+    estoque_inicial = {
+        sandal_repository.create(
+            Sandal(id=0, codigo=f"c{n}", nome="C", quantidade=estoque, valor=1.0, cor="azul", tamanho=38)
+        ).id: estoque
+        for n in range(COMPARTILHADAS)
+    }
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        por_processo = pool.starmap(
+            run_process,
+            [(pasta, processo, args.threads, args.ops, list(estoque_inicial)) for processo in range(args.processes)],
+        )
+    resultados = [esperado for processo in por_processo for esperado in processo]
+
+    erros = verify(pasta, resultados, estoque_inicial)
+    total = args.processes * args.threads * args.ops
+    print(f"{args.processes} processos x {args.threads} threads x {args.ops} ciclos ({total} por tabela) em {pasta}")
+    for erro in erros[:20]:
+        print(f"  {erro}")
+    print(f"{len(erros)} divergências" if erros else "OK: nenhuma escrita perdida")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
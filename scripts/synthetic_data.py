@@ -0,0 +1,117 @@
+"""
+Gera dados sintéticos de clientes, sandálias e vendas nos CSVs dos repositórios.
+
+Cada escala define a quantidade de vendas; há um cliente para cada 10 vendas e uma sandália
+para cada 100 (no mínimo 50). As vendas têm de 1 a 3 produtos, com o valor total igual à soma
+dos preços, e o estoque das sandálias é alto o bastante para que novas vendas não o esgotem.
+Os dados dependem apenas da semente, então duas gerações com a mesma escala são idênticas.
+
+Os logs, índices e agregados dos repositórios não são gerados: use uma pasta nova, que os
+repositórios completam ao abrir os CSVs.
+
+Uso:
+    python -m scripts.synthetic_data --dir DIR [--scale 1k|100k|1M] [--seed 0]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from typing import Dict
+
+from repositories.client_repository import FIELDNAMES as CLIENT_FIELDNAMES
+from repositories.sale_repository import FIELDNAMES as SALE_FIELDNAMES
+from repositories.sandal_repository import FIELDNAMES as SANDAL_FIELDNAMES
+
+
+# Quantidade de vendas de cada escala
+SCALES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Almeida"]
+RUAS = ["Rua das Flores", "Av. Brasil", "Rua do Sol", "Av. Paulista", "Travessa da Alegria"]
+CORES = ["Azul", "Vermelho", "Preto", "Branco", "Verde", "Rosa", "Amarelo", "Cinza"]
+MODELOS = ["Rasteira", "Anabela", "Chinelo", "Plataforma", "Gladiadora", "Papete"]
+
+
+def counts(escala: str) -> Dict[str, int]:
+    """
+    Quantidade de registros de cada tabela em uma escala.
+
+    Args:
+        escala (str): Uma das chaves de `SCALES`.
+
+    Returns:
+        Dict[str, int]: Quantidade de clientes, sandálias e vendas.
+    """
+    vendas = SCALES[escala]
+    return {"client": max(vendas // 10, 1), "sandal": max(vendas // 100, 50), "sale": vendas}
+
+
+def generate(pasta_csv: str, escala: str, seed: int = 0) -> Dict[str, int]:
+    """
+    Grava `client.csv`, `sandal.csv` e `sale.csv` em `pasta_csv`, substituindo os existentes.
+
+    Args:
+        pasta_csv (str): Pasta dos CSVs (criada se não existir).
+        escala (str): Uma das chaves de `SCALES`.
+        seed (int): Semente do gerador de números aleatórios.
+
+    Returns:
+        Dict[str, int]: Quantidade de registros gravados por tabela.
+    """
+    quantidades = counts(escala)
+    rng = random.Random(seed)
+    os.makedirs(pasta_csv, exist_ok=True)
+
+    with open(os.path.join(pasta_csv, "client.csv"), mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CLIENT_FIELDNAMES)
+        for client_id in range(1, quantidades["client"] + 1):
+            writer.writerow([
+                client_id,
+                f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+                f"9{rng.randrange(10_000):04d}-{rng.randrange(10_000):04d}",
+                f"{rng.choice(RUAS)} {rng.randrange(1, 2000)}",
+            ])
+
+    precos = []
+    with open(os.path.join(pasta_csv, "sandal.csv"), mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(SANDAL_FIELDNAMES)
+        for sandal_id in range(1, quantidades["sandal"] + 1):
+            preco = rng.randrange(1990, 19990, 100) / 100
+            precos.append(preco)
+            cor = rng.choice(CORES)
+            writer.writerow([
+                sandal_id, f"{sandal_id:06d}", f"{rng.choice(MODELOS)} {cor}", 1_000_000, f"{preco:.2f}",
+                cor, rng.randrange(33, 45),
+            ])
+
+    with open(os.path.join(pasta_csv, "sale.csv"), mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(SALE_FIELDNAMES)
+        for sale_id in range(1, quantidades["sale"] + 1):
+            produtos = [rng.randrange(1, quantidades["sandal"] + 1) for _ in range(rng.randrange(1, 4))]
+            valor_total = sum(precos[produto - 1] for produto in produtos)
+            writer.writerow([
+                sale_id, rng.randrange(1, quantidades["client"] + 1), f"{valor_total:.2f}",
+                ",".join(map(str, produtos)), "",
+            ])
+    return quantidades
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", required=True, help="Pasta dos CSVs")
+    args = parser.parse_args(argv)
+
+    quantidades = generate(args.dir, args.scale, args.seed)
+    print(", ".join(f"{n} {tabela}" for tabela, n in quantidades.items()), f"em {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
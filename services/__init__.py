@@ -2,3 +2,5 @@ from .client_service import ClientService as ClientService
 from .sandal_service import SandalService as SandalService
 from .sale_service import SaleService as SaleService
 from .data_service import DataService as DataService
+from .report_service import ReportService as ReportService
+from .change_service import ChangeService as ChangeService
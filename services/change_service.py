@@ -0,0 +1,286 @@
+import csv
+import itertools
+import json
+import os
+import tempfile
+import zipfile
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+from fastapi import HTTPException
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse
+
+from models import Client, Sandal
+from repositories import AsyncRepository, ChangeFeedTruncatedError, SaleRepositoryBase
+
+
+# Alterações resolvidas (e enviadas) por vez
+PAGINA = 1000
+
+TABELAS = ("client", "sandal", "sale")
+SALE_FIELDS = ["id", "client", "valor_total", "produtos"]
+FIELDNAMES = {"client": list(Client.model_fields), "sandal": list(Sandal.model_fields), "sale": SALE_FIELDS}
+
+
+class ChangeService:
+    """
+    Feed de alterações para réplicas: em vez de reimportar todos os dados, uma réplica guarda a
+    última versão que aplicou e pede apenas o que mudou depois dela.
+
+    O feed (`ChangeFeed` ou `SqliteChangeFeed`) registra a chave de cada registro incluído,
+    alterado ou excluído, com uma versão crescente. Cada registro alterado é enviado uma única
+    vez, com a maior versão em que mudou e o seu estado atual: `upsert` com o registro, ou
+    `delete` se ele não existe mais. As alterações saem em ordem de versão, então uma réplica
+    interrompida pode continuar a partir da versão da última alteração que recebeu.
+
+    Com `since=0` (réplica vazia), todos os registros atuais são enviados, com a versão atual.
+    O feed guarda só as alterações mais recentes: uma réplica cujo `since` é anterior a elas
+    recebe 410 e precisa sincronizar novamente com `since=0`.
+
+    As vendas são enviadas como as linhas persistidas (`id`, `client`, `valor_total` e os IDs
+    dos `produtos`), sem o snapshot, e a réplica as combina com os clientes e sandálias.
+
+    Attributes:
+        change_feed (ChangeFeed | SqliteChangeFeed): O feed de alterações.
+        repositories (Dict[str, AsyncRepository]): Repositórios por nome de tabela.
+        compresslevel (int): Nível de compressão do arquivo de alterações.
+    """
+
+    def __init__(
+        self,
+        change_feed,
+        sale_repository: AsyncRepository,
+        sandal_repository: AsyncRepository,
+        client_repository: AsyncRepository,
+        compresslevel: int = 6,
+    ):
+        """
+        Args:
+            change_feed (ChangeFeed | SqliteChangeFeed): O feed de alterações.
+            sale_repository (AsyncRepository): Repositório de vendas.
+            sandal_repository (AsyncRepository): Repositório de sandálias.
+            client_repository (AsyncRepository): Repositório de clientes.
+            compresslevel (int): Nível de compressão do arquivo de alterações (0 = sem compressão).
+        """
+        self.change_feed = change_feed
+        self.repositories = {"client": client_repository, "sandal": sandal_repository, "sale": sale_repository}
+        self.compresslevel = compresslevel
+
+    async def version(self) -> int:
+        """
+        Versão da última alteração registrada no feed.
+
+        Returns:
+            int: A versão atual.
+        """
+        return await self.repositories["sale"].run(lambda: self.change_feed.version)
+
+    async def changes(self, since: int) -> Tuple[int, AsyncIterator[str]]:
+        """
+        Alterações posteriores a `since`, em NDJSON.
+
+        Cada linha tem `versao`, `tabela`, `op` (`upsert` ou `delete`), `id` e `registro`
+        (`null` nas exclusões).
+
+        Args:
+            since (int): Última versão já aplicada pela réplica (0 para receber tudo).
+
+        Returns:
+            Tuple[int, AsyncIterator[str]]: A versão até a qual as alterações são enviadas e o
+                conteúdo, gerado sob demanda.
+
+        Raises:
+            HTTPException: 409 se `since` for maior que a versão atual, ou 410 se as alterações
+                posteriores a `since` já foram descartadas do feed.
+        """
+        versao = await self.version()
+        self._check_since(since, versao)
+        alteracoes = await self._latest(since, versao)
+        return versao, self._ndjson(self._pages(versao, alteracoes))
+
+    async def archive(self, since: int) -> FileResponse:
+        """
+        Alterações posteriores a `since` reunidas em um arquivo ZIP.
+
+        O arquivo tem um CSV por tabela com os registros incluídos ou alterados (as colunas de
+        `FIELDNAMES`; os produtos das vendas separados por vírgula), `deletes.csv` com a
+        tabela e o ID dos registros excluídos e `manifest.json` com `since`, `versao` e as
+        quantidades de cada tipo.
+
+        Args:
+            since (int): Última versão já aplicada pela réplica (0 para receber tudo).
+
+        Returns:
+            FileResponse: O arquivo ZIP, com a versão no cabeçalho `X-Change-Version`.
+
+        Raises:
+            HTTPException: 409 se `since` for maior que a versão atual, ou 410 se as alterações
+                posteriores a `since` já foram descartadas do feed.
+        """
+        versao = await self.version()
+        self._check_since(since, versao)
+        alteracoes = await self._latest(since, versao)
+        caminho = await self.repositories["sale"].run(self._write_archive, since, versao, alteracoes)
+        return FileResponse(
+            caminho,
+            media_type="application/zip",
+            filename=f"changes-{since}-{versao}.zip",
+            headers={"X-Change-Version": str(versao)},
+            background=BackgroundTask(os.remove, caminho),
+        )
+
+    @staticmethod
+    def _check_since(since: int, versao: int):
+        if since > versao:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Versão {since} posterior à atual ({versao}); sincronize novamente com since=0",
+            )
+
+    async def _ndjson(self, pages: Iterator[List[dict]]) -> AsyncIterator[str]:
+        """
+        Serializa as páginas de alterações como NDJSON, lendo cada página no pool de threads.
+        """
+        try:
+            while True:
+                pagina = await self.repositories["sale"].run(next, pages, None)
+                if pagina is None:
+                    return
+                yield "".join(f"{json.dumps(alteracao, ensure_ascii=False)}\n" for alteracao in pagina)
+        finally:
+            pages.close()
+
+    async def _latest(self, since: int, versao: int) -> List[Tuple[Tuple[str, int], int]] | None:
+        """
+        Lê do feed as alterações entre `since` e `versao` antes do envio, para que uma réplica
+        atrasada demais receba o erro em vez de uma resposta incompleta.
+
+        Cada registro aparece uma vez, com a maior versão em que mudou, em ordem de versão.
+
+        Returns:
+            List[Tuple[Tuple[str, int], int]] | None: A tabela e o ID de cada registro alterado,
+                com a versão, ou `None` com `since=0` (todos os registros atuais).
+
+        Raises:
+            HTTPException: 410 se as alterações já foram descartadas do feed.
+        """
+        if since == 0:
+            return None
+
+        def ler() -> List[Tuple[Tuple[str, int], int]]:
+            ultimas: Dict[Tuple[str, int], int] = {}
+            for numero, tabela, _, record_id in self.change_feed.since(since, versao):
+                ultimas[(tabela, record_id)] = numero
+            return sorted(ultimas.items(), key=lambda item: item[1])
+
+        try:
+            return await self.repositories["sale"].run(ler)
+        except ChangeFeedTruncatedError as e:
+            raise HTTPException(status_code=410, detail=f"{e}; sincronize novamente com since=0")
+
+    def _pages(self, versao: int, alteracoes: List[Tuple[Tuple[str, int], int]] | None) -> Iterator[List[dict]]:
+        """
+        Gera as alterações lidas por `_latest` em páginas de até `PAGINA` alterações.
+
+        Os registros de cada página são buscados em lote, um acesso por tabela.
+        """
+        if alteracoes is None:
+            yield from self._snapshot_pages(versao)
+            return
+
+        for inicio in range(0, len(alteracoes), PAGINA):
+            lote = alteracoes[inicio:inicio + PAGINA]
+            registros = {
+                tabela: self._fetch(tabela, [record_id for (nome, record_id), _ in lote if nome == tabela])
+                for tabela in TABELAS
+            }
+            yield [
+                self._change(numero, tabela, record_id, registros[tabela].get(record_id))
+                for (tabela, record_id), numero in lote
+            ]
+
+    def _snapshot_pages(self, versao: int) -> Iterator[List[dict]]:
+        """
+        Gera todos os registros atuais como inclusões, com a versão `versao`.
+        """
+        for tabela in ("client", "sandal"):
+            for pagina in self.repositories[tabela].repository.iter_pages(PAGINA):
+                yield [self._change(versao, tabela, item.id, item.model_dump()) for item in pagina]
+        rows = self.repositories["sale"].repository.iter_rows()
+        while pagina := list(itertools.islice(rows, PAGINA)):
+            yield [self._change(versao, "sale", int(row["id"]), self._sale_record(row)) for row in pagina]
+
+    def _fetch(self, tabela: str, ids: List[int]) -> Dict[int, dict]:
+        """
+        Busca o estado atual de registros de uma tabela. Registros excluídos ficam de fora.
+        """
+        if not ids:
+            return {}
+        repository = self.repositories[tabela].repository
+        if tabela == "sale":
+            return {sale_id: self._sale_record(row) for sale_id, row in repository.search_rows(ids).items()}
+        return {record_id: item.model_dump() for record_id, item in repository.search_por_ids(ids).items()}
+
+    @staticmethod
+    def _sale_record(row: dict) -> dict:
+        return {
+            "id": int(row["id"]),
+            "client": int(row["client"]),
+            "valor_total": float(row["valor_total"]),
+            "produtos": SaleRepositoryBase._parse_produtos(str(row["produtos"])),
+        }
+
+    @staticmethod
+    def _change(versao: int, tabela: str, record_id: int, registro: dict | None) -> dict:
+        return {
+            "versao": versao,
+            "tabela": tabela,
+            "op": "delete" if registro is None else "upsert",
+            "id": record_id,
+            "registro": registro,
+        }
+
+    def _write_archive(self, since: int, versao: int, alteracoes: List[Tuple[Tuple[str, int], int]] | None) -> str:
+        """
+        Grava as alterações em um ZIP temporário, removido depois do envio.
+
+        Returns:
+            str: Caminho do arquivo ZIP.
+        """
+        contagens = {tabela: 0 for tabela in TABELAS}
+        excluidos = 0
+        fd, caminho = tempfile.mkstemp(suffix=".zip")
+        os.close(fd)
+        try:
+            with tempfile.TemporaryDirectory() as pasta:
+                arquivos = {nome: open(os.path.join(pasta, f"{nome}.csv"), mode="w", newline="") for nome in (*TABELAS, "deletes")}
+                try:
+                    writers = {tabela: csv.DictWriter(arquivos[tabela], fieldnames=FIELDNAMES[tabela]) for tabela in TABELAS}
+                    writers["deletes"] = csv.DictWriter(arquivos["deletes"], fieldnames=["tabela", "id"])
+                    for writer in writers.values():
+                        writer.writeheader()
+                    for pagina in self._pages(versao, alteracoes):
+                        for alteracao in pagina:
+                            tabela, registro = alteracao["tabela"], alteracao["registro"]
+                            if registro is None:
+                                writers["deletes"].writerow({"tabela": tabela, "id": alteracao["id"]})
+                                excluidos += 1
+                                continue
+                            if tabela == "sale":
+                                registro = {**registro, "produtos": ",".join(map(str, registro["produtos"]))}
+                            writers[tabela].writerow(registro)
+                            contagens[tabela] += 1
+                finally:
+                    for arquivo in arquivos.values():
+                        arquivo.close()
+
+                compressao = zipfile.ZIP_DEFLATED if self.compresslevel else zipfile.ZIP_STORED
+                with zipfile.ZipFile(caminho, "w", compression=compressao, compresslevel=self.compresslevel or None) as zip_file:
+                    for nome in (*TABELAS, "deletes"):
+                        zip_file.write(os.path.join(pasta, f"{nome}.csv"), arcname=f"{nome}.csv")
+                    manifesto = {"since": since, "versao": versao, "upserts": contagens, "deletes": excluidos}
+                    zip_file.writestr("manifest.json", json.dumps(manifesto, indent=2))
+        except BaseException:
+            os.remove(caminho)
+            raise
+        return caminho
@@ -1,5 +1,8 @@
+from typing import AsyncIterator
+
 from models.client import Client
-from repositories import ClientRepository
+from repositories import AsyncRepository
+from services.export import export_lines
 from fastapi import HTTPException
 
 
@@ -9,19 +12,19 @@ class ClientService:
     utilizando um repositório de clientes.
 
     Attributes:
-        repository (ClientRepository): O repositório utilizado para persistir os dados dos clientes.
+        repository (AsyncRepository): O repositório utilizado para persistir os dados dos clientes.
     """
 
-    def __init__(self, repository: ClientRepository):
+    def __init__(self, repository: AsyncRepository):
         """
         Inicializa o serviço de clientes com o repositório fornecido.
 
         Args:
-            repository (ClientRepository): Instância do repositório que será utilizado para manipular dados de clientes.
+            repository (AsyncRepository): Instância do repositório que será utilizado para manipular dados de clientes.
         """
         self.repository = repository
 
-    def create(self, client: Client) -> Client:
+    async def create(self, client: Client) -> Client:
         """
         Cria um novo cliente.
 
@@ -33,11 +36,41 @@ class ClientService:
         """
 
         try:
-            return self.repository.create(client)
+            return await self.repository.create(client)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}" )
 
-    def search_client(self, client_id: int) -> Client | None:
+    async def create_many(self, clients: list[Client]) -> list[dict]:
+        """
+        Cria vários clientes de uma vez.
+
+        Args:
+            clients (list[Client]): Clientes a serem criados.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID criado ou o motivo da falha.
+        """
+        try:
+            return await self.repository.create_many(clients)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}")
+
+    async def upsert_many(self, clients: list[Client]) -> list[dict]:
+        """
+        Atualiza os clientes existentes e cria os demais, de uma vez.
+
+        Args:
+            clients (list[Client]): Clientes a serem gravados.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha.
+        """
+        try:
+            return await self.repository.upsert_many(clients)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}")
+
+    async def search_client(self, client_id: int) -> Client | None:
         """
         Busca um cliente pelo ID.
 
@@ -48,23 +81,53 @@ class ClientService:
             Client | None: O cliente encontrado, ou `None` se o cliente não for encontrado.
         """
         try:
-            return self.repository.search_por_id(client_id)
+            return await self.repository.search_por_id(client_id)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}" )
 
-    def list(self) -> list[Client]:
+    async def list(
+        self, limit: int | None = None, cursor: int | None = None, nome: str | None = None
+    ) -> list[Client]:
         """
-        Lista todos os clientes.
+        Lista os clientes, com paginação por cursor e filtro opcional por nome.
+
+        Args:
+            limit (int | None): Quantidade máxima de clientes retornados.
+            cursor (int | None): Retorna apenas clientes com ID maior que este.
+            nome (str | None): Trecho do nome do cliente.
 
         Returns:
-            list[Client]: Lista de objetos `Client` com todos os clientes cadastrados.
+            list[Client]: Lista de objetos `Client` encontrados.
         """
         try:
-            return self.repository.list()
+            return await self.repository.list(limit=limit, cursor=cursor, nome=nome)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}")
 
-    def update(self, client_id: int, client: Client) -> Client:
+    async def version(self) -> int:
+        """
+        Versão dos dados de clientes, que muda a cada escrita no repositório.
+
+        Returns:
+            int: A versão atual.
+        """
+        return await self.repository.run(lambda: self.repository.repository.version)
+
+    def export(self, formato: str, chunk_size: int = 1000) -> AsyncIterator[str]:
+        """
+        Exporta todos os clientes em NDJSON ou CSV, página a página.
+
+        Args:
+            formato (str): `ndjson` ou `csv`.
+            chunk_size (int): Quantidade de registros lidos por página.
+
+        Returns:
+            AsyncIterator[str]: Os pedaços do conteúdo exportado, gerados sob demanda.
+        """
+        pages = self.repository.iter_pages(chunk_size)
+        return export_lines(pages, formato, list(Client.model_fields))
+
+    async def update(self, client_id: int, client: Client) -> Client:
         """
         Atualiza os dados de um cliente existente.
 
@@ -81,12 +144,12 @@ class ClientService:
         
         try:
             client.id = client_id
-            return self.repository.update(client)
+            return await self.repository.update(client)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}")
 
 
-    def delete(self, client_id: int) -> bool:
+    async def delete(self, client_id: int) -> bool:
         """
         Exclui um cliente pelo ID.
 
@@ -97,6 +160,6 @@ class ClientService:
             bool: `True` se o cliente foi excluído com sucesso, `False` caso contrário.
         """ 
         try:
-            return self.repository.delete(client_id)
+            return await self.repository.delete(client_id)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {str(e)}")
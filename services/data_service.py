@@ -1,9 +1,39 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
 import zipfile
 from fastapi import HTTPException
 from hashlib import sha256
 from pathlib import Path
+from typing import Dict, List, Tuple
 
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse
+
+from utils.http_cache import CACHE_CONTROL, etag_matches, not_modified
+
+try:
+    import numpy as np
+except ImportError:  # Sem numpy: os registros são contados separando os pedaços nas aspas
+    np = None
+
+
+ZIP_NAME = "compact.zip"
+MANIFEST_NAME = "compact.manifest.json"
+# Cópias imutáveis do ZIP, nomeadas pelo SHA-256, servidas pelo download
+VERSION_NAME = "compact-{sha256}.zip"
+# Quantidade de cópias imutáveis mantidas (a atual e as anteriores)
+MAX_VERSIONS = 2
+
+# Tamanho dos pedaços lidos dos CSVs ao compactar e calcular hashes
+BLOCO_LEITURA = 1 << 20
+# Quantidade de jobs concluídos mantidos para consulta
+MAX_JOBS = 32
+
+logger = logging.getLogger(__name__)
 
 
 class DataService:
@@ -11,54 +41,135 @@ class DataService:
     Serviço que lida com a manipulação de arquivos CSV e ZIP, incluindo a criação de arquivos ZIP
     contendo arquivos CSV e a geração de um hash SHA256 para arquivos ZIP.
 
+    O `compact.zip` é acompanhado de um manifesto (`compact.manifest.json`) com a impressão
+    digital de cada CSV compactado (mtime, tamanho, SHA-256 e quantidade de registros), o
+    SHA-256 e o tamanho do próprio ZIP e o nível de compressão usado. Todos os hashes são
+    calculados durante a compactação, na mesma passada que lê os CSVs e grava o ZIP.
+    Enquanto os CSVs não mudam, o arquivo existente é reaproveitado; quando mudam, ele é
+    reconstruído em uma thread em segundo plano e substituído de forma atômica, de modo que
+    sempre há um último arquivo válido para servir. Cada versão também é mantida como uma
+    cópia imutável (`compact-<sha256>.zip`), que o download serve sob o ETag do seu conteúdo.
+
     Attributes:
         pasta_csv (Path): O diretório onde os arquivos CSV estão localizados.
         pasta_zip (Path): O diretório onde o arquivo ZIP será armazenado.
+        compresslevel (int): Nível de compressão padrão (0 = sem compressão, 1 a 9 = deflate).
     """
 
-    def __init__(self, pasta_csv, pasta_zip):
+    def __init__(self, pasta_csv, pasta_zip, compresslevel: int = 6):
         """
         Args:
             pasta_csv (str): O caminho para a pasta contendo os arquivos CSV.
             pasta_zip (str): O caminho para a pasta onde o arquivo ZIP será gerado.
+            compresslevel (int): Nível de compressão padrão (0 = sem compressão, 1 a 9 = deflate).
         """
         self.pasta_csv = Path(pasta_csv)
         self.pasta_zip = Path(pasta_zip)
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._building: dict | None = None
+        self._zip_hash: tuple | None = None  # ((mtime_ns, tamanho), sha256) de um ZIP fora do manifesto
+
+    @property
+    def zip_path(self) -> Path:
+        return self.pasta_zip / ZIP_NAME
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.pasta_zip / MANIFEST_NAME
+
+    def create_zip(self, compresslevel: int | None = None):
+        """
+        Retorna o arquivo ZIP com todos os arquivos CSV da pasta de entrada.
+
+        Se nenhum CSV mudou desde a última compactação (e o nível de compressão é o mesmo),
+        o `compact.zip` existente é devolvido sem recompactar. Caso contrário, a reconstrução
+        é iniciada em segundo plano e a resposta não espera por ela: traz o último arquivo
+        válido, com o ID do job no cabeçalho `X-Zip-Job`, ou, se ainda não houver arquivo,
+        o próprio job com status 202.
+
+        Args:
+            compresslevel (int | None): Nível de compressão; por padrão, o do serviço.
 
-    def create_zip(self):
+        Returns:
+            FileResponse | JSONResponse: O arquivo ZIP, ou o job de reconstrução.
         """
-        Cria um arquivo ZIP contendo todos os arquivos CSV da pasta de entrada.
+        nivel = self.compresslevel if compresslevel is None else compresslevel
+        with self._lock:
+            job = None if self._is_current(nivel) else self._start_build(nivel)
 
-        O método faz o seguinte:
-        - Limpa a pasta de destino removendo arquivos antigos.
-        - Cria um arquivo ZIP chamado `compact.zip` contendo todos os arquivos CSV presentes na pasta de origem.
+        if not self.zip_path.exists():
+            return JSONResponse(status_code=202, content=job)
+        headers = {"X-Zip-Job": job["id"]} if job else None
+        return FileResponse(self.zip_path, media_type="application/zip", filename=ZIP_NAME, headers=headers)
+
+    def job(self, job_id: str) -> dict:
+        """
+        Retorna o estado de um job de reconstrução do ZIP.
+
+        Args:
+            job_id (str): O ID do job.
 
         Returns:
-            FileResponse: A resposta de arquivo ZIP gerado, para ser enviado ao usuário.
+            dict: `id`, `status` (`pending`, `running`, `done` ou `failed`), `compresslevel` e `erro`.
 
         Raises:
-            Exception: Se ocorrer um erro durante o processo de criação do arquivo ZIP.
+            HTTPException: Se o job não existir.
         """
-        # Limpar a pasta de destino para remover os antigos
-        for item in self.pasta_zip.iterdir():
-            if item.is_dir():
-                item.unlink()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job não encontrado")
+            return dict(job)
 
-        # Criar o arquivo ZIP com os arquivos CSV da pasta de origem
-        zip_file = self.pasta_zip / "compact.zip"
-        with zipfile.ZipFile(zip_file, "w") as file:
-            for arquivo in self.pasta_csv.glob("*.csv"):
-                file.write(arquivo, arcname=arquivo.name)
+    def download(self, if_none_match: str | None = None):
+        """
+        Retorna o `compact.zip` atual, sem verificar os CSVs nem iniciar uma reconstrução.
+
+        Feito para réplicas que consultam o arquivo periodicamente: o SHA-256 do ZIP é enviado
+        como ETag forte, e um `If-None-Match` com o ETag atual recebe 304, sem corpo. Pedidos
+        com `Range` (e `If-Range`) recebem só o trecho pedido, para retomar downloads.
+
+        O corpo vem da cópia imutável `compact-<sha256>.zip`, e não do `compact.zip`, que uma
+        reconstrução pode substituir entre o cálculo do ETag e a abertura do arquivo para envio.
+        Um ZIP sem essa cópia (por exemplo, gerado por outra ferramenta) é copiado uma vez, e o
+        ETag passa a ser o hash dos bytes copiados.
+
+        Args:
+            if_none_match (str | None): O cabeçalho `If-None-Match` do pedido.
+
+        Returns:
+            FileResponse | Response: O arquivo ZIP, ou 304 se o cliente já tem a versão atual.
 
+        Raises:
+            HTTPException: Se o arquivo ZIP não existir.
+        """
+        _, hash_zip = self._zip_sha256()
+        if etag_matches(if_none_match, f'"{hash_zip}"'):
+            return not_modified(f'"{hash_zip}"')
+        versao = self._version_path(hash_zip)
+        try:
+            stat = versao.stat()
+        except FileNotFoundError:
+            versao, hash_zip = self._store_version()
+            stat = versao.stat()
+        etag = f'"{hash_zip}"'
         return FileResponse(
-            zip_file, media_type="application/zip", filename=zip_file.name
+            versao,
+            media_type="application/zip",
+            filename=ZIP_NAME,
+            headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+            stat_result=stat,
         )
 
     def create_hash(self):
         """
-        Gera um hash SHA256 para o arquivo ZIP gerado.
+        Retorna o hash SHA256 do arquivo ZIP gerado.
 
-        O método calcula o hash SHA256 do arquivo `compact.zip` na pasta de destino.
+        O hash é calculado durante a compactação e lido do manifesto, sem reler o arquivo. Só
+        um `compact.zip` que não corresponda ao manifesto (por exemplo, gerado por outra
+        ferramenta) tem o hash calculado aqui, uma vez por versão do arquivo.
 
         Returns:
             dict: Um dicionário contendo o nome do arquivo e o valor do hash SHA256.
@@ -66,14 +177,374 @@ class DataService:
         Raises:
             HTTPException: Se o arquivo ZIP ou o diretório não existirem.
         """
-        file_name = self.pasta_zip / "compact.zip"
+        return {"arquivo": self.zip_path.name, "hash": self._zip_sha256()[1]}
+
+    def manifest(self) -> dict:
+        """
+        Retorna o manifesto do `compact.zip`.
+
+        Com os hashes por CSV, quem já tem uma cópia dos dados pode comparar o manifesto com
+        o anterior e verificar ou baixar só as tabelas que mudaram.
+
+        Returns:
+            dict: `compresslevel`, `zip` (`sha256`, `size` e `mtime_ns` do ZIP) e `arquivos`
+                (`sha256`, `size`, `mtime_ns` e `linhas` de cada CSV).
+
+        Raises:
+            HTTPException: Se o manifesto não existir.
+        """
+        with self._lock:
+            manifesto = self._read_manifest()
+        if manifesto is None:
+            raise HTTPException(status_code=404, detail="Manifesto não encontrado")
+        return manifesto
+
+    def _zip_sha256(self) -> Tuple[os.stat_result, str]:
+        """
+        Retorna o `stat` e o SHA-256 do `compact.zip` atual.
+
+        O hash vem do manifesto quando o ZIP é o registrado nele; caso contrário, é calculado
+        e guardado em memória para aquela versão (mtime e tamanho) do arquivo.
+
+        Raises:
+            HTTPException: Se o arquivo ZIP não existir.
+        """
+        with self._lock:
+            try:
+                stat = self.zip_path.stat()
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+            assinatura = (stat.st_mtime_ns, stat.st_size)
+
+            manifesto = self._read_manifest()
+            registro = manifesto.get("zip") if manifesto else None
+            if registro and (registro["mtime_ns"], registro["size"]) == assinatura:
+                return stat, registro["sha256"]
+            if self._zip_hash is not None and self._zip_hash[0] == assinatura:
+                return stat, self._zip_hash[1]
 
-        if not file_name.exists() or not self.pasta_zip.exists():
+        hash_zip = _file_sha256(self.zip_path)
+        with self._lock:
+            self._zip_hash = (assinatura, hash_zip)
+        return stat, hash_zip
+
+    def _version_path(self, hash_zip: str) -> Path:
+        return self.pasta_zip / VERSION_NAME.format(sha256=hash_zip)
+
+    def _store_version(self) -> Tuple[Path, str]:
+        """
+        Copia o `compact.zip` atual para a sua cópia imutável, calculando o hash dos bytes copiados.
+
+        O arquivo é aberto uma única vez, então a cópia é consistente mesmo que o ZIP seja
+        substituído durante a leitura.
+
+        Returns:
+            Tuple[Path, str]: O caminho da cópia e o SHA-256 do seu conteúdo.
+
+        Raises:
+            HTTPException: Se o arquivo ZIP não existir.
+        """
+        try:
+            origem = self.zip_path.open("rb")
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+        fd, tmp_path = tempfile.mkstemp(dir=self.pasta_zip, suffix=".tmp")
+        try:
+            with origem, os.fdopen(fd, mode="wb") as destino:
+                escritor = _HashingWriter(destino)
+                for pedaco in iter(lambda: origem.read(BLOCO_LEITURA), b""):
+                    escritor.write(pedaco)
+                destino.flush()
+                os.fsync(destino.fileno())
+            versao = self._version_path(escritor.hexdigest())
+            os.replace(tmp_path, versao)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune_versions(versao)
+        return versao, escritor.hexdigest()
+
+    def _link_version(self, caminho: str, hash_zip: str):
+        """
+        Cria a cópia imutável de um ZIP recém-gravado, como hard link ou, se o sistema de
+        arquivos não permitir, como cópia.
+        """
+        versao = self._version_path(hash_zip)
+        try:
+            os.link(caminho, versao)
+            return
+        except FileExistsError:
+            return  # Mesmo hash, mesmo conteúdo
+        except OSError:
+            pass
+        fd, tmp_path = tempfile.mkstemp(dir=self.pasta_zip, suffix=".tmp")
+        try:
+            with open(caminho, "rb") as origem, os.fdopen(fd, mode="wb") as destino:
+                for pedaco in iter(lambda: origem.read(BLOCO_LEITURA), b""):
+                    destino.write(pedaco)
+                destino.flush()
+                os.fsync(destino.fileno())
+            os.replace(tmp_path, versao)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _prune_versions(self, atual: Path):
+        """
+        Remove as cópias imutáveis mais antigas, mantendo `atual` e as mais recentes até
+        `MAX_VERSIONS`. As anteriores à atual continuam disponíveis para downloads em andamento.
+        """
+        versoes = []
+        for versao in self.pasta_zip.glob(VERSION_NAME.format(sha256="*")):
+            try:
+                versoes.append((versao.stat().st_mtime_ns, versao))
+            except FileNotFoundError:
+                continue
+        antigas = [versao for _, versao in sorted(versoes, reverse=True) if versao != atual]
+        for versao in antigas[MAX_VERSIONS - 1:]:
+            try:
+                versao.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _csv_files(self) -> List[Path]:
+        return sorted(self.pasta_csv.glob("*.csv"))
+
+    def _is_current(self, nivel: int) -> bool:
+        """
+        Verifica se o `compact.zip` corresponde aos CSVs atuais e ao nível de compressão.
+
+        O próprio ZIP precisa ser o registrado no manifesto. A comparação dos CSVs usa mtime e
+        tamanho; só um CSV com mtime diferente e mesmo tamanho tem o
+        SHA-256 recalculado (por exemplo, regravado com o mesmo conteúdo). Nesse caso o novo
+        mtime é registrado no manifesto, para não recalcular o hash na próxima vez.
+        Deve ser chamado com `_lock` adquirida.
+        """
+        manifesto = self._read_manifest()
+        if manifesto is None or manifesto["compresslevel"] != nivel or "zip" not in manifesto:
+            return False
+        try:
+            stat = self.zip_path.stat()
+        except FileNotFoundError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != (manifesto["zip"]["mtime_ns"], manifesto["zip"]["size"]):
+            return False  # O ZIP foi substituído por fora do serviço
+        registros = manifesto["arquivos"]
+        arquivos = self._csv_files()
+        if sorted(registros) != [arquivo.name for arquivo in arquivos]:
+            return False
+
+        alterado = False
+        for arquivo in arquivos:
+            registro = registros[arquivo.name]
+            stat = arquivo.stat()
+            if stat.st_mtime_ns == registro["mtime_ns"] and stat.st_size == registro["size"]:
+                continue
+            if stat.st_size != registro["size"] or _file_sha256(arquivo) != registro["sha256"]:
+                return False
+            registro["mtime_ns"] = stat.st_mtime_ns
+            alterado = True
+        if alterado:
+            self._write_manifest(manifesto)
+        return True
+
+    def _start_build(self, nivel: int) -> dict:
+        """
+        Inicia a reconstrução do ZIP em segundo plano, ou retorna a que já está em andamento.
+
+        Só uma reconstrução roda por vez; uma chamada com outro nível de compressão recebe o
+        job em andamento, e a próxima chamada depois dele inicia a reconstrução com o novo nível.
+        Deve ser chamado com `_lock` adquirida.
+        """
+        if self._building is not None:
+            return dict(self._building)
+
+        job = {"id": uuid.uuid4().hex, "status": "pending", "compresslevel": nivel, "erro": None}
+        concluidos = [job_id for job_id, antigo in self._jobs.items() if antigo["status"] in ("done", "failed")]
+        for job_id in concluidos[:max(0, len(self._jobs) + 1 - MAX_JOBS)]:
+            del self._jobs[job_id]
+        self._jobs[job["id"]] = job
+        self._building = job
+        threading.Thread(target=self._build, args=(job,), daemon=True).start()
+        return dict(job)
+
+    def _build(self, job: dict):
+        """
+        Executa um job de reconstrução do ZIP, registrando o resultado no job.
+        """
+        with self._lock:
+            job["status"] = "running"
+        try:
+            self._write_zip(job["compresslevel"])
+        except Exception as erro:
+            logger.exception("Falha ao gerar %s", self.zip_path)
+            status, mensagem = "failed", str(erro)
+        else:
+            status, mensagem = "done", None
+        with self._lock:
+            job["status"], job["erro"] = status, mensagem
+            self._building = None
+
+    def _write_zip(self, nivel: int):
+        """
+        Compacta os CSVs em um arquivo temporário e o coloca no lugar do `compact.zip`.
+
+        Cada CSV é lido uma única vez, em pedaços: os mesmos bytes são compactados, entram no
+        SHA-256 e têm os registros contados para o manifesto. O ZIP é gravado através de um
+        `_HashingWriter`, que calcula o SHA-256 do arquivo à medida que os bytes são escritos.
+        O mtime e o tamanho dos CSVs são lidos antes da leitura, então uma escrita concorrente
+        apenas provoca uma nova reconstrução na próxima chamada.
+
+        Args:
+            nivel (int): Nível de compressão (0 = sem compressão, 1 a 9 = deflate).
+        """
+        self.pasta_zip.mkdir(parents=True, exist_ok=True)
+        compressao = zipfile.ZIP_DEFLATED if nivel else zipfile.ZIP_STORED
+        registros = {}
+        fd, tmp_path = tempfile.mkstemp(dir=self.pasta_zip, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="wb") as destino:
+                escritor = _HashingWriter(destino)
+                with zipfile.ZipFile(escritor, "w", compression=compressao, compresslevel=nivel or None) as zip_file:
+                    for arquivo in self._csv_files():
+                        stat = arquivo.stat()
+                        hash_csv = sha256()
+                        contador = _RecordCounter()
+                        zip64 = stat.st_size * 1.05 > zipfile.ZIP64_LIMIT
+                        with arquivo.open("rb") as origem, zip_file.open(arquivo.name, "w", force_zip64=zip64) as saida:
+                            for pedaco in iter(lambda: origem.read(BLOCO_LEITURA), b""):
+                                hash_csv.update(pedaco)
+                                contador.update(pedaco)
+                                saida.write(pedaco)
+                        registros[arquivo.name] = {
+                            "mtime_ns": stat.st_mtime_ns,
+                            "size": stat.st_size,
+                            "sha256": hash_csv.hexdigest(),
+                            "linhas": contador.linhas,
+                        }
+                destino.flush()
+                os.fsync(destino.fileno())
+            self._link_version(tmp_path, escritor.hexdigest())
+            with self._lock:
+                os.replace(tmp_path, self.zip_path)
+                stat = self.zip_path.stat()
+                self._write_manifest(
+                    {
+                        "compresslevel": nivel,
+                        "zip": {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": escritor.hexdigest()},
+                        "arquivos": registros,
+                    }
+                )
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune_versions(self._version_path(escritor.hexdigest()))
+
+    def _read_manifest(self) -> dict | None:
+        try:
+            with self.manifest_path.open("r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, manifesto: dict):
+        """
+        Grava o manifesto de forma atômica. Deve ser chamado com `_lock` adquirida.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.pasta_zip, suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="w") as file:
+                json.dump(manifesto, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _file_sha256(caminho: Path) -> str:
+    """
+    Calcula o SHA-256 de um arquivo, lendo-o em pedaços.
+    """
+    hash_arquivo = sha256()
+    with caminho.open("rb") as file:
+        for pedaco in iter(lambda: file.read(BLOCO_LEITURA), b""):
+            hash_arquivo.update(pedaco)
+    return hash_arquivo.hexdigest()
+
+
+class _HashingWriter(io.RawIOBase):
+    """
+    Destino de escrita que calcula o SHA-256 de tudo o que passa por ele.
+
+    Não permite `seek`: assim o `zipfile` grava cada entrada de forma sequencial (com os
+    tamanhos e o CRC em um descritor depois dos dados, em vez de voltar ao cabeçalho), e os
+    bytes entram no hash exatamente na ordem em que ficam no arquivo.
+    """
+
+    def __init__(self, destino):
+        self._destino = destino
+        self._hash = sha256()
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._hash.update(dados)
+        escritos = self._destino.write(dados)
+        self._posicao += escritos
+        return escritos
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self):
+        self._destino.flush()
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class _RecordCounter:
+    """
+    Conta os registros de um CSV lido em pedaços, sem contar a linha de cabeçalho.
+
+    Uma quebra de linha dentro de um campo entre aspas não termina o registro: o estado
+    (dentro ou fora de aspas) é carregado de um pedaço para o outro.
+    """
+
+    def __init__(self):
+        self._quebras = 0
+        self._entre_aspas = False
+        self._ultimo = b"\n"
 
-        hash_fuc = sha256()
-        with file_name.open("rb") as file:
-            for pedaco in iter(lambda: file.read(4096), b""):
-                hash_fuc.update(pedaco)
+    @property
+    def linhas(self) -> int:
+        registros = self._quebras + (self._ultimo != b"\n")
+        return max(registros - 1, 0)
 
-        return {"arquivo": file_name.name, "hash": hash_fuc.hexdigest()}
+    def update(self, pedaco: bytes):
+        if not pedaco:
+            return
+        self._ultimo = pedaco[-1:]
+        if not self._entre_aspas and b'"' not in pedaco:
+            self._quebras += pedaco.count(b"\n")
+        elif np is not None:
+            buffer = np.frombuffer(pedaco, dtype=np.uint8)
+            aspas = np.flatnonzero(buffer == ord('"'))
+            quebras = np.flatnonzero(buffer == ord("\n"))
+            # Uma quebra está fora de aspas se o total de aspas antes dela (somado ao estado
+            # herdado do pedaço anterior) é par.
+            antes = np.searchsorted(aspas, quebras) + self._entre_aspas
+            self._quebras += int(np.count_nonzero(antes % 2 == 0))
+            self._entre_aspas = bool((len(aspas) + self._entre_aspas) % 2)
+        else:
+            # Os trechos alternam entre fora e dentro de aspas.
+            trechos = pedaco.split(b'"')
+            inicio = 1 if self._entre_aspas else 0
+            self._quebras += sum(trecho.count(b"\n") for trecho in trechos[inicio::2])
+            self._entre_aspas = (len(trechos) - 1 + self._entre_aspas) % 2 == 1
@@ -0,0 +1,75 @@
+import csv
+import io
+from typing import AsyncIterable, AsyncIterator, Callable, List
+
+from pydantic import BaseModel
+
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+async def ndjson_lines(pages: AsyncIterable[List[BaseModel]]) -> AsyncIterator[str]:
+    """
+    Serializa páginas de registros como NDJSON, um objeto JSON por linha.
+
+    Args:
+        pages (AsyncIterable[List[BaseModel]]): Páginas de registros, geradas sob demanda.
+
+    Yields:
+        str: O conteúdo NDJSON de cada página.
+    """
+    async for page in pages:
+        yield "".join(f"{item.model_dump_json()}\n" for item in page)
+
+
+async def csv_lines(
+    pages: AsyncIterable[List[BaseModel]], fieldnames: List[str], to_row: Callable[[BaseModel], dict]
+) -> AsyncIterator[str]:
+    """
+    Serializa páginas de registros como CSV, começando pelo cabeçalho.
+
+    Args:
+        pages (AsyncIterable[List[BaseModel]]): Páginas de registros, geradas sob demanda.
+        fieldnames (List[str]): Colunas do CSV.
+        to_row (Callable[[BaseModel], dict]): Converte um registro em uma linha do CSV.
+
+    Yields:
+        str: O cabeçalho e, em seguida, o conteúdo CSV de cada página.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    yield buffer.getvalue()
+    async for page in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(to_row(item) for item in page)
+        yield buffer.getvalue()
+
+
+def export_lines(
+    pages: AsyncIterable[List[BaseModel]],
+    formato: str,
+    fieldnames: List[str],
+    to_row: Callable[[BaseModel], dict] = BaseModel.model_dump,
+) -> AsyncIterator[str]:
+    """
+    Escolhe a serialização de exportação pelo formato pedido.
+
+    Args:
+        pages (AsyncIterable[List[BaseModel]]): Páginas de registros, geradas sob demanda.
+        formato (str): `ndjson` ou `csv`.
+        fieldnames (List[str]): Colunas usadas no formato CSV.
+        to_row (Callable[[BaseModel], dict]): Converte um registro em uma linha do CSV.
+
+    Returns:
+        AsyncIterator[str]: Os pedaços do conteúdo exportado.
+
+    Raises:
+        ValueError: Se o formato não for suportado.
+    """
+    if formato == "ndjson":
+        return ndjson_lines(pages)
+    if formato == "csv":
+        return csv_lines(pages, fieldnames, to_row)
+    raise ValueError(f"Formato de exportação inválido: {formato}")
+
@@ -0,0 +1,318 @@
+import threading
+from itertools import chain
+from typing import Callable, Dict, List, Set
+
+from repositories import AsyncRepository, ChangeFeedTruncatedError
+
+
+# Acima desta quantidade de alterações pendentes no feed, recarregar as tabelas sai mais barato
+# que aplicá-las uma a uma
+LIMITE_SINCRONIZACAO = 10_000
+
+SANDAL_COLUMNS = ["id", "codigo", "nome", "quantidade", "valor", "cor", "tamanho"]
+
+
+class ReportService:
+    """
+    Serviço de relatórios de vendas, calculados com pandas sobre tabelas em colunas.
+
+    As vendas são carregadas uma única vez em duas tabelas: `vendas` (uma linha por venda)
+    e `itens` (uma linha por unidade vendida, com a lista de produtos já expandida). Cada
+    relatório é uma agregação vetorizada sobre essas tabelas. A carga usa `sale_refs`, que
+    entrega os campos das vendas já convertidos, sem decodificar as linhas persistidas.
+
+    Os resultados ficam em cache até a próxima escrita em vendas, sandálias ou clientes. Com um
+    feed de alterações, as tabelas são atualizadas apenas nos registros alterados desde a última
+    consulta: as vendas alteradas são relidas pelo ID e substituídas, e a receita dos itens só
+    é redistribuída por inteiro se o preço de alguma sandália mudou (a baixa de estoque de uma
+    venda, por exemplo, não muda). Se as alterações pendentes são muitas ou já saíram do feed,
+    as tabelas são recarregadas, como quando não há feed e a `version` de algum repositório muda.
+
+    Attributes:
+        sale_repository (AsyncRepository): Repositório de vendas.
+        sandal_repository (AsyncRepository): Repositório de sandálias.
+        client_repository (AsyncRepository): Repositório de clientes.
+        change_feed (ChangeFeed | SqliteChangeFeed | None): Feed de alterações dos repositórios.
+    """
+
+    def __init__(
+        self,
+        sale_repository: AsyncRepository,
+        sandal_repository: AsyncRepository,
+        client_repository: AsyncRepository,
+        change_feed=None,
+    ):
+        """
+        Args:
+            sale_repository (AsyncRepository): Repositório de vendas.
+            sandal_repository (AsyncRepository): Repositório de sandálias.
+            client_repository (AsyncRepository): Repositório de clientes.
+            change_feed (ChangeFeed | SqliteChangeFeed | None): Feed de alterações dos
+                repositórios, usado para atualizar as tabelas sem recarregá-las.
+        """
+        self.sale_repository = sale_repository
+        self.sandal_repository = sandal_repository
+        self.client_repository = client_repository
+        self.change_feed = change_feed
+        self._lock = threading.Lock()
+        self._versions: tuple | None = None
+        self._tables: dict | None = None
+        self._results: Dict[tuple, List[dict]] = {}
+
+    async def top_sandals(self, limit: int = 10, order: str = "unidades") -> List[dict]:
+        """
+        Sandálias mais vendidas.
+
+        Args:
+            limit (int): Quantidade de sandálias retornadas.
+            order (str): `unidades` ou `receita`.
+
+        Returns:
+            List[dict]: `sandal_id`, `codigo`, `nome`, `unidades` e `receita` de cada sandália.
+        """
+        return await self._report(("top_sandals", limit, order), lambda t: self._top_sandals(t, limit, order))
+
+    async def revenue_by(self, campo: str) -> List[dict]:
+        """
+        Receita e unidades vendidas por um atributo das sandálias.
+
+        Args:
+            campo (str): `cor` ou `tamanho`.
+
+        Returns:
+            List[dict]: O valor do atributo, `unidades` e `receita`, da maior receita para a menor.
+        """
+        return await self._report(("revenue_by", campo), lambda t: self._revenue_by(t, campo))
+
+    async def average_ticket(self, limit: int | None = None) -> List[dict]:
+        """
+        Ticket médio (valor médio por venda) de cada cliente.
+
+        Args:
+            limit (int | None): Quantidade de clientes retornados.
+
+        Returns:
+            List[dict]: `client`, `nome`, `vendas`, `receita` e `ticket_medio`, do maior ticket para o menor.
+        """
+        return await self._report(("average_ticket", limit), lambda t: self._average_ticket(t, limit))
+
+    async def _report(self, key: tuple, calcular: Callable[[dict], List[dict]]) -> List[dict]:
+        """
+        Retorna o relatório do cache ou o calcula, no pool de threads do repositório de vendas.
+        """
+        return await self.sale_repository.run(self._cached, key, calcular)
+
+    def _cached(self, key: tuple, calcular: Callable[[dict], List[dict]]) -> List[dict]:
+        with self._lock:
+            if self._sync():
+                self._results = {}
+            if key not in self._results:
+                self._results[key] = calcular(self._tables)
+            return self._results[key]
+
+    def _sync(self) -> bool:
+        """
+        Atualiza as tabelas com as escritas feitas desde a última consulta. Deve ser chamado
+        com `_lock` adquirida.
+
+        As versões são lidas antes da leitura dos dados: uma escrita concorrente é apenas
+        aplicada de novo na próxima consulta.
+
+        Returns:
+            bool: `True` se as tabelas mudaram.
+        """
+        if self.change_feed is None:
+            versions = (
+                self.sale_repository.repository.version,
+                self.sandal_repository.repository.version,
+                self.client_repository.repository.version,
+            )
+        else:
+            versions = (self.change_feed.version,)
+        if self._tables is not None and versions == self._versions:
+            return False
+
+        if self._tables is None or self.change_feed is None:
+            self._tables = self._load_tables()
+        else:
+            versao, atual = self._versions[0], versions[0]
+            alterados: Dict[str, Set[int]] | None = None
+            if versao <= atual <= versao + LIMITE_SINCRONIZACAO:
+                alterados = {"sale": set(), "sandal": set(), "client": set()}
+                try:
+                    for _, tabela, _, record_id in self.change_feed.since(versao, atual):
+                        alterados[tabela].add(record_id)
+                except ChangeFeedTruncatedError:
+                    alterados = None
+            if alterados is None:
+                self._tables = self._load_tables()
+            else:
+                self._tables = self._apply_changes(self._tables, alterados)
+        self._versions = versions
+        return True
+
+    def _load_tables(self) -> dict:
+        """
+        Carrega vendas, sandálias e clientes em DataFrames.
+
+        Returns:
+            dict: DataFrames `vendas`, `itens`, `sandals` e `clients`.
+        """
+        import pandas as pd
+
+        vendas, itens = self._sale_frames(self.sale_repository.repository.sale_refs())
+        sandals = pd.DataFrame(
+            [sandal.model_dump() for sandal in self.sandal_repository.repository.list()],
+            columns=SANDAL_COLUMNS,
+        ).set_index("id")
+        itens["receita"] = self._allocate(itens, sandals)
+        clients = pd.DataFrame(
+            [(client.id, client.nome) for client in self.client_repository.repository.list()],
+            columns=["id", "nome"],
+        ).set_index("id")
+        return {"vendas": vendas, "itens": itens, "sandals": sandals, "clients": clients}
+
+    def _apply_changes(self, tables: dict, alterados: Dict[str, Set[int]]) -> dict:
+        """
+        Aplica às tabelas os registros alterados, relendo apenas esses registros.
+
+        As tabelas em cache não são modificadas: as alteradas são substituídas por novas.
+
+        Args:
+            tables (dict): As tabelas atuais.
+            alterados (Dict[str, Set[int]]): IDs alterados de cada tabela (`sale`, `sandal` e `client`).
+
+        Returns:
+            dict: As tabelas atualizadas.
+        """
+        import pandas as pd
+
+        tables = dict(tables)
+        if alterados["sandal"]:
+            ids = alterados["sandal"]
+            anteriores = tables["sandals"]
+            atuais = self.sandal_repository.repository.search_por_ids(ids)
+            novas = pd.DataFrame([sandal.model_dump() for sandal in atuais.values()], columns=SANDAL_COLUMNS)
+            sandals = pd.concat(
+                [anteriores[~anteriores.index.isin(ids)], novas.set_index("id")]
+            ).sort_index()
+            # Só o preço entra na distribuição da receita; a baixa de estoque não a muda.
+            precos = anteriores["valor"].reindex(list(ids))
+            if not precos.equals(sandals["valor"].reindex(list(ids))):
+                itens = tables["itens"].copy()
+                itens["receita"] = self._allocate(itens, sandals)
+                tables["itens"] = itens
+            tables["sandals"] = sandals
+
+        if alterados["sale"]:
+            ids = alterados["sale"]
+            vendas, itens = self._sale_frames(self.sale_repository.repository.sale_refs(ids))
+            itens["receita"] = self._allocate(itens, tables["sandals"])
+            anteriores = tables["vendas"]
+            tables["vendas"] = pd.concat(
+                [anteriores[~anteriores["sale_id"].isin(ids)], vendas], ignore_index=True
+            )
+            anteriores = tables["itens"]
+            tables["itens"] = pd.concat([anteriores[~anteriores["sale_id"].isin(ids)], itens], ignore_index=True)
+
+        if alterados["client"]:
+            ids = alterados["client"]
+            anteriores = tables["clients"]
+            atuais = self.client_repository.repository.search_por_ids(ids)
+            novos = pd.DataFrame([(client.id, client.nome) for client in atuais.values()], columns=["id", "nome"])
+            tables["clients"] = pd.concat(
+                [anteriores[~anteriores.index.isin(ids)], novos.set_index("id")]
+            ).sort_index()
+        return tables
+
+    @staticmethod
+    def _sale_frames(refs: list) -> tuple:
+        """
+        Monta as tabelas `vendas` e `itens` (ainda sem a receita) a partir de `sale_refs`.
+
+        As listas de produtos são expandidas de uma vez: cada ID de sandália recebe a posição
+        da sua venda em `vendas`.
+
+        Returns:
+            tuple: Os DataFrames `vendas` e `itens`.
+        """
+        import numpy as np
+        import pandas as pd
+
+        vendas = pd.DataFrame(
+            {
+                "sale_id": np.fromiter((ref[0] for ref in refs), dtype=np.int64, count=len(refs)),
+                "client": np.fromiter((ref[1] for ref in refs), dtype=np.int64, count=len(refs)),
+                "valor_total": np.fromiter((ref[2] for ref in refs), dtype=np.float64, count=len(refs)),
+            }
+        )
+        quantidades = np.fromiter((len(ref[3]) for ref in refs), dtype=np.int64, count=len(refs))
+        sandal_ids = np.fromiter(
+            chain.from_iterable(ref[3] for ref in refs), dtype=np.int64, count=int(quantidades.sum())
+        )
+        posicoes = np.repeat(np.arange(len(refs)), quantidades)
+        itens = pd.DataFrame(
+            {
+                "sale_id": vendas["sale_id"].to_numpy()[posicoes],
+                "sandal_id": sandal_ids,
+                "total": vendas["valor_total"].to_numpy()[posicoes],
+            }
+        )
+        return vendas, itens
+
+    @staticmethod
+    def _allocate(itens, sandals):
+        """
+        Distribui a receita de cada venda entre os seus itens na proporção do preço atual de
+        cada sandália (ou igualmente, se os preços somarem zero), de modo que a soma por
+        sandália, cor ou tamanho fecha com o total vendido.
+
+        Returns:
+            pandas.Series: A receita de cada item.
+        """
+        preco = itens["sandal_id"].map(sandals["valor"]).fillna(0.0)
+        por_venda = preco.groupby(itens["sale_id"])
+        soma = por_venda.transform("sum")
+        quantidade = por_venda.transform("size")
+        return (itens["total"] * preco / soma).where(soma > 0, itens["total"] / quantidade)
+
+    @staticmethod
+    def _top_sandals(tables: dict, limit: int, order: str) -> List[dict]:
+        itens, sandals = tables["itens"], tables["sandals"]
+        frame = itens.groupby("sandal_id").agg(unidades=("sandal_id", "size"), receita=("receita", "sum"))
+        frame = frame.sort_values([order, "unidades" if order == "receita" else "receita"], ascending=False)
+        frame = frame.head(limit)
+        frame["codigo"] = sandals["codigo"].reindex(frame.index).to_numpy()
+        frame["nome"] = sandals["nome"].reindex(frame.index).to_numpy()
+        frame["receita"] = frame["receita"].round(2)
+        frame = frame.reset_index()[["sandal_id", "codigo", "nome", "unidades", "receita"]]
+        return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+    @staticmethod
+    def _revenue_by(tables: dict, campo: str) -> List[dict]:
+        itens, sandals = tables["itens"], tables["sandals"]
+        # Agrega primeiro por sandália (chave inteira) e só depois pelo atributo, em poucas linhas.
+        por_sandal = itens.groupby("sandal_id").agg(unidades=("sandal_id", "size"), receita=("receita", "sum"))
+        frame = por_sandal.groupby(sandals[campo].reindex(por_sandal.index)).sum()
+        frame = frame.sort_values("receita", ascending=False)
+        frame["receita"] = frame["receita"].round(2)
+        # Itens de sandálias excluídas ficam de fora; sem eles, a chave volta ao tipo original.
+        frame.index = frame.index.astype(sandals[campo].dtype)
+        frame.index.name = campo
+        return frame.reset_index().to_dict("records")
+
+    @staticmethod
+    def _average_ticket(tables: dict, limit: int | None) -> List[dict]:
+        vendas, clients = tables["vendas"], tables["clients"]
+        frame = vendas.groupby("client").agg(
+            vendas=("sale_id", "size"),
+            receita=("valor_total", "sum"),
+            ticket_medio=("valor_total", "mean"),
+        )
+        frame = frame.sort_values("ticket_medio", ascending=False)
+        if limit is not None:
+            frame = frame.head(limit)
+        frame["nome"] = clients["nome"].reindex(frame.index).to_numpy()
+        frame[["receita", "ticket_medio"]] = frame[["receita", "ticket_medio"]].round(2)
+        frame = frame.reset_index()[["client", "nome", "vendas", "receita", "ticket_medio"]]
+        return frame.astype(object).where(frame.notna(), None).to_dict("records")
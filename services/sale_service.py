@@ -1,5 +1,13 @@
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
 from models import Sale
-from repositories import SaleRepository
+from repositories import AsyncRepository, InsufficientStockError
+from services.export import export_lines
+
+
+EXPORT_FIELDNAMES = ["id", "client", "client_nome", "valor_total", "produtos"]
 
 
 class SaleService:
@@ -8,19 +16,19 @@ class SaleService:
     listagem, atualização e exclusão de vendas.
 
     Attributes:
-        repository (SaleRepository): O repositório responsável pela persistência de dados das vendas.
+        repository (AsyncRepository): O repositório responsável pela persistência de dados das vendas.
     """
 
-    def __init__(self, repository: SaleRepository):
+    def __init__(self, repository: AsyncRepository):
         """
         Args:
-            repository (SaleRepository): O repositório onde as vendas são armazenadas.
+            repository (AsyncRepository): O repositório onde as vendas são armazenadas.
         """
         self.repository = repository
 
-    def create(self, sale: Sale) -> Sale:
+    async def create(self, sale: Sale) -> Sale:
         """
-        Cria uma nova venda no repositório.
+        Cria uma nova venda no repositório, dando baixa no estoque dos produtos.
 
         Args:
             sale (Sale): A venda a ser criada.
@@ -28,33 +36,203 @@ class SaleService:
         Returns:
             Sale: A venda criada, incluindo seu ID atribuído.
 
+        Raises:
+            HTTPException: 409 se algum produto não tiver estoque suficiente, ou 422 se o
+                cliente ou algum produto não existir.
+        """
+        try:
+            return await self.repository.create_sale(sale)
+        except InsufficientStockError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    async def create_many(self, sales: list[Sale]) -> list[dict]:
+        """
+        Cria várias vendas de uma vez, dando baixa no estoque de cada uma.
+
+        Args:
+            sales (list[Sale]): Vendas a serem criadas.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID criado ou o motivo da falha
+                (`conflict` quando falta estoque).
         """
-        return self.repository.create(sale)
+        return await self.repository.create_many(sales)
 
-    def search_sale(self, sale_id: int) -> Sale | None:
+    async def upsert_many(self, sales: list[Sale]) -> list[dict]:
+        """
+        Atualiza as vendas existentes e cria as demais, de uma vez, movimentando o estoque.
+
+        Args:
+            sales (list[Sale]): Vendas a serem gravadas.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha
+                (`conflict` quando falta estoque).
+        """
+        return await self.repository.upsert_many(sales)
+
+    async def search_sale(self, sale_id: int, live: bool = False) -> Sale | None:
         """
         Busca uma venda pelo seu ID.
 
         Args:
             sale_id (int): O ID da venda a ser buscada.
+            live (bool): Se `True`, usa os dados atuais de cliente e produtos em vez do snapshot.
 
         Returns:
             Sale | None: A venda correspondente ao ID fornecido, ou None se não encontrada.
         """
-        return self.repository.search_por_id(sale_id)
+        return await self.repository.search_por_id(sale_id, live)
+
+    async def list_by_client(
+        self, client_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> list[Sale]:
+        """
+        Lista as vendas de um cliente, com paginação por cursor.
+
+        Args:
+            client_id (int): O ID do cliente.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, usa os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            list[Sale]: As vendas do cliente, em ordem de ID.
+        """
+        return await self.repository.list_by_client(client_id, limit=limit, cursor=cursor, live=live)
+
+    async def list_by_sandal(
+        self, sandal_id: int, limit: int | None = None, cursor: int | None = None, live: bool = False
+    ) -> list[Sale]:
+        """
+        Lista as vendas que contêm uma sandália, com paginação por cursor.
+
+        Args:
+            sandal_id (int): O ID da sandália.
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            live (bool): Se `True`, usa os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            list[Sale]: As vendas que contêm a sandália, em ordem de ID.
+        """
+        return await self.repository.list_by_sandal(sandal_id, limit=limit, cursor=cursor, live=live)
+
+    async def totals(self) -> dict:
+        """
+        Quantidade de vendas e receita total, mantidas pelo repositório a cada escrita.
 
-    def list(self) -> list[Sale]:
+        Returns:
+            dict: `vendas` e `receita`.
+        """
+        return await self.repository.totals()
+
+    async def units_by_sandal(self, sandal_id: int | None = None) -> list[dict]:
+        """
+        Unidades vendidas por sandália, mantidas pelo repositório a cada escrita.
+
+        Args:
+            sandal_id (int | None): Retorna apenas esta sandália.
+
+        Returns:
+            list[dict]: `sandal_id` e `unidades` de cada sandália com vendas.
+        """
+        unidades = await self.repository.units_by_sandal(sandal_id)
+        return [{"sandal_id": sandal, "unidades": total} for sandal, total in unidades.items()]
+
+    async def totals_by_client(self, client_id: int | None = None) -> list[dict]:
         """
-        Lista todas as vendas.
+        Quantidade de vendas e receita por cliente, mantidas pelo repositório a cada escrita.
+
+        Args:
+            client_id (int | None): Retorna apenas este cliente.
 
         Returns:
-            list[Sale]: Uma lista de todas as vendas no repositório.
+            list[dict]: `client`, `vendas` e `receita` de cada cliente com vendas.
+        """
+        totais = await self.repository.totals_by_client(client_id)
+        return [{"client": client, **total} for client, total in totais.items()]
+
+    async def cache_stats(self) -> dict:
         """
-        return self.repository.list()
+        Estado e contadores do cache de vendas buscadas pelo ID.
+
+        Returns:
+            dict: Tamanho, limites e contadores de acertos, faltas e descartes (ver `SaleCache.stats`).
+
+        Raises:
+            HTTPException: 404 se o cache estiver desativado.
+        """
+        cache = self.repository.repository.cache
+        if cache is None:
+            raise HTTPException(status_code=404, detail="Cache de vendas desativado")
+        return cache.stats()
+
+    async def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        client: int | None = None,
+        valor_min: float | None = None,
+        valor_max: float | None = None,
+        live: bool = False,
+    ) -> list[Sale]:
+        """
+        Lista as vendas, com paginação por cursor e filtros opcionais.
+
+        Args:
+            limit (int | None): Quantidade máxima de vendas retornadas.
+            cursor (int | None): Retorna apenas vendas com ID maior que este.
+            client (int | None): Filtra pelo ID do cliente.
+            valor_min (float | None): Valor total mínimo.
+            valor_max (float | None): Valor total máximo.
+            live (bool): Se `True`, usa os dados atuais de cliente e produtos em vez do snapshot.
+
+        Returns:
+            list[Sale]: Uma lista das vendas encontradas.
+        """
+        return await self.repository.list(
+            limit=limit,
+            cursor=cursor,
+            client=client,
+            valor_min=valor_min,
+            valor_max=valor_max,
+            live=live,
+        )
+
+    def export(self, formato: str, chunk_size: int = 1000) -> AsyncIterator[str]:
+        """
+        Exporta todas as vendas em NDJSON ou CSV, página a página.
+
+        Clientes e produtos são resolvidos em lote a cada página. No CSV, cada venda vira
+        uma linha com o ID e o nome do cliente e os IDs dos produtos separados por vírgula.
+
+        Args:
+            formato (str): `ndjson` ou `csv`.
+            chunk_size (int): Quantidade de vendas lidas por página.
+
+        Returns:
+            AsyncIterator[str]: Os pedaços do conteúdo exportado, gerados sob demanda.
+        """
+        pages = self.repository.iter_pages(chunk_size)
+        return export_lines(pages, formato, EXPORT_FIELDNAMES, self._export_row)
+
+    @staticmethod
+    def _export_row(sale: Sale) -> dict:
+        return {
+            "id": sale.id,
+            "client": sale.client.id,
+            "client_nome": sale.client.nome,
+            "valor_total": sale.valor_total,
+            "produtos": ",".join(str(produto.id) for produto in sale.produtos),
+        }
 
-    def update(self, sale_id: int, sale: Sale) -> Sale:
+    async def update(self, sale_id: int, sale: Sale) -> Sale:
         """
-        Atualiza os dados de uma venda existente.
+        Atualiza os dados de uma venda existente, aplicando ao estoque a diferença entre os
+        produtos antigos e os novos.
 
         Args:
             sale_id (int): O ID da venda a ser atualizada.
@@ -64,13 +242,19 @@ class SaleService:
             Sale: A venda atualizada.
 
         Raises:
-            ValueError: Se a venda não for encontrada.
+            HTTPException: 409 se algum produto não tiver estoque suficiente, ou 422 se a venda,
+                o cliente ou algum produto não existir.
         """
-        return self.repository.update(sale)
+        try:
+            return await self.repository.update(sale)
+        except InsufficientStockError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
 
-    def delete(self, sale_id: int) -> bool:
+    async def delete(self, sale_id: int) -> bool:
         """
-        Exclui uma venda pelo seu ID.
+        Exclui uma venda pelo seu ID, devolvendo as suas unidades ao estoque.
 
         Args:
             sale_id (int): O ID da venda a ser excluída.
@@ -78,13 +262,13 @@ class SaleService:
         Returns:
             bool: True se a venda foi excluída com sucesso, False caso contrário.
         """
-        return self.repository.delete(sale_id)
+        return await self.repository.delete(sale_id)
 
-    def count(self):
+    async def count(self):
         """
         Conta o número total de vendas no repositório.
 
         Returns:
             int: O número total de vendas.
         """
-        return self.repository.count()
+        return await self.repository.count()
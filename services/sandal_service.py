@@ -1,5 +1,8 @@
+from typing import AsyncIterator
+
 from models import Sandal
-from repositories import SandalRepository
+from repositories import AsyncRepository
+from services.export import export_lines
 
 
 class SandalService:
@@ -8,19 +11,19 @@ class SandalService:
     listagem, atualização e exclusão de sandálias.
 
     Attributes:
-        repository (SandalRepository): O repositório responsável pela persistência de dados das sandálias.
+        repository (AsyncRepository): O repositório responsável pela persistência de dados das sandálias.
     """
 
-    def __init__(self, repository: SandalRepository):
+    def __init__(self, repository: AsyncRepository):
         """
         Inicializa o serviço de sandálias com o repositório de sandálias.
 
         Args:
-            repository (SandalRepository): O repositório onde as sandálias são armazenadas.
+            repository (AsyncRepository): O repositório onde as sandálias são armazenadas.
         """
         self.repository = repository
 
-    def create(self, sandal: Sandal) -> Sandal:
+    async def create(self, sandal: Sandal) -> Sandal:
         """
         Cria uma nova sandália no repositório.
 
@@ -30,9 +33,33 @@ class SandalService:
         Returns:
             Sandal: A sandália criada, incluindo seu ID atribuído.
         """
-        return self.repository.create(sandal)
+        return await self.repository.create(sandal)
+
+    async def create_many(self, sandals: list[Sandal]) -> list[dict]:
+        """
+        Cria várias sandálias de uma vez.
+
+        Args:
+            sandals (list[Sandal]): Sandálias a serem criadas.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID criado ou o motivo da falha.
+        """
+        return await self.repository.create_many(sandals)
+
+    async def upsert_many(self, sandals: list[Sandal]) -> list[dict]:
+        """
+        Atualiza as sandálias existentes e cria as demais, de uma vez.
+
+        Args:
+            sandals (list[Sandal]): Sandálias a serem gravadas.
+
+        Returns:
+            list[dict]: Resultado de cada item, indicando o ID gravado ou o motivo da falha.
+        """
+        return await self.repository.upsert_many(sandals)
 
-    def search_sandal(self, sandal_id: int) -> Sandal | None:
+    async def search_sandal(self, sandal_id: int) -> Sandal | None:
         """
         Busca uma sandália pelo seu ID.
 
@@ -42,18 +69,53 @@ class SandalService:
         Returns:
             Sandal | None: A sandália correspondente ao ID fornecido, ou None se não encontrada.
         """
-        return self.repository.search_por_id(sandal_id)
+        return await self.repository.search_por_id(sandal_id)
+
+    async def list(
+        self,
+        limit: int | None = None,
+        cursor: int | None = None,
+        cor: str | None = None,
+        tamanho: int | None = None,
+    ) -> list[Sandal]:
+        """
+        Lista as sandálias, com paginação por cursor e filtros opcionais.
+
+        Args:
+            limit (int | None): Quantidade máxima de sandálias retornadas.
+            cursor (int | None): Retorna apenas sandálias com ID maior que este.
+            cor (str | None): Filtra pela cor.
+            tamanho (int | None): Filtra pelo tamanho.
+
+        Returns:
+            list[Sandal]: Uma lista das sandálias encontradas.
+        """
+        return await self.repository.list(limit=limit, cursor=cursor, cor=cor, tamanho=tamanho)
 
-    def list(self) -> list[Sandal]:
+    async def version(self) -> int:
         """
-        Lista todas as sandálias.
+        Versão dos dados de sandálias, que muda a cada escrita no repositório.
+
+        Returns:
+            int: A versão atual.
+        """
+        return await self.repository.run(lambda: self.repository.repository.version)
+
+    def export(self, formato: str, chunk_size: int = 1000) -> AsyncIterator[str]:
+        """
+        Exporta todas as sandálias em NDJSON ou CSV, página a página.
+
+        Args:
+            formato (str): `ndjson` ou `csv`.
+            chunk_size (int): Quantidade de registros lidos por página.
 
         Returns:
-            list[Sandal]: Uma lista de todas as sandálias no repositório.
+            AsyncIterator[str]: Os pedaços do conteúdo exportado, gerados sob demanda.
         """
-        return self.repository.list()
+        pages = self.repository.iter_pages(chunk_size)
+        return export_lines(pages, formato, list(Sandal.model_fields))
 
-    def update(self, sandal_id: int, sandal: Sandal) -> Sandal:
+    async def update(self, sandal_id: int, sandal: Sandal) -> Sandal:
         """
         Atualiza os dados de uma sandália existente.
 
@@ -67,9 +129,9 @@ class SandalService:
         Raises:
             ValueError: Se a sandália não for encontrada.
         """
-        return self.repository.update(sandal)
+        return await self.repository.update(sandal)
 
-    def delete(self, sandal_id: int) -> bool:
+    async def delete(self, sandal_id: int) -> bool:
         """
         Exclui uma sandália pelo seu ID.
 
@@ -79,4 +141,4 @@ class SandalService:
         Returns:
             bool: True se a sandália foi excluída com sucesso, False caso contrário.
         """
-        return self.repository.delete(sandal_id)
+        return await self.repository.delete(sandal_id)
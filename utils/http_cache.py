@@ -0,0 +1,60 @@
+import zlib
+
+from starlette.responses import Response
+
+
+# Respostas com ETag podem ser guardadas, mas precisam ser revalidadas a cada uso
+CACHE_CONTROL = "no-cache"
+
+
+def version_etag(version: int, *parametros) -> str:
+    """
+    Monta o ETag de uma representação derivada da `version` de um repositório.
+
+    A `version` vem do estado persistido (a assinatura dos arquivos CSV ou os contadores do
+    SQLite), então o ETag é o mesmo em todos os workers e continua válido depois de um reinício.
+
+    Args:
+        version (int): A versão dos dados do repositório.
+        *parametros: Parâmetros que mudam a representação (filtros, paginação), para que
+            páginas e filtros diferentes da mesma versão não compartilhem o ETag.
+
+    Returns:
+        str: O ETag, entre aspas.
+    """
+    variante = zlib.crc32(repr(parametros).encode()) if parametros else 0
+    return f'"{version:x}-{variante:08x}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Verifica se o cabeçalho `If-None-Match` corresponde ao ETag atual.
+
+    Usa a comparação fraca, como define o HTTP para `If-None-Match`: o prefixo `W/` é ignorado.
+
+    Args:
+        if_none_match (str | None): O valor do cabeçalho `If-None-Match`.
+        etag (str): O ETag atual da representação.
+
+    Returns:
+        bool: `True` se o cliente já tem a representação atual.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    atual = etag.removeprefix("W/")
+    return any(candidato.strip().removeprefix("W/") == atual for candidato in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Resposta 304 para um cliente que já tem a representação atual.
+
+    Args:
+        etag (str): O ETag atual da representação.
+
+    Returns:
+        Response: A resposta, sem corpo.
+    """
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -1,8 +1,14 @@
-# Main directories
-CSV_FILES_PATH = "repositories/data/archive_csv/"
-ZIP_FILES_PATH = "repositories/data/archive_zip/"
-
-# Specific CSV file paths
-CLIENT_CSV = f"{CSV_FILES_PATH}client.csv"
-SANDAL_CSV = f"{CSV_FILES_PATH}sandal.csv"
-SALE_CSV = f"{CSV_FILES_PATH}sale.csv"
+# Main directories
+CSV_FILES_PATH = "repositories/data/archive_csv/"
+ZIP_FILES_PATH = "repositories/data/archive_zip/"
+
+# Specific CSV file paths
+CLIENT_CSV = f"{CSV_FILES_PATH}client.csv"
+SANDAL_CSV = f"{CSV_FILES_PATH}sandal.csv"
+SALE_CSV = f"{CSV_FILES_PATH}sale.csv"
+
+# SQLite database used by the "sqlite" storage backend
+SQLITE_DB = "repositories/data/database.sqlite3"
+
+# Change feed of the "csv" storage backend (outside the CSV folder, so it is not archived)
+CHANGE_FEED = "repositories/data/changes.feed"
@@ -0,0 +1,27 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Storage backend used by the repositories: "csv" or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").lower()
+
+# Maximum concurrent operations per repository (size of each repository's thread pool)
+REPOSITORY_MAX_WORKERS = int(os.getenv("REPOSITORY_MAX_WORKERS", "4"))
+CLIENT_MAX_WORKERS = int(os.getenv("CLIENT_MAX_WORKERS", REPOSITORY_MAX_WORKERS))
+SANDAL_MAX_WORKERS = int(os.getenv("SANDAL_MAX_WORKERS", REPOSITORY_MAX_WORKERS))
+SALE_MAX_WORKERS = int(os.getenv("SALE_MAX_WORKERS", REPOSITORY_MAX_WORKERS))
+
+# Store a snapshot of the client and products with each new sale ("true" or "false")
+SALE_SNAPSHOTS = os.getenv("SALE_SNAPSHOTS", "false").lower() in ("1", "true", "yes")
+
+# Default compression level of the CSV archive (0 = stored, 1-9 = deflate)
+ZIP_COMPRESSLEVEL = int(os.getenv("ZIP_COMPRESSLEVEL", "6"))
+
+# Sales kept in the read-through cache of GET /sales/{id} (0 = no cache) and their lifetime in seconds
+SALE_CACHE_SIZE = int(os.getenv("SALE_CACHE_SIZE", "1024"))
+SALE_CACHE_TTL = float(os.getenv("SALE_CACHE_TTL", "300"))
+
+# Changes kept in the change feed; replicas and caches further behind reload everything
+CHANGE_FEED_RETENTION = int(os.getenv("CHANGE_FEED_RETENTION", "100000"))